@@ -0,0 +1,270 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Optional
+
+from main import KnotParams, ViewParams, Pattern, Block, Orientation, Profile
+from export import export_knot, WRITERS
+from raster import render_png
+from patternfile import load_pattern
+from cache import GeometryCache
+from plotter import export_toolpath, PLOTTER_WRITERS, DEFAULT_UNIT_MM, DEFAULT_FEED, DEFAULT_TRAVEL_FEED
+
+# A spec is one JSON object:
+#   {"name": "frame-8",
+#    "patterns": [{"length": 8, "height": 8,
+#                  "blocks": [["horizontal", 1, 1, 3], ["vertical", 1, 1, 3]],
+#                  "vertical_lines": {"3": [[1, 3], [5, 7]]},
+#                  "transforms": [["folded"], ["mirrored"], ["mirrored", "vertical"]]},
+#                 {"file": "designs/border.knot", "transforms": [["repeated", 2]]}],
+#    "knot": {"length": 30, "periodic": true},
+#    "view": {"line_width": 15, "crossing_gap_length": 6},
+#    "zoom": 2, "dpi": 600, "format": "png", "output": "out/frame-8.png"}
+# Toolpath formats also take "unit_mm", "feed" and "travel_feed", see plotter.py.
+# Only "patterns" is required. Spec files hold one spec or a list of them, .jsonl files one spec per line,
+# and directories are searched for both.
+
+FORMATS = sorted(WRITERS) + sorted(PLOTTER_WRITERS) + ['png']
+TRANSFORMS = {'mirrored', 'folded', 'inverted', 'shifted', 'repeated'}
+KNOT_FIELDS = {'length', 'periodic'}
+MEMORY_CACHE_ENTRIES = 4  # knots kept by each worker, for specs that re-render the same design
+
+caches = {}  # per worker process, by cache directory
+
+
+def parse_orientation(name: str) -> Orientation:
+    try:
+        return Orientation[name.upper()]
+    except KeyError:
+        raise ValueError('unknown orientation {}'.format(name)) from None
+
+
+def parse_argument(value):
+    return parse_orientation(value) if isinstance(value, str) else value
+
+
+def pattern_from_spec(spec: dict):
+    if 'file' in spec:
+        # a saved pattern file, which can still be transformed
+        return apply_transforms(load_pattern(spec['file']), spec)
+    lanes = {key: {int(index): [tuple(line) for line in lines] for index, lines in spec.get(key, {}).items()}
+             for key in ('vertical_lines', 'horizontal_lines')}
+    kwargs = {key: spec[key] for key in ('length', 'height') if key in spec}
+    pattern = Pattern(*(Block(parse_orientation(orientation), index, start, end)
+                        for orientation, index, start, end in spec.get('blocks', ())),
+                      **lanes, **kwargs)
+    return apply_transforms(pattern, spec)
+
+
+def apply_transforms(pattern, spec: dict):
+    for name, *arguments in spec.get('transforms', ()):
+        if name not in TRANSFORMS:
+            raise ValueError('unknown transform {}'.format(name))
+        pattern = getattr(pattern, name)(*map(parse_argument, arguments))
+    return pattern
+
+
+def knot_params_from_spec(spec: dict) -> KnotParams:
+    if not spec.get('patterns'):
+        raise ValueError('spec has no patterns')
+    knot = spec.get('knot', {})
+    unknown = set(knot) - KNOT_FIELDS
+    if unknown:
+        raise ValueError('unknown knot fields {}'.format(', '.join(sorted(unknown))))
+    return KnotParams(*map(pattern_from_spec, spec['patterns']), **knot)
+
+
+def view_params_from_spec(spec: dict) -> ViewParams:
+    view = spec.get('view', {})
+    unknown = [key for key in view if key != 'line_color' and not hasattr(ViewParams, key)]
+    if unknown:
+        raise ValueError('unknown view fields {}'.format(', '.join(sorted(unknown))))
+    vp = ViewParams(**view)
+    return vp.scaled(spec['zoom']) if 'zoom' in spec else vp
+
+
+def iter_spec_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith(('.json', '.jsonl')):
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
+
+def load_jobs(paths, out_dir: str, default_format: str):
+    # (job, None) for every spec found, or (None, failure record) for what couldn't be read
+    for path in iter_spec_files(paths):
+        stem = os.path.splitext(os.path.basename(path))[0]
+        try:
+            with open(path) as f:
+                if path.endswith('.jsonl'):
+                    entries = [(line_number, line) for line_number, line in enumerate(f, 1) if line.strip()]
+                    specs = []
+                    for line_number, line in entries:
+                        source = '{}:{}'.format(path, line_number)
+                        try:
+                            specs.append((source, json.loads(line)))
+                        except ValueError as e:
+                            yield None, failure(source, source, e)
+                else:
+                    loaded = json.load(f)
+                    specs = [('{}:{}'.format(path, i + 1), spec)
+                             for i, spec in enumerate(loaded if isinstance(loaded, list) else [loaded])]
+        except (OSError, ValueError) as e:
+            yield None, failure(path, path, e)
+            continue
+        for number, (source, spec) in enumerate(specs, 1):
+            if not isinstance(spec, dict):
+                yield None, failure(source, source, ValueError('a spec must be a JSON object'))
+                continue
+            name = spec.get('name') or (stem if len(specs) == 1 else '{}-{}'.format(stem, number))
+            format = spec.get('format', default_format)
+            output = spec.get('output') or os.path.join(out_dir, '{}.{}'.format(name, format))
+            yield {'name': name, 'source': source, 'format': format, 'output': output, 'spec': spec}, None
+
+
+def unique_jobs(loaded):
+    # passes load_jobs through, except that specs giving the same knot as an earlier one, up to a symmetry
+    # of the square, become (None, record) and are skipped
+    first = {}
+    for job, record in loaded:
+        if job is None:
+            yield job, record
+            continue
+        start = time.perf_counter()
+        try:
+            fingerprint = knot_params_from_spec(job['spec']).fingerprint()
+        except Exception as e:
+            yield None, dict(failure(job['name'], job['source'], e, time.perf_counter() - start), output=job['output'])
+            continue
+        if fingerprint in first:
+            original = first[fingerprint]
+            yield None, {'name': job['name'], 'source': job['source'], 'ok': True, 'output': original['output'],
+                         'seconds': round(time.perf_counter() - start, 4), 'duplicate_of': original['name']}
+        else:
+            first[fingerprint] = job
+            yield job, None
+
+
+def failure(name: str, source: str, error: Exception, seconds: float = 0.0) -> dict:
+    return {'name': name, 'source': source, 'ok': False, 'seconds': round(seconds, 4),
+            'error': '{}: {}'.format(type(error).__name__, error)}
+
+
+def get_cache(directory: Optional[str]) -> GeometryCache:
+    if directory not in caches:
+        caches[directory] = GeometryCache(MEMORY_CACHE_ENTRIES, directory)
+    return caches[directory]
+
+
+def run_job(job: dict) -> dict:
+    if not job.get('profile'):
+        return render_job(job)
+    with Profile() as profile:
+        record = render_job(job)
+    record['profile'] = profile.report()
+    return record
+
+
+def render_job(job: dict) -> dict:
+    # runs in a worker process; anything that goes wrong is reported instead of raised
+    start = time.perf_counter()
+    try:
+        spec = job['spec']
+        if job['format'] not in FORMATS:
+            raise ValueError('unknown format {}'.format(job['format']))
+        kp = knot_params_from_spec(spec)
+        vp = view_params_from_spec(spec)
+        toolpath = job['format'] in PLOTTER_WRITERS
+        # whole-knot segments are only needed for strand colours, polylines and toolpaths, anything else
+        # streams rows
+        engine = get_cache(job.get('cache_dir')).engine(
+            kp, segments=bool(vp.strand_colors or vp.polylines or toolpath))
+        directory = os.path.dirname(job['output'])
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        extra = {}
+        if job['format'] == 'png':
+            render_png(engine, job['output'], vp, dpi=spec.get('dpi'))
+        elif toolpath:
+            extra['toolpath'] = export_toolpath(engine, job['output'], vp, job['format'],
+                                                spec.get('unit_mm', DEFAULT_UNIT_MM), spec.get('feed', DEFAULT_FEED),
+                                                spec.get('travel_feed', DEFAULT_TRAVEL_FEED))
+        else:
+            export_knot(engine, job['output'], vp, job['format'])
+    except Exception as e:
+        return dict(failure(job['name'], job['source'], e, time.perf_counter() - start), output=job['output'])
+    return dict(extra, name=job['name'], source=job['source'], ok=True, output=job['output'],
+                seconds=round(time.perf_counter() - start, 4))
+
+
+def iter_results(jobs, workers: int):
+    if workers == 1:
+        for job in jobs:
+            yield run_job(job)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for future in as_completed([executor.submit(run_job, job) for job in jobs]):
+            yield future.result()
+
+
+def report_line(record: dict) -> str:
+    if 'duplicate_of' in record:
+        return 'same  {:8.3f}s  {}  as {}'.format(record['seconds'], record['name'], record['duplicate_of'])
+    if record['ok']:
+        line = 'ok    {:8.3f}s  {}  {}'.format(record['seconds'], record['name'], record['output'])
+        if 'toolpath' in record:
+            line += '  ({strokes} strokes, {pen_down_mm} mm pen down, {pen_up_mm} mm pen up, ' \
+                    'about {minutes} min)'.format(**record['toolpath'])
+        return line
+    return 'FAIL  {:8.3f}s  {}  ({})  {}'.format(record['seconds'], record['name'], record['source'], record['error'])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Render many knot specs in parallel.')
+    parser.add_argument('specs', nargs='+', help='spec .json/.jsonl files or directories of them')
+    parser.add_argument('-o', '--out-dir', default='.', help='where outputs without an explicit path go')
+    parser.add_argument('-f', '--format', default='svg', choices=FORMATS, help='format of specs that give none')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help='worker processes')
+    parser.add_argument('--report', help='also write one JSON record per job to this file')
+    parser.add_argument('--cache-dir', help='keep computed knot geometry here and reuse it across runs')
+    parser.add_argument('--profile', action='store_true',
+                        help='add per-phase timings and counters to each report record (or set KNOT_PROFILE)')
+    parser.add_argument('--unique', action='store_true',
+                        help='render only the first of specs that give the same knot up to rotation or reflection')
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    jobs, records = [], []
+    loaded = load_jobs(args.specs, args.out_dir, args.format)
+    for job, record in unique_jobs(loaded) if args.unique else loaded:
+        if job is None:
+            records.append(record)
+            print(report_line(record))
+        else:
+            job['cache_dir'] = args.cache_dir
+            job['profile'] = args.profile or Profile.from_env() is not None
+            jobs.append(job)
+    for record in iter_results(jobs, max(1, min(args.jobs, len(jobs)))):
+        records.append(record)
+        print(report_line(record), flush=True)
+
+    failed = sum(not record['ok'] for record in records)
+    busy = sum(record['seconds'] for record in records)
+    wall = time.perf_counter() - started
+    print('{} of {} jobs ok in {:.2f}s ({:.2f}s of rendering, {:.1f}x)'.format(
+        len(records) - failed, len(records), wall, busy, busy / wall if wall else 0))
+    if args.report:
+        with open(args.report, 'w') as f:
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
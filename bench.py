@@ -0,0 +1,201 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from main import KnotEngine, KnotParams, KnotView, ViewParams, Pattern, Orientation, VBlock, HBlock, overextend
+
+# Times every phase of the knot pipeline on synthetic knots of growing size:
+#
+#     python bench.py --sizes 10,100,1000 --save baseline.json
+#     python bench.py --sizes 10,100,1000 --compare baseline.json
+#
+# A size is the side of the frame's quadrant in units, so a frame knot is about twice that across.
+# Every phase reruns on an engine that has already been set up, which is how each one gets timed on its
+# own. Phases that create a Python object per segment (strands, draw) are skipped above --max-item-size,
+# and peak memory comes from a separate tracemalloc pass, which is several times slower than the timing
+# runs; --no-memory skips it.
+
+PHASES = ('build', 'block_index', 'setup_blocks', 'setup_crosses', 'check_symmetries', 'segments',
+          'is_blocking', 'strands', 'draw')
+ITEM_PHASES = {'strands', 'draw'}
+LOOKUPS = 20000  # random cells queried by the is_blocking phase
+NOISE_SECONDS = 0.001  # timings below this are too noisy to count as regressions
+
+
+def frame(size: int) -> KnotParams:
+    # the corner recipe from main(), folded and mirrored in place both ways
+    corner_lines = [HBlock(1, 1, 3), HBlock(3, 3, 5), *(VBlock(i, 1, 3) for i in range(1, size, 4)),
+                    HBlock(4, 4, overextend(size))]
+    quadrant = Pattern(*corner_lines, length=size, height=size)
+    return KnotParams(quadrant.fold().mirror().mirror(Orientation.VERTICAL))
+
+
+def border(size: int) -> KnotParams:
+    # a short band repeated along a knot as long as a frame, looked up modulo its period
+    tile = Pattern(VBlock(1, 1, 3), VBlock(1, 5, 7), HBlock(4, 0, 2), length=4, height=9)
+    return KnotParams(tile, length=2 * size - 1, periodic=True)
+
+
+RECIPES = {
+    'frame': (frame, True),
+    'frame-nosym': (frame, False),  # every cell computed, no fundamental region
+    'border': (border, True),
+}
+
+
+class CountingCanvas:
+    # stands in for a Tk canvas, so drawing is timed without a display or Tk's own cost
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.items = 0
+
+    def create_line(self, *coords, **options):
+        self.items += 1
+        return self.items
+
+    def create_oval(self, *coords, **options):
+        self.items += 1
+        return self.items
+
+    def itemconfigure(self, *args, **options):
+        pass
+
+    def delete(self, *tags):
+        pass
+
+
+class Run:
+    # one knot going through the pipeline, phase by phase
+
+    def __init__(self, recipe: str, size: int) -> None:
+        super().__init__()
+        self.recipe = recipe
+        self.size = size
+        self.build, self.use_symmetry = RECIPES[recipe]
+        self.kp = self.blocks = self.engine = None
+        self.cells = []
+
+    def prepare(self, name: str):
+        # whatever a phase needs that shouldn't count towards its time. The engine's constructor runs the
+        # setup phases once, so setup_blocks only times the rerun that follows it
+        if name == 'setup_blocks' and self.engine is None:
+            self.engine = KnotEngine(self.kp, self.use_symmetry, self.blocks)
+        elif name == 'is_blocking' and not self.cells:
+            rng = random.Random(self.size)
+            self.cells = [(rng.randrange(self.engine.length), rng.randrange(self.engine.height))
+                          for _ in range(LOOKUPS)]
+
+    def phase(self, name: str):
+        if name == 'build':
+            self.kp = self.build(self.size)
+        elif name == 'block_index':
+            self.blocks = self.kp.block_index()
+        elif name == 'setup_blocks':
+            self.engine.setup_blocks(self.blocks)
+        elif name == 'setup_crosses':
+            self.engine.setup_crosses()
+        elif name == 'check_symmetries':
+            self.engine.symmetries = self.engine.check_symmetries(self.kp.get_symmetries()) \
+                if self.use_symmetry else frozenset()
+        elif name == 'segments':
+            self.engine.setup_segments()
+        elif name == 'is_blocking':
+            for col, row in self.cells:
+                self.engine.blocks.is_blocking(col, row)
+        elif name == 'strands':
+            self.engine.strands = None
+            self.engine.trace_strands()
+        elif name == 'draw':
+            KnotView(CountingCanvas(), self.engine, ViewParams()).draw_init()
+
+
+def measure(recipe: str, size: int, repeat: int, memory: bool, max_item_size: int):
+    # {phase: {'seconds': best of repeat, 'peak_bytes': ...}}
+    phases = [phase for phase in PHASES if phase not in ITEM_PHASES or size <= max_item_size]
+    results = {phase: {'seconds': float('inf')} for phase in phases}
+    for _ in range(repeat):
+        run = Run(recipe, size)
+        for phase in phases:
+            run.prepare(phase)
+            start = time.perf_counter()
+            run.phase(phase)
+            results[phase]['seconds'] = min(results[phase]['seconds'], time.perf_counter() - start)
+    if memory:
+        # a separate pass, tracemalloc slows everything down
+        run = Run(recipe, size)
+        tracemalloc.start()
+        try:
+            for phase in phases:
+                run.prepare(phase)
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+                run.phase(phase)
+                results[phase]['peak_bytes'] = tracemalloc.get_traced_memory()[1] - before
+        finally:
+            tracemalloc.stop()
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float):
+    # (key, ratio) for every timing that got slower than threshold times its baseline
+    slower = []
+    for key, result in results.items():
+        before = baseline.get(key)
+        if before and before['seconds'] > 0 and max(before['seconds'], result['seconds']) >= NOISE_SECONDS and \
+                result['seconds'] / before['seconds'] > threshold:
+            slower.append((key, result['seconds'] / before['seconds']))
+    return slower
+
+
+def report_line(key: str, result: dict, before: dict = None) -> str:
+    line = '{:36} {:10.4f}s'.format(key, result['seconds'])
+    if 'peak_bytes' in result:
+        line += ' {:10.1f} MB'.format(result['peak_bytes'] / 1e6)
+    if before:
+        line += '  {:6.2f}x'.format(result['seconds'] / before['seconds'] if before['seconds'] else 1.0)
+    return line
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Time each phase of the knot pipeline across knot sizes.')
+    parser.add_argument('--sizes', default='10,100,500,2000', help='comma separated quadrant sizes')
+    parser.add_argument('--recipes', default=','.join(RECIPES), help='comma separated, of ' + ', '.join(RECIPES))
+    parser.add_argument('--repeat', type=int, default=3, help='runs per size, the best time is kept')
+    parser.add_argument('--max-item-size', type=int, default=100, help='largest size to trace and draw')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='a JSON file saved earlier to compare against')
+    parser.add_argument('--threshold', type=float, default=1.25, help='slowdown ratio that counts as a regression')
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+    results = {}
+    for recipe in args.recipes.split(','):
+        if recipe not in RECIPES:
+            parser.error('unknown recipe {}'.format(recipe))
+        for size in map(int, args.sizes.split(',')):
+            for phase, result in measure(recipe, size, args.repeat, not args.no_memory, args.max_item_size).items():
+                key = '{}/{}/{}'.format(recipe, size, phase)
+                results[key] = result
+                print(report_line(key, result, baseline.get(key)), flush=True)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'python': sys.version.split()[0], 'platform': platform.platform(), 'results': results},
+                      f, indent=1)
+    slower = compare(results, baseline, args.threshold)
+    for key, ratio in slower:
+        print('slower: {} {:.2f}x'.format(key, ratio))
+    return 1 if slower else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,213 @@
+import hashlib
+import os
+import struct
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Optional
+
+from main import KnotEngine, KnotParams, BlockIndex, PeriodicBlockIndex
+from patternfile import ORIENTATIONS, symmetry_bits, bits_symmetries, little_endian
+
+# Geometry is keyed by a sha256 of the knot's block index: its size, the symmetries it claims and every
+# merged lane in sorted order, so knots that differ only in how their patterns were put together share
+# an entry. Segments are in half units, so no ViewParams field changes them and every view of a knot,
+# at any zoom or colour, reuses the same entry.
+#
+# Disk entries, little-endian int32 header then data:
+#   magic, version, length, height, symmetry bits, segment count (-1 when they weren't computed)
+#   blocked_horizontal[length * height], blocked_vertical[length * height], segments[count * SEGMENT_FIELDS]
+
+GEOMETRY_VERSION = 1
+MAGIC = b'KGEO'
+ENTRY_HEADER = struct.Struct('<4s5i')
+SUFFIX = '.geom'
+LANE_HEADER = struct.Struct('<2i')
+
+
+def hash_lanes(h, blocks: BlockIndex):
+    for orientation in ORIENTATIONS:
+        lanes = sorted((index, lane) for index, lane in blocks.lanes_for_orientation(orientation).items() if lane)
+        h.update(LANE_HEADER.pack(orientation.value, len(lanes)))
+        for index, lane in lanes:
+            h.update(LANE_HEADER.pack(index, len(lane)))
+            h.update(little_endian(array('i', lane.starts)))
+            h.update(little_endian(array('i', lane.ends)))
+
+
+def geometry_key(blocks: BlockIndex, length: int, height: int, symmetries: frozenset) -> str:
+    h = hashlib.sha256(ENTRY_HEADER.pack(MAGIC, GEOMETRY_VERSION, length, height, symmetry_bits(symmetries), 0))
+    hash_lanes(h, blocks)
+    if isinstance(blocks, PeriodicBlockIndex):
+        h.update(LANE_HEADER.pack(blocks.period, blocks.length))
+        hash_lanes(h, blocks.tile)
+    return h.hexdigest()
+
+
+def knot_key(kp: KnotParams, use_symmetry: bool = True) -> str:
+    return geometry_key(kp.block_index(), kp.get_length(), kp.get_height(),
+                        kp.get_symmetries() if use_symmetry else frozenset())
+
+
+class Geometry:
+    # what KnotEngine computes from the blocks; shared between every engine made from it, so read-only
+    __slots__ = ('length', 'height', 'blocked_horizontal', 'blocked_vertical', 'symmetries', 'segments')
+
+    def __init__(self, length: int, height: int, blocked_horizontal, blocked_vertical, symmetries: frozenset,
+                 segments=None) -> None:
+        self.length = length
+        self.height = height
+        self.blocked_horizontal = blocked_horizontal
+        self.blocked_vertical = blocked_vertical
+        self.symmetries = symmetries
+        self.segments = segments
+
+    @classmethod
+    def from_engine(cls, engine: KnotEngine):
+        return cls(engine.length, engine.height, engine.blocked_horizontal, engine.blocked_vertical,
+                   engine.symmetries, engine.computed_segments)
+
+    def engine(self, kp: KnotParams, blocks: BlockIndex) -> KnotEngine:
+        return KnotEngine.from_geometry(kp, blocks, self.blocked_horizontal, self.blocked_vertical,
+                                        self.symmetries, self.segments)
+
+    def write(self, f):
+        count = -1 if self.segments is None else len(self.segments)
+        f.write(ENTRY_HEADER.pack(MAGIC, GEOMETRY_VERSION, self.length, self.height, symmetry_bits(self.symmetries),
+                                  count))
+        f.write(self.blocked_horizontal)
+        f.write(self.blocked_vertical)
+        if self.segments is not None:
+            f.write(little_endian(self.segments))
+
+    @classmethod
+    def read(cls, data: bytes, length: int, height: int):
+        # None for anything that isn't an entry for a knot of this size
+        if len(data) < ENTRY_HEADER.size:
+            return None
+        magic, version, entry_length, entry_height, bits, count = ENTRY_HEADER.unpack_from(data, 0)
+        size = length * height
+        end = ENTRY_HEADER.size + 2 * size + max(count, 0) * 4
+        if (magic, version, entry_length, entry_height) != (MAGIC, GEOMETRY_VERSION, length, height) or \
+                len(data) != end:
+            return None
+        offset = ENTRY_HEADER.size
+        blocked_horizontal = bytearray(data[offset:offset + size])
+        blocked_vertical = bytearray(data[offset + size:offset + 2 * size])
+        segments = None
+        if count >= 0:
+            segments = array('i')
+            segments.frombytes(data[offset + 2 * size:end])
+            if sys.byteorder != 'little':
+                segments.byteswap()
+        return cls(length, height, blocked_horizontal, blocked_vertical, bits_symmetries(bits), segments)
+
+
+class GeometryCache:
+    # an in-memory LRU of up to max_entries knots, backed by files in directory when one is given. The
+    # directory is trimmed to max_disk_bytes after every write, least recently used entries first. Workers
+    # on several threads can share one: engine() serves them one at a time
+
+    def __init__(self, max_entries: int = 32, directory: Optional[str] = None,
+                 max_disk_bytes: int = 1 << 30) -> None:
+        super().__init__()
+        self.max_entries = max_entries
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def engine(self, kp: KnotParams, use_symmetry: bool = True, segments: bool = True) -> KnotEngine:
+        # an engine for kp, computing and caching its geometry only when no earlier knot had the same
+        # blocks. Without segments, an entry that lacks them is fine and a new one is stored without them
+        blocks = kp.block_index()
+        length, height = kp.get_length(), kp.get_height()
+        key = geometry_key(blocks, length, height, kp.get_symmetries() if use_symmetry else frozenset())
+        with self.lock:
+            geometry = self.get(key, length, height)
+            if geometry is not None and (geometry.segments is not None or not segments):
+                return geometry.engine(kp, blocks)
+            self.misses += 1
+            if geometry is None:
+                engine = KnotEngine(kp, use_symmetry, blocks)
+            else:
+                engine = geometry.engine(kp, blocks)
+            if segments:
+                engine.setup_segments()
+            self.put(key, Geometry.from_engine(engine))
+            return engine
+
+    def get(self, key: str, length: int, height: int) -> Optional[Geometry]:
+        geometry = self.entries.get(key)
+        if geometry is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return geometry
+        path = self.path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                geometry = Geometry.read(f.read(), length, height)
+            os.utime(path)
+        except OSError:
+            return None
+        if geometry is not None:
+            self.disk_hits += 1
+            self.remember(key, geometry)
+        return geometry
+
+    def put(self, key: str, geometry: Geometry):
+        self.remember(key, geometry)
+        path = self.path(key)
+        if path is None:
+            return
+        temporary = '{}.{}.tmp'.format(path, os.getpid())
+        with open(temporary, 'wb') as f:
+            geometry.write(f)
+        os.replace(temporary, path)
+        self.trim_disk()
+
+    def remember(self, key: str, geometry: Geometry):
+        self.entries[key] = geometry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def path(self, key: str) -> Optional[str]:
+        return os.path.join(self.directory, key + SUFFIX) if self.directory else None
+
+    def trim_disk(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith(SUFFIX):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue  # removed by another process sharing the directory
+                files.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in files)
+        for _, size, name in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __str__(self) -> str:
+        return '{} in memory, {} hits, {} from disk, {} misses'.format(len(self.entries), self.hits,
+                                                                      self.disk_hits, self.misses)
@@ -0,0 +1,272 @@
+import zlib
+from typing import Optional
+
+from main import KnotEngine, ViewParams, SegmentType, SEGMENT_FIELDS
+
+# Tk colour names used by the view params, for formats that need plain rgb. Spaces and case are ignored as
+# in Tk, and gray, green, maroon and purple have the web values Tk has used since 8.6
+COLOR_NAMES = {
+    'black': (0, 0, 0),
+    'white': (255, 255, 255),
+    'red': (255, 0, 0),
+    'green': (0, 128, 0),
+    'blue': (0, 0, 255),
+    'yellow': (255, 255, 0),
+    'cyan': (0, 255, 255),
+    'magenta': (255, 0, 255),
+    'orange': (255, 165, 0),
+    'purple': (128, 0, 128),
+    'violet': (238, 130, 238),
+    'brown': (165, 42, 42),
+    'tan': (210, 180, 140),
+    'gray': (128, 128, 128),
+    'grey': (128, 128, 128),
+    'lightgray': (211, 211, 211),
+    'lightgrey': (211, 211, 211),
+    'darkgray': (169, 169, 169),
+    'darkgrey': (169, 169, 169),
+    'dimgray': (105, 105, 105),
+    'dimgrey': (105, 105, 105),
+    'silver': (192, 192, 192),
+    'maroon': (128, 0, 0),
+    'navy': (0, 0, 128),
+    'navyblue': (0, 0, 128),
+    'teal': (0, 128, 128),
+    'olive': (128, 128, 0),
+    'lime': (0, 255, 0),
+    'aqua': (0, 255, 255),
+    'fuchsia': (255, 0, 255),
+    'pink': (255, 192, 203),
+    'hotpink': (255, 105, 180),
+    'deeppink': (255, 20, 147),
+    'salmon': (250, 128, 114),
+    'coral': (255, 127, 80),
+    'tomato': (255, 99, 71),
+    'orangered': (255, 69, 0),
+    'darkorange': (255, 140, 0),
+    'gold': (255, 215, 0),
+    'khaki': (240, 230, 140),
+    'beige': (245, 245, 220),
+    'ivory': (255, 255, 240),
+    'wheat': (245, 222, 179),
+    'chocolate': (210, 105, 30),
+    'sienna': (160, 82, 45),
+    'saddlebrown': (139, 69, 19),
+    'firebrick': (178, 34, 34),
+    'crimson': (220, 20, 60),
+    'darkred': (139, 0, 0),
+    'indigo': (75, 0, 130),
+    'orchid': (218, 112, 214),
+    'plum': (221, 160, 221),
+    'lavender': (230, 230, 250),
+    'darkviolet': (148, 0, 211),
+    'blueviolet': (138, 43, 226),
+    'slateblue': (106, 90, 205),
+    'royalblue': (65, 105, 225),
+    'steelblue': (70, 130, 180),
+    'skyblue': (135, 206, 235),
+    'lightblue': (173, 216, 230),
+    'deepskyblue': (0, 191, 255),
+    'dodgerblue': (30, 144, 255),
+    'darkblue': (0, 0, 139),
+    'midnightblue': (25, 25, 112),
+    'turquoise': (64, 224, 208),
+    'darkcyan': (0, 139, 139),
+    'seagreen': (46, 139, 87),
+    'forestgreen': (34, 139, 34),
+    'darkgreen': (0, 100, 0),
+    'limegreen': (50, 205, 50),
+    'lightgreen': (144, 238, 144),
+    'olivedrab': (107, 142, 35),
+    'yellowgreen': (154, 205, 50),
+    'chartreuse': (127, 255, 0),
+}
+
+ROWS_PER_BATCH = 4  # rows of segments held in memory at once when strands are coloured
+
+
+def get_rgb(color: str):
+    # 0-255 channels of a Tk colour name or #rgb, #rrggbb, #rrrgggbbb or #rrrrggggbbbb
+    if color.startswith('#') and len(color) in (4, 7, 10, 13):
+        digits = (len(color) - 1) // 3
+        try:
+            channels = [int(color[i:i + digits], 16) for i in range(1, len(color), digits)]
+        except ValueError:
+            raise ValueError('unknown colour {}'.format(color)) from None
+        # the top 8 bits, with a single digit repeated as Tk does
+        return tuple(c * 17 if digits == 1 else c >> 4 * (digits - 2) for c in channels)
+    try:
+        return COLOR_NAMES[color.replace(' ', '').lower()]
+    except KeyError:
+        raise ValueError('unknown colour {}'.format(color)) from None
+
+
+def number(value) -> str:
+    # two decimals is well below a printer dot; %g would switch to exponents on poster sizes
+    return ('%.2f' % value).rstrip('0').rstrip('.')
+
+
+class VectorWriter:
+    # streams stroked paths to a binary file-like object, one draw() call at a time
+
+    def __init__(self, out, width: float, height: float) -> None:
+        super().__init__()
+        self.out = out
+        self.width = width
+        self.height = height
+        self.offset = 0
+
+    def write(self, data: bytes):
+        self.out.write(data)
+        self.offset += len(data)
+
+    def begin(self): raise NotImplementedError()
+
+    def draw(self, paths, width: float, color: str, capstyle: str = 'round'):
+        # paths are flat x, y coordinate sequences, each stroked as one open polyline
+        raise NotImplementedError()
+
+    def end(self): raise NotImplementedError()
+
+
+class SvgWriter(VectorWriter):
+
+    def begin(self):
+        width, height = number(self.width), number(self.height)
+        self.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                   '<svg xmlns="http://www.w3.org/2000/svg" width="{0}" height="{1}" viewBox="0 0 {0} {1}">\n'
+                   '<g fill="none" stroke-linejoin="round">\n'.format(width, height).encode())
+
+    def draw(self, paths, width: float, color: str, capstyle: str = 'round'):
+        commands = []
+        for coords in paths:
+            points = ['{} {}'.format(number(coords[i]), number(coords[i + 1])) for i in range(0, len(coords), 2)]
+            commands.append('M' + 'L'.join(points))
+        if commands:
+            self.write('<path stroke="{}" stroke-width="{}" stroke-linecap="{}" d="{}"/>\n'.format(
+                color, number(width), capstyle, ''.join(commands)).encode())
+
+    def end(self):
+        self.write(b'</g>\n</svg>\n')
+
+
+class PdfWriter(VectorWriter):
+    # a single page whose content stream is deflated as it is written, so its length is only known at the
+    # end and goes into an indirect object after it
+    CAPSTYLES = {'butt': 0, 'round': 1, 'projecting': 2}
+
+    def __init__(self, out, width: float, height: float) -> None:
+        super().__init__(out, width, height)
+        self.object_offsets = []
+        self.compressor = None
+        self.stream_length = 0
+        self.state = None
+
+    def begin_object(self):
+        self.object_offsets.append(self.offset)
+        self.write('{} 0 obj\n'.format(len(self.object_offsets)).encode())
+
+    def write_object(self, body: str):
+        self.begin_object()
+        self.write(body.encode() + b'\nendobj\n')
+
+    def write_content(self, text: str):
+        data = self.compressor.compress(text.encode())
+        self.stream_length += len(data)
+        self.write(data)
+
+    def begin(self):
+        self.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        self.write_object('<< /Type /Catalog /Pages 2 0 R >>')
+        self.write_object('<< /Type /Pages /Kids [3 0 R] /Count 1 >>')
+        self.write_object('<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {} {}] /Contents 4 0 R /Resources << >> >>'
+                          .format(number(self.width), number(self.height)))
+        self.begin_object()
+        self.write(b'<< /Length 5 0 R /Filter /FlateDecode >>\nstream\n')
+        self.compressor = zlib.compressobj()
+        # canvas coordinates run downwards, pdf ones upwards
+        self.write_content('1 0 0 -1 0 {} cm 1 j\n'.format(number(self.height)))
+
+    def draw(self, paths, width: float, color: str, capstyle: str = 'round'):
+        if not paths:
+            return
+        commands = []
+        state = (width, color, capstyle)
+        if state != self.state:
+            self.state = state
+            commands.append('{} {} {} RG {} w {} J\n'.format(*(number(c / 255) for c in get_rgb(color)),
+                                                            number(width), self.CAPSTYLES[capstyle]))
+        for coords in paths:
+            commands.append('{} {} m'.format(number(coords[0]), number(coords[1])))
+            commands.extend(' {} {} l'.format(number(coords[i]), number(coords[i + 1]))
+                            for i in range(2, len(coords), 2))
+            commands.append('\n')
+        commands.append('S\n')
+        self.write_content(''.join(commands))
+
+    def end(self):
+        data = self.compressor.flush()
+        self.stream_length += len(data)
+        self.write(data)
+        self.write(b'\nendstream\nendobj\n')
+        self.write_object(str(self.stream_length))
+        xref_offset = self.offset
+        self.write('xref\n0 {}\n0000000000 65535 f \n'.format(len(self.object_offsets) + 1).encode())
+        for offset in self.object_offsets:
+            self.write('{:010d} 00000 n \n'.format(offset).encode())
+        self.write('trailer\n<< /Size {} /Root 1 0 R >>\nstartxref\n{}\n%%EOF\n'
+                   .format(len(self.object_offsets) + 1, xref_offset).encode())
+
+
+WRITERS = {'svg': SvgWriter, 'pdf': PdfWriter}
+
+
+def iter_segment_batches(engine: KnotEngine, vp: ViewParams):
+    # (segments, colours or None) a few rows at a time. Plain knots are generated row by row and never
+    # held whole; coloured ones need the traced strands, which index the engine's full segment array
+    if vp.strand_colors:
+        segments, strands = engine.segments, engine.trace_strands()
+        step = ROWS_PER_BATCH * engine.length
+        for start in range(0, len(segments) // SEGMENT_FIELDS, step):
+            ids = strands.strand_ids[start:start + step]
+            yield (segments[start * SEGMENT_FIELDS:(start + len(ids)) * SEGMENT_FIELDS],
+                   [vp.get_strand_color(strand) for strand in ids])
+    else:
+        for row in range(engine.height):
+            yield engine.row_segments(row), None
+
+
+def write_knot(engine: KnotEngine, writer: VectorWriter, vp: ViewParams = ViewParams()):
+    writer.begin()
+    if vp.polylines:
+        segments, strands = engine.segments, engine.trace_strands()
+        for chain in strands.chains(vp.crossing_gap_length > 0):
+            writer.draw([vp.chain_pixels(segments, chain)], vp.line_width,
+                        vp.get_strand_color(strands.strand_ids[chain[0] >> 1]), 'butt')
+    else:
+        for segments, colors in iter_segment_batches(engine, vp):
+            # same styling as KnotView.draw_segment: round caps on bounces, butt caps where crossings meet
+            paths = {}
+            for i in range(0, len(segments), SEGMENT_FIELDS):
+                segment_type = segments[i + 4]
+                color = colors[i // SEGMENT_FIELDS] if colors else vp.line_color
+                capstyle = 'round' if segment_type == SegmentType.BOUNCE.value else 'butt'
+                paths.setdefault((color, capstyle), []).append(vp.segment_pixels(*segments[i:i + SEGMENT_FIELDS]))
+            for (color, capstyle), lines in paths.items():
+                writer.draw(lines, vp.line_width, color, capstyle)
+    writer.end()
+
+
+def export_knot(engine: KnotEngine, out, vp: ViewParams = ViewParams(), format: Optional[str] = None):
+    # out is a path, whose extension picks the format unless given, or a binary file-like object
+    if isinstance(out, str):
+        if format is None:
+            format = out.rsplit('.', 1)[-1].lower()
+        if format not in WRITERS:
+            raise ValueError('unknown export format {}'.format(format))
+        with open(out, 'wb') as f:
+            return export_knot(engine, f, vp, format)
+    if format not in WRITERS:
+        raise ValueError('unknown export format {}'.format(format))
+    width, height = vp.knot_pixels(engine.length, engine.height)
+    write_knot(engine, WRITERS[format](out, width, height), vp)
@@ -0,0 +1,228 @@
+import argparse
+import sys
+import time
+import tkinter as tk
+import weakref
+from collections import deque
+
+from main import KnotParams, ViewParams, KnotView, GeometryWorker
+from cache import GeometryCache, knot_key
+from batch import load_jobs, knot_params_from_spec, view_params_from_spec, failure, report_line
+
+# Shows many knots side by side in one window:
+#
+#     python gallery.py designs/ --columns 6 --panel-size 200
+#
+# Every panel has its own canvas and KnotView, so closing one deletes its items and lets go of its engine.
+# Panels whose knots have the same blocks share one engine, and with it one set of masks, segments and
+# strands, for as long as any of them is open. Knots are computed one at a time on a worker thread and
+# drawn in slices between Tk events, as in KnotWindow.
+
+
+class Panel:
+    # one knot in the gallery, scaled down to fit the gallery's panel size
+
+    def __init__(self, gallery: 'Gallery', name: str, kp: KnotParams, vp: ViewParams) -> None:
+        super().__init__()
+        self.name = name
+        self.kp = kp
+        self.key = knot_key(kp)
+        zoom = min(1.0, gallery.panel_size / max(vp.knot_pixels(kp.get_length(), kp.get_height())))
+        self.vp = vp.scaled(zoom) if zoom < 1.0 else vp
+        if self.vp.unit_length < self.vp.detail_unit_length:
+            self.vp.crossing_gap_length = 0
+        self.view = None
+
+        frame = tk.Frame(gallery.panels_frame, borderwidth=1, relief=tk.GROOVE)
+        header = tk.Frame(frame)
+        header.pack(fill=tk.X)
+        tk.Label(header, text=name).pack(side=tk.LEFT)
+        tk.Button(header, text='x', command=lambda: gallery.remove(self)).pack(side=tk.RIGHT)
+        width, height = self.vp.knot_pixels(kp.get_length(), kp.get_height())
+        self.canvas = tk.Canvas(frame, bg='white', width=width, height=height)
+        self.canvas.pack()
+        self.status = tk.Label(frame, text='waiting')
+        self.status.pack(fill=tk.X)
+        self.frame = frame
+
+    def needs_strands(self):
+        return bool(self.vp.strand_colors or self.vp.polylines)
+
+    def release(self):
+        if self.view is not None:
+            self.view.release()
+            self.view = None
+        self.frame.destroy()
+
+
+class Gallery:
+    poll_ms = 15  # between checks on the worker
+    draw_seconds = 0.02  # of drawing per Tk tick
+
+    def __init__(self, columns: int = 4, panel_size: int = 240, cache_dir: str = None) -> None:
+        super().__init__()
+        self.columns = columns
+        self.panel_size = panel_size
+        self.panels = []
+        self.pending = deque()
+        # by knot_key, kept only while some panel's view still holds the engine
+        self.engines = weakref.WeakValueDictionary()
+        # only for reuse across runs, the engines above already cover this one
+        self.cache = GeometryCache(1, cache_dir) if cache_dir else None
+        self.current = None
+        self.worker = None
+        self.drawing = None
+        self.poll_id = None
+        self.helpers_hidden = KnotView.helpers_hidden
+
+        window = tk.Tk()
+        window.title('Knots')
+        self.window = window
+        self.status = tk.Label(window, anchor=tk.W)
+        self.status.pack(side=tk.BOTTOM, fill=tk.X)
+        scrollbar = tk.Scrollbar(window, orient=tk.VERTICAL)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        outer = tk.Canvas(window, yscrollcommand=scrollbar.set, width=columns * (panel_size + 12),
+                          height=min(3, 1 + panel_size // 120) * (panel_size + 40))
+        outer.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.configure(command=outer.yview)
+        self.panels_frame = tk.Frame(outer)
+        outer.create_window(0, 0, window=self.panels_frame, anchor=tk.NW)
+        self.panels_frame.bind('<Configure>', lambda e: outer.configure(scrollregion=outer.bbox('all')))
+        self.outer = outer
+
+        window.bind('h', lambda e: self.toggle_helpers())
+        window.bind('H', lambda e: self.toggle_helpers())
+        window.bind('<MouseWheel>', lambda e: outer.yview_scroll(1 if e.delta < 0 else -1, 'units'))
+        window.bind('<Button-4>', lambda e: outer.yview_scroll(-1, 'units'))
+        window.bind('<Button-5>', lambda e: outer.yview_scroll(1, 'units'))
+
+    def run(self):
+        self.window.mainloop()
+
+    def add(self, name: str, kp: KnotParams, vp: ViewParams = ViewParams()) -> Panel:
+        panel = Panel(self, name, kp, vp)
+        self.panels.append(panel)
+        self.layout()
+        self.pending.append(panel)
+        self.schedule()
+        return panel
+
+    def remove(self, panel: Panel):
+        if panel is self.current:
+            self.cancel()
+        elif panel in self.pending:
+            self.pending.remove(panel)
+        self.panels.remove(panel)
+        panel.release()
+        self.layout()
+        self.schedule()
+
+    def clear(self):
+        for panel in list(self.panels):
+            self.remove(panel)
+
+    def layout(self):
+        for i, panel in enumerate(self.panels):
+            panel.frame.grid(row=i // self.columns, column=i % self.columns, padx=4, pady=4, sticky='n')
+        self.update_status()
+
+    def schedule(self):
+        if self.poll_id is None:
+            self.poll_id = self.window.after(self.poll_ms, self.poll)
+
+    def cancel(self):
+        if self.worker is not None:
+            self.worker.cancel()
+        self.current = self.worker = self.drawing = None
+
+    def poll(self):
+        self.poll_id = None
+        if self.current is None:
+            if not self.pending:
+                self.update_status()
+                return
+            self.start(self.pending.popleft())
+        panel = self.current
+        if self.drawing is None:
+            while not self.worker.messages.empty():
+                kind, value = self.worker.messages.get_nowait()
+                if kind == 'progress':
+                    panel.status['text'] = 'computing {:.0%}'.format(value)
+                elif kind == 'error':
+                    panel.status['text'] = 'failed: {}'.format(value)
+                    self.current = self.worker = None
+                    break
+                else:
+                    self.engines[panel.key] = value
+                    self.start_drawing(value)
+                    break
+        if self.drawing is not None:
+            deadline = time.perf_counter() + self.draw_seconds
+            for fraction in self.drawing:
+                if time.perf_counter() > deadline:
+                    panel.status['text'] = 'drawing {:.0%}'.format(fraction)
+                    break
+            else:
+                self.finish_drawing()
+        self.schedule()
+
+    def start(self, panel: Panel):
+        self.current = panel
+        engine = self.engines.get(panel.key)
+        if engine is not None:
+            self.start_drawing(engine)
+        else:
+            panel.status['text'] = 'computing'
+            self.worker = GeometryWorker(panel.kp, panel.needs_strands(), self.cache).start()
+
+    def start_drawing(self, engine):
+        panel = self.current
+        self.worker = None
+        panel.view = KnotView(panel.canvas, engine, panel.vp)
+        panel.view.helpers_hidden = self.helpers_hidden
+        self.drawing = panel.view.iter_draw()
+
+    def finish_drawing(self):
+        panel = self.current
+        panel.status['text'] = '{} x {}'.format(panel.kp.get_length(), panel.kp.get_height())
+        self.current = self.drawing = None
+        self.update_status()
+
+    def update_status(self):
+        waiting = len(self.pending) + (self.current is not None)
+        self.status['text'] = '{} knots, {} distinct designs{}'.format(
+            len(self.panels), len(self.engines), ', {} to draw'.format(waiting) if waiting else '')
+
+    def toggle_helpers(self):
+        self.helpers_hidden = not self.helpers_hidden
+        for panel in self.panels:
+            if panel.view is not None:
+                panel.view.toggle_helpers()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Show many knot specs side by side in one window.')
+    parser.add_argument('specs', nargs='+', help='spec .json/.jsonl files or directories of them, as for batch.py')
+    parser.add_argument('--columns', type=int, default=4)
+    parser.add_argument('--panel-size', type=int, default=240, help='largest side of a panel in pixels')
+    parser.add_argument('--cache-dir', help='keep computed knot geometry here and reuse it across runs')
+    args = parser.parse_args(argv)
+
+    gallery = Gallery(args.columns, args.panel_size, args.cache_dir)
+    failed = 0
+    for job, record in load_jobs(args.specs, '.', 'svg'):
+        if job is not None:
+            try:
+                gallery.add(job['name'], knot_params_from_spec(job['spec']), view_params_from_spec(job['spec']))
+                continue
+            except Exception as e:
+                record = failure(job['name'], job['source'], e)
+        failed += 1
+        print(report_line(record))
+    gallery.run()
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
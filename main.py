@@ -3,8 +3,20 @@ from tkinter import ttk
 from enum import Enum
 from tkinter.ttk import Checkbutton
 from typing import Optional
-from collections import deque
-import copy
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import compress, repeat
+from math import sqrt
+import functools
+import hashlib
+import json
+import operator
+import os
+import queue
+import sys
+import threading
+import time
+import weakref
 
 # https://tkdocs.com/tutorial/canvas.html#tags
 
@@ -28,6 +40,14 @@ def get_node_type(col, row):
     return NodeType.LINE
 
 
+def get_cross_dir(col, row) -> Optional['Diagonal']:
+    # the crossing BFS from (1, 2) flips direction on every diagonal step, so the direction of a
+    # line node only depends on the parity of its column
+    if get_node_type(col, row) is not NodeType.LINE:
+        return None
+    return Diagonal.LEFTDOWN_RIGHTUP if col % 2 == 1 else Diagonal.LEFTUP_RIGHTDOWN
+
+
 def get_lane_type(index: int):
     return NodeType.PRIMARY if index % 2 == 0 else NodeType.SECONDARY
 
@@ -45,6 +65,12 @@ class Diagonal(Enum):
     LEFTUP_RIGHTDOWN = 2
 
 
+class Symmetry(Enum):
+    HORIZONTAL = 1  # left to right, as made by mirror()
+    VERTICAL = 2  # top to bottom, as made by mirror(Orientation.VERTICAL)
+    DIAGONAL = 3  # across the leading diagonal, as made by fold()
+
+
 class CornerDirection(Enum):
     LEFTUP = 1
     RIGHTUP = 2
@@ -53,6 +79,7 @@ class CornerDirection(Enum):
 
 
 class Block:
+    __slots__ = ('orientation', 'index', 'start', 'end', 'block_type')
 
     def __init__(self, orientation: Orientation, index: int, start: int, end: int) -> None:
         self.orientation = orientation
@@ -105,17 +132,22 @@ class Block:
 
 
 class VBlock(Block):
+    __slots__ = ()
+
     def __init__(self, index: int, start: int, end: int) -> None:
         super().__init__(Orientation.VERTICAL, index, start, end)
 
 
 class HBlock(Block):
+    __slots__ = ()
 
     def __init__(self, index: int, start: int, end: int) -> None:
         super().__init__(Orientation.HORIZONTAL, index, start, end)
 
 
 class LBlock(Block):
+    __slots__ = ()
+
     def __init__(self, x1: int, y1: int, x2: int, y2) -> None:
         if x1 is x2:
             super().__init__(Orientation.VERTICAL, x1, y1, y2)
@@ -125,24 +157,333 @@ class LBlock(Block):
             raise ValueError("not a horizontal or vertical line: {}, {} -> {}, {}".format(x1, y1, x2, y2))
 
 
+class Lane:
+    # sorted, merged (start, end) intervals along one row or column, stored as two parallel arrays so
+    # a lane of any size is two buffers rather than a list of tuples
+    __slots__ = ('starts', 'ends')
+
+    def __init__(self, lines=()) -> None:
+        self.starts = array('i')
+        self.ends = array('i')
+        for line in lines:
+            self.add(*line)
+
+    @classmethod
+    def from_buffers(cls, starts, ends):
+        # wraps already sorted and merged int buffers, such as memoryviews into a mapped file, without
+        # copying them. They are copied into arrays the first time the lane is changed
+        lane = cls.__new__(cls)
+        lane.starts = starts
+        lane.ends = ends
+        return lane
+
+    def add(self, start: int, end: int):
+        if start > end:
+            start, end = end, start
+        if not isinstance(self.starts, array):
+            self.starts, self.ends = array('i', self.starts), array('i', self.ends)
+        starts, ends = self.starts, self.ends
+        lo = bisect_left(ends, start)
+        hi = bisect_right(starts, end)
+        if lo < hi:
+            start = min(start, starts[lo])
+            end = max(end, ends[hi - 1])
+            del starts[lo:hi]
+            del ends[lo:hi]
+        starts.insert(lo, start)
+        ends.insert(lo, end)
+
+    def remove(self, start: int, end: int):
+        # clears start..end, keeping its end points on whatever carries on past them
+        if start > end:
+            start, end = end, start
+        if not isinstance(self.starts, array):
+            self.starts, self.ends = array('i', self.starts), array('i', self.ends)
+        starts, ends = self.starts, self.ends
+        lo = bisect_right(ends, start)
+        hi = bisect_left(starts, end)
+        if lo >= hi:
+            return
+        pieces = []
+        if starts[lo] < start:
+            pieces.append((starts[lo], start))
+        if ends[hi - 1] > end:
+            pieces.append((end, ends[hi - 1]))
+        del starts[lo:hi]
+        del ends[lo:hi]
+        for piece_start, piece_end in reversed(pieces):
+            starts.insert(lo, piece_start)
+            ends.insert(lo, piece_end)
+
+    def copy(self):
+        return Lane.from_buffers(array('i', self.starts), array('i', self.ends))
+
+    def detached(self):
+        # a lane that can be changed without changing this one. Read-only buffers, such as a mapped
+        # file's, are shared, since add and remove copy them first anyway
+        return self.copy() if isinstance(self.starts, array) else Lane.from_buffers(self.starts, self.ends)
+
+    def append(self, line):
+        self.add(*line)
+
+    def covers(self, position: int) -> bool:
+        i = bisect_right(self.starts, position) - 1
+        return i >= 0 and self.ends[i] >= position
+
+    def overlapping(self, start: int, end: int):
+        i = max(bisect_left(self.ends, start), 0)
+        while i < len(self.starts) and self.starts[i] <= end:
+            yield self.starts[i], self.ends[i]
+            i += 1
+
+    def __iter__(self):
+        return zip(self.starts, self.ends)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __bool__(self):
+        return len(self.starts) > 0
+
+    def __eq__(self, other):
+        return isinstance(other, Lane) and self.starts == other.starts and self.ends == other.ends
+
+    def __str__(self) -> str:
+        return ','.join('({}, {})'.format(*line) for line in self)
+
+
+class BlockIndex:
+    # blockers by lane: horizontal lanes keyed by row, vertical lanes keyed by column
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.horizontal = {}
+        self.vertical = {}
+
+    def lanes_for_orientation(self, orientation: Orientation):
+        return self.horizontal if orientation is Orientation.HORIZONTAL else self.vertical
+
+    def add(self, orientation: Orientation, index: int, start: int, end: int):
+        lanes = self.lanes_for_orientation(orientation)
+        if index not in lanes:
+            lanes[index] = Lane()
+        lanes[index].add(start, end)
+
+    def add_block(self, block):
+        self.add(block.orientation, block.index, block.start, block.end)
+
+    def is_blocking(self, col, row, orientation: Optional[Orientation] = None):
+        if not orientation:
+            return self.is_blocking(col, row, Orientation.HORIZONTAL) or self.is_blocking(col, row,
+                                                                                          Orientation.VERTICAL)
+        if orientation is Orientation.HORIZONTAL:
+            lane = self.horizontal.get(row)
+            return lane is not None and lane.covers(col)
+        lane = self.vertical.get(col)
+        return lane is not None and lane.covers(row)
+
+    def iter_blocks(self):
+        for orientation in Orientation:
+            for index, lane in self.lanes_for_orientation(orientation).items():
+                for start, end in lane:
+                    yield orientation, index, start, end
+
+    def iter_region(self, cols: range, rows: range):
+        # blocks overlapping a region, clipped to it; a block ending on the first column or row past
+        # the region is kept so that neighbouring regions meet
+        for row in rows:
+            lane = self.horizontal.get(row)
+            if lane:
+                for start, end in lane.overlapping(cols.start, cols.stop - 1):
+                    yield Orientation.HORIZONTAL, row, max(start, cols.start), min(end, cols.stop)
+        for col in cols:
+            lane = self.vertical.get(col)
+            if lane:
+                for start, end in lane.overlapping(rows.start, rows.stop - 1):
+                    yield Orientation.VERTICAL, col, max(start, rows.start), min(end, rows.stop)
+
+    def paint_masks(self, length: int, height: int):
+        # row-major coverage bitmaps of the lanes over a length x height grid
+        blocked_horizontal = bytearray(length * height)
+        blocked_vertical = bytearray(length * height)
+        self.paint_lanes(blocked_horizontal, blocked_vertical, length, height)
+        return blocked_horizontal, blocked_vertical
+
+    def paint_lanes(self, blocked_horizontal: bytearray, blocked_vertical: bytearray, length: int, height: int):
+        for row, lane in self.horizontal.items():
+            if 0 <= row < height:
+                for start, end in lane.overlapping(0, length - 1):
+                    start, end = max(start, 0), min(end, length - 1)
+                    blocked_horizontal[row * length + start:row * length + end + 1] = b'\x01' * (end - start + 1)
+        for col, lane in self.vertical.items():
+            if 0 <= col < length:
+                for start, end in lane.overlapping(0, height - 1):
+                    start, end = max(start, 0), min(end, height - 1)
+                    blocked_vertical[start * length + col:end * length + col + 1:length] = b'\x01' * (end - start + 1)
+
+    def __len__(self):
+        return sum(map(len, self.horizontal.values())) + sum(map(len, self.vertical.values()))
+
+
+class PeriodicBlockIndex(BlockIndex):
+    # a tile repeated every `period` columns up to `length`. Tile lanes are looked up modulo the
+    # period; only borders and the parts of blocks that cross a seam are stored explicitly
+
+    def __init__(self, period: int, length: int) -> None:
+        super().__init__()
+        self.period = period
+        self.length = length
+        self.tile = BlockIndex()
+
+    def add_tile(self, orientation: Orientation, index: int, start: int, end: int):
+        period = self.period
+        if orientation is Orientation.VERTICAL:
+            if 0 <= index < period:
+                self.tile.add(orientation, index, start, end)
+            else:
+                for offset in range(0, self.length, period):
+                    if 0 <= index + offset < self.length:
+                        self.add(orientation, index + offset, start, end)
+            return
+        inside_start, inside_end = max(start, 0), min(end, period - 1)
+        if inside_start <= inside_end:
+            self.tile.add(orientation, index, inside_start, inside_end)
+        if start < inside_start or end > inside_end:
+            for offset in range(0, self.length, period):
+                for seam_start, seam_end in ((start, min(end, -1)), (max(start, period), end)):
+                    seam_start, seam_end = max(seam_start + offset, 0), min(seam_end + offset, self.length - 1)
+                    if seam_start <= seam_end:
+                        self.add(orientation, index, seam_start, seam_end)
+
+    def is_blocking(self, col, row, orientation: Optional[Orientation] = None):
+        if super().is_blocking(col, row, orientation):
+            return True
+        return 0 <= col < self.length and self.tile.is_blocking(col % self.period, row, orientation)
+
+    def iter_blocks(self):
+        yield from super().iter_blocks()
+        for offset in range(0, self.length, self.period):
+            for block in self.tile.iter_blocks():
+                orientation, index, start, end = offset_block(block, offset)
+                if orientation is Orientation.VERTICAL:
+                    if index < self.length:
+                        yield orientation, index, start, end
+                elif start < self.length:
+                    yield orientation, index, start, min(end, self.length - 1)
+
+    def iter_region(self, cols: range, rows: range):
+        # the pieces of each lane are joined up again, as a border or an explicit block can overlap the
+        # tile's blocks on the same lane, and horizontal blocks are stored split at the seams. A horizontal
+        # one that carries on past the region is kept up to cols.stop, as in BlockIndex. Split pieces end
+        # on neighbouring columns, which legal blocks on one row otherwise never do
+        pieces = {}
+        for orientation, index, start, end in self.iter_pieces(cols, rows):
+            pieces.setdefault((orientation, index), []).append((start, end))
+        for (orientation, index), lane_pieces in pieces.items():
+            horizontal = orientation is Orientation.HORIZONTAL
+            lane_pieces.sort()
+            start, end = lane_pieces[0]
+            for piece_start, piece_end in lane_pieces[1:] + [(None, None)]:
+                if piece_start is not None and piece_start <= end + horizontal:
+                    end = max(end, piece_end)
+                    continue
+                if horizontal and end == cols.stop - 1 and self.is_blocking(cols.stop, index, orientation):
+                    end = cols.stop
+                yield orientation, index, start, end
+                start, end = piece_start, piece_end
+
+    def iter_pieces(self, cols: range, rows: range):
+        yield from super().iter_region(cols, rows)
+        cols = range(cols.start, min(cols.stop, self.length))
+        period = self.period
+        for offset in range(cols.start - cols.start % period, cols.stop, period):
+            tile_cols = range(max(cols.start - offset, 0), min(cols.stop - offset, period))
+            for block in self.tile.iter_region(tile_cols, rows):
+                orientation, index, start, end = offset_block(block, offset)
+                if orientation is Orientation.HORIZONTAL:
+                    end = min(end, cols.stop, self.length - 1)
+                yield orientation, index, start, end
+
+    def paint_masks(self, length: int, height: int):
+        # paint one tile, then repeat each of its rows across the knot
+        period = self.period
+        tile_horizontal, tile_vertical = self.tile.paint_masks(period, height)
+        repeats = -(-length // period)
+        blocked_horizontal = bytearray(b''.join((tile_horizontal[row * period:(row + 1) * period] * repeats)[:length]
+                                                for row in range(height)))
+        blocked_vertical = bytearray(b''.join((tile_vertical[row * period:(row + 1) * period] * repeats)[:length]
+                                              for row in range(height)))
+        self.paint_lanes(blocked_horizontal, blocked_vertical, length, height)
+        return blocked_horizontal, blocked_vertical
+
+
 class PatternInterface:
 
     def get_length(self): raise NotImplementedError("please stop this")
 
+    def get_height(self): raise NotImplementedError("stop it")
+
     def add_block(self, line): raise NotImplementedError("cmon cmon")
 
     def append(self, pattern, orientation: Orientation = Orientation.HORIZONTAL):
         raise NotImplementedError("super super")
 
-    def repeat(self, times:int, orientation = Orientation.HORIZONTAL):
-        out = []
-        for i in range(times):
-            out.append(copy.deepcopy(self))
-        return out
-            # self.append(copy.deepcopy(self), orientation)
+    def iter_blocks(self):
+        # (orientation, index, start, end) tuples, generated on demand
+        raise NotImplementedError("no")
+
+    def iter_lines(self):
+        for block in self.iter_blocks():
+            yield Block(*block)
 
     def get_lines(self):
-        raise NotImplementedError("no")
+        return list(self.iter_lines())
+
+    def get_borders(self):
+        return [VBlock(0, 0, self.get_height() - 1),
+                VBlock(self.get_length() - 1, 0, self.get_height() - 1),
+                HBlock(0, 0, self.get_length() - 1),
+                HBlock(self.get_height() - 1, 0, self.get_length() - 1)]
+
+    def get_symmetries(self) -> frozenset:
+        # the symmetries this pattern was built with
+        return frozenset()
+
+    def repeat(self, times:int, orientation = Orientation.HORIZONTAL):
+        # the copies are identical, so they can all share one read-only view
+        return [PatternView(self)] * times
+
+    def mirrored(self, orientation: Orientation = Orientation.HORIZONTAL):
+        return MirrorView(self, orientation)
+
+    def folded(self):
+        return FoldView(self)
+
+    def inverted(self, orientation: Orientation = Orientation.HORIZONTAL):
+        return InvertView(self, orientation)
+
+    def shifted(self, offset: int, orientation: Orientation = Orientation.HORIZONTAL):
+        return OffsetView(self, offset, orientation)
+
+    def repeated(self, times: int, orientation: Orientation = Orientation.HORIZONTAL):
+        return RepeatView(self, times, orientation)
+
+    def canonical(self) -> tuple:
+        # see canonical_blocks; the declared length and height don't take part
+        return canonical_blocks(self.iter_blocks())
+
+    def fingerprint(self) -> str:
+        return blocks_fingerprint(self.iter_blocks())
+
+    def materialize(self):
+        pattern = Pattern(length=self.get_length(), height=self.get_height())
+        for orientation, index, start, end in self.iter_blocks():
+            pattern.add(index, orientation, (start, end))
+        pattern.symmetries = self.get_symmetries()
+        return pattern
+
+    def __str__(self) -> str:
+        return ','.join(list(map(str, self.iter_lines())))
 
 
 class Pattern(PatternInterface):
@@ -154,22 +495,30 @@ class Pattern(PatternInterface):
         super().__init__()
         self.vertical_lines = {}
         self.horizontal_lines = {}
+        self.symmetries = frozenset()
         self.__dict__.update(kwargs)
+        # lanes are copied, so that adding blocks later never changes the caller's dicts or lists, and
+        # the ones passed in as plain lists get normalized like everything else
+        self.vertical_lines = {index: lane.detached() if isinstance(lane, Lane) else Lane(lane)
+                               for index, lane in self.vertical_lines.items()}
+        self.horizontal_lines = {index: lane.detached() if isinstance(lane, Lane) else Lane(lane)
+                                 for index, lane in self.horizontal_lines.items()}
         for line in lines:
             self.add_block(line)
 
     def get_length(self): return self.length
     def get_height(self): return self.height
+    def get_symmetries(self): return self.symmetries
 
     def lines_for_orientation(self, orientation: Orientation):
         return self.horizontal_lines if orientation is Orientation.HORIZONTAL else self.vertical_lines
 
     def add(self, index: int, orientation: Orientation, line):
-        # TODO merge lines somehow
+        self.symmetries = frozenset()  # anything added by hand may break them
         lines = self.lines_for_orientation(orientation)
         if index not in lines:
-            lines[index] = []
-        self.lines_for_orientation(orientation)[index].append(line)
+            lines[index] = Lane()
+        lines[index].add(*line)
 
     def add_block(self, line):
         self.add(line.index, line.orientation, (line.start, line.end))
@@ -183,10 +532,10 @@ class Pattern(PatternInterface):
         starty = 0
         if (orientation is Orientation.HORIZONTAL):
             startx = self.length + 1
-            self.length += pattern.length
+            self.length += pattern.get_length()
         else:
             starty = self.height + 1
-            self.height = pattern.height
+            self.height = pattern.get_height()
 
         lines = self.get_lines()
         for line in lines:
@@ -194,57 +543,247 @@ class Pattern(PatternInterface):
             line_offset = starty if line.orientation is Orientation.VERTICAL else startx
             self.add_block(Block(line.orientation, line.index + index_offset, line.start + line_offset, line.end + line_offset))
 
-        for row, lines in pattern.vertical_lines.items():
-            for line in lines:
-                self.vertical_lines[row + starty].append((line[0] + startx, line[1] + startx))
-        for col, lines in pattern.horizontal_lines.items():
-            for line in lines:
-                self.horizontal_lines[col + startx].append((line[0] + starty, line[1] + starty))
+        # any PatternInterface, views included
+        for block_orientation, index, start, end in list(pattern.iter_blocks()):
+            if block_orientation is Orientation.VERTICAL:
+                self.add(index + starty, Orientation.VERTICAL, (start + startx, end + startx))
+            else:
+                self.add(index + startx, Orientation.HORIZONTAL, (start + starty, end + starty))
         return self
 
-    def get_lines(self):
-        out = []
+    def iter_blocks(self):
         for col, lines in self.vertical_lines.items():
             for line in lines:
-                out.append(Block(Orientation.VERTICAL, col, line[0], line[1]))
+                yield Orientation.VERTICAL, col, line[0], line[1]
         for row, lines in self.horizontal_lines.items():
             for line in lines:
-                out.append(Block(Orientation.HORIZONTAL, row, line[0], line[1]))
-        return out
-
-    def get_borders(self):
-        return [VBlock(0, 0, self.get_height() - 1),
-                VBlock(self.get_length() - 1, 0, self.get_height() - 1),
-                HBlock(0, 0, self.get_length() - 1),
-                HBlock(self.get_height() - 1, 0, self.get_length() - 1)]
+                yield Orientation.HORIZONTAL, row, line[0], line[1]
 
     def invert(self, orientation:Orientation = Orientation.HORIZONTAL):
-        return Pattern(*list(map(lambda line: line.invert(self.get_length(), orientation), self.get_lines())))
+        return self.inverted(orientation)
 
     def mirror(self, orientation:Orientation = Orientation.HORIZONTAL):
-        if orientation is Orientation.HORIZONTAL:
-            self.length = (self.length * 2) -1
-            invert = self.length - 1
-        else:
-            self.height = (self.height * 2) -1
-            invert = self.height -1
-        lines = copy.deepcopy(self.get_lines())
-        for line in lines:
-            new_block = line.invert(invert, orientation)
-            self.add_block(new_block)
-        return self
+        return self.add_reflected(MirrorView(self, orientation))
 
     def fold(self):
-        self.length = max(self.length, self.height)
-        self.height = max(self.length, self.height)
-        lines = copy.deepcopy(self.get_lines())
-        for line in lines:
-            self.add_block(line.fold())
+        return self.add_reflected(FoldView(self))
+
+    def add_reflected(self, view):
+        # in-place transform: only the reflected intervals are buffered, then merged back into the lanes
+        reflected = list(view.iter_reflected())
+        symmetries = view.get_symmetries()
+        self.length, self.height = view.get_length(), view.get_height()
+        for orientation, index, start, end in reflected:
+            self.add(index, orientation, (start, end))
+        self.symmetries = symmetries
         return self
 
 
-    def __str__(self) -> str:
-        return ','.join(list(map(str, self.get_lines())))
+def invert_block(block, length: int, orientation: Orientation = Orientation.HORIZONTAL):
+    block_orientation, index, start, end = block
+    if orientation is not block_orientation:
+        return block_orientation, length - index, start, end
+    return block_orientation, index, length - end, length - start
+
+
+def offset_block(block, offset: int, orientation: Orientation = Orientation.HORIZONTAL):
+    block_orientation, index, start, end = block
+    if orientation is not block_orientation:
+        return block_orientation, index + offset, start, end
+    return block_orientation, index, start + offset, end + offset
+
+
+def fold_block(block):
+    block_orientation, index, start, end = block
+    return (Orientation.HORIZONTAL if block_orientation is Orientation.VERTICAL else Orientation.VERTICAL,
+            index, start, end)
+
+
+# the square's eight symmetries as (transpose, flip x, flip y), applied in that order
+D4 = tuple((transpose, flip_x, flip_y) for transpose in (False, True) for flip_x in (False, True)
+           for flip_y in (False, True))
+
+
+def transform_block(block, transpose: bool = False, flip_x: bool = False, flip_y: bool = False):
+    # about the origin; negating a coordinate keeps its parity, so node types survive every symmetry
+    if transpose:
+        block = fold_block(block)
+    orientation, index, start, end = block
+    horizontal = orientation is Orientation.HORIZONTAL
+    if flip_x:
+        if horizontal:
+            start, end = -end, -start
+        else:
+            index = -index
+    if flip_y:
+        if horizontal:
+            index = -index
+        else:
+            start, end = -end, -start
+    return orientation, index, start, end
+
+
+def canonical_blocks(blocks) -> tuple:
+    # the same tuple for any blocks that differ only by duplicate or overlapping intervals, an even
+    # translation or a symmetry of the square: merged, moved to the origin and the least of the eight
+    # images, as sorted (orientation value, index, start, end) tuples
+    merged = BlockIndex()
+    for block in blocks:
+        merged.add(*block)
+    blocks = list(merged.iter_blocks())
+    if not blocks:
+        return ()
+    candidates = []
+    for symmetry in D4:
+        image = [transform_block(block, *symmetry) for block in blocks]
+        # translate by even amounts only, an odd one would swap primary and secondary nodes
+        min_x = min(start if orientation is Orientation.HORIZONTAL else index for orientation, index, start, _ in image)
+        min_y = min(index if orientation is Orientation.HORIZONTAL else start for orientation, index, start, _ in image)
+        dx, dy = min_x - min_x % 2, min_y - min_y % 2
+        candidates.append(sorted((orientation.value, index - dy, start - dx, end - dx)
+                                 if orientation is Orientation.HORIZONTAL else
+                                 (orientation.value, index - dx, start - dy, end - dy)
+                                 for orientation, index, start, end in image))
+    return tuple(min(candidates))
+
+
+def blocks_fingerprint(blocks) -> str:
+    flat = array('i', (value for block in canonical_blocks(blocks) for value in block))
+    if sys.byteorder != 'little':
+        flat.byteswap()
+    return hashlib.blake2b(flat.tobytes(), digest_size=16).hexdigest()
+
+
+class PatternView(PatternInterface):
+    # a read-only pattern defined by a transform of its base; blocks are streamed from the base on
+    # every iteration instead of being copied
+
+    def __init__(self, base: PatternInterface) -> None:
+        super().__init__()
+        self.base = base
+
+    def get_length(self): return self.base.get_length()
+    def get_height(self): return self.base.get_height()
+    def get_symmetries(self): return self.base.get_symmetries()
+
+    def iter_blocks(self):
+        return self.base.iter_blocks()
+
+
+class MirrorView(PatternView):
+
+    def __init__(self, base: PatternInterface, orientation: Orientation = Orientation.HORIZONTAL) -> None:
+        super().__init__(base)
+        self.orientation = orientation
+
+    def get_length(self):
+        length = self.base.get_length()
+        return length * 2 - 1 if self.orientation is Orientation.HORIZONTAL else length
+
+    def get_height(self):
+        height = self.base.get_height()
+        return height * 2 - 1 if self.orientation is Orientation.VERTICAL else height
+
+    def get_symmetries(self):
+        # the other axis keeps its size, so its symmetry survives
+        kept = Symmetry.VERTICAL if self.orientation is Orientation.HORIZONTAL else Symmetry.HORIZONTAL
+        return frozenset({Symmetry[self.orientation.name]} | (self.base.get_symmetries() & {kept}))
+
+    def iter_blocks(self):
+        yield from self.base.iter_blocks()
+        yield from self.iter_reflected()
+
+    def iter_reflected(self):
+        axis = (self.get_length() if self.orientation is Orientation.HORIZONTAL else self.get_height()) - 1
+        for block in self.base.iter_blocks():
+            yield invert_block(block, axis, self.orientation)
+
+
+class FoldView(PatternView):
+
+    def get_length(self): return max(self.base.get_length(), self.base.get_height())
+    def get_height(self): return self.get_length()
+
+    def get_symmetries(self):
+        # the transposed copy is only mirrored too if the base was mirrored both ways in the same square
+        mirrored = frozenset({Symmetry.HORIZONTAL, Symmetry.VERTICAL})
+        if self.base.get_length() == self.base.get_height() and mirrored <= self.base.get_symmetries():
+            return mirrored | {Symmetry.DIAGONAL}
+        return frozenset({Symmetry.DIAGONAL})
+
+    def iter_blocks(self):
+        yield from self.base.iter_blocks()
+        yield from self.iter_reflected()
+
+    def iter_reflected(self):
+        return map(fold_block, self.base.iter_blocks())
+
+
+class InvertView(PatternView):
+
+    def __init__(self, base: PatternInterface, orientation: Orientation = Orientation.HORIZONTAL) -> None:
+        super().__init__(base)
+        self.orientation = orientation
+
+    def get_symmetries(self):
+        return self.base.get_symmetries() - {Symmetry.DIAGONAL}
+
+    def iter_blocks(self):
+        # about the largest even axis that fits, so that nodes keep their type; on the default even-sized
+        # tiles that is the length or height itself
+        size = self.get_length() if self.orientation is Orientation.HORIZONTAL else self.get_height()
+        axis = size - size % 2
+        for block in self.base.iter_blocks():
+            yield invert_block(block, axis, self.orientation)
+
+
+class OffsetView(PatternView):
+
+    def __init__(self, base: PatternInterface, offset: int, orientation: Orientation = Orientation.HORIZONTAL) -> None:
+        super().__init__(base)
+        self.offset = offset
+        self.orientation = orientation
+
+    def get_length(self):
+        return self.base.get_length() + (self.offset if self.orientation is Orientation.HORIZONTAL else 0)
+
+    def get_height(self):
+        return self.base.get_height() + (self.offset if self.orientation is Orientation.VERTICAL else 0)
+
+    def get_symmetries(self):
+        kept = Symmetry.VERTICAL if self.orientation is Orientation.HORIZONTAL else Symmetry.HORIZONTAL
+        return self.base.get_symmetries() & {kept}
+
+    def iter_blocks(self):
+        for block in self.base.iter_blocks():
+            yield offset_block(block, self.offset, self.orientation)
+
+
+class RepeatView(PatternView):
+
+    def __init__(self, base: PatternInterface, times: int, orientation: Orientation = Orientation.HORIZONTAL) -> None:
+        super().__init__(base)
+        self.times = times
+        self.orientation = orientation
+
+    def stride(self):
+        return self.base.get_length() if self.orientation is Orientation.HORIZONTAL else self.base.get_height()
+
+    def get_length(self):
+        return self.base.get_length() * (self.times if self.orientation is Orientation.HORIZONTAL else 1)
+
+    def get_height(self):
+        return self.base.get_height() * (self.times if self.orientation is Orientation.VERTICAL else 1)
+
+    def get_symmetries(self):
+        # a row of mirrored tiles is still mirrored end to end
+        return self.base.get_symmetries() - {Symmetry.DIAGONAL}
+
+    def iter_blocks(self):
+        stride = self.stride()
+        for i in range(self.times):
+            for block in self.base.iter_blocks():
+                yield offset_block(block, i * stride, self.orientation)
 
 
 class HorizontalPatternGroup(PatternInterface):
@@ -255,6 +794,9 @@ class HorizontalPatternGroup(PatternInterface):
 
 
 class KnotParams:
+    length = None  # defaults to one pass through the patterns
+    periodic = False  # look the patterns up modulo their period instead of copying every repeat
+    blocks = None
 
     def __init__(self, *patterns, **kwargs) -> None:
         super().__init__()
@@ -266,14 +808,64 @@ class KnotParams:
             self.patterns = [Pattern()]
 
     def get_height(self):
-        return self.patterns[0].height
+        return self.patterns[0].get_height()
 
-    def get_length(self):
+    def get_period(self):
         sum = 0
         for p in self.patterns:
-            sum += p.length
+            sum += p.get_length()
         return sum
 
+    def get_length(self):
+        return self.length if self.length is not None else self.get_period()
+
+    def get_borders(self):
+        return [VBlock(0, 0, self.get_height() - 1),
+                VBlock(self.get_length() - 1, 0, self.get_height() - 1),
+                HBlock(0, 0, self.get_length() - 1),
+                HBlock(self.get_height() - 1, 0, self.get_length() - 1)]
+
+    def block_index(self):
+        length = self.get_length()
+        if self.periodic:
+            blocks = PeriodicBlockIndex(self.get_period(), length)
+            start_index = 0
+            for pattern in self.patterns:
+                for block in pattern.iter_blocks():
+                    blocks.add_tile(*offset_block(block, start_index))
+                start_index += pattern.get_length()
+        else:
+            blocks = BlockIndex()
+            start_index = 0
+            while start_index < length:
+                for pattern in self.patterns:
+                    for block in pattern.iter_blocks():
+                        blocks.add(*offset_block(block, start_index))
+                    start_index += pattern.get_length()
+        for block in self.get_borders():
+            blocks.add_block(block)
+        return blocks
+
+    def is_blocking(self, col, row, orientation: Optional[Orientation] = None):
+        # built on first query; call block_index() again after changing the patterns
+        if self.blocks is None:
+            self.blocks = self.block_index()
+        return self.blocks.is_blocking(col, row, orientation)
+
+    def cross_dir(self, col, row) -> Optional[Diagonal]:
+        return get_cross_dir(col, row)
+
+    def fingerprint(self) -> str:
+        # of every blocker in the knot, borders and repeats included, so equal knots match however they
+        # were split into patterns
+        return blocks_fingerprint(self.block_index().iter_blocks())
+
+    def get_symmetries(self) -> frozenset:
+        # borders are symmetric, so a knot of a single untiled pattern has that pattern's symmetries
+        if len(self.patterns) != 1 or self.get_length() != self.patterns[0].get_length():
+            return frozenset()
+        return self.patterns[0].get_symmetries()
+
 
 class ViewParams:
     unit_length = 24
@@ -284,6 +876,14 @@ class ViewParams:
     x_padding = 10
     y_padding = 10
     line_width = 12
+    polylines = False  # draw each run of a strand as one canvas item instead of one per segment
+    strand_colors = None  # cycled over the strands when set, instead of line_color
+    tiled = False  # scrollable, zoomable canvas that only draws the tiles in view
+    tile_size = 16  # cells per side of a tile
+    view_width = 960
+    view_height = 720
+    detail_unit_length = 10  # below this many pixels per unit, skip crossing gaps and helpers
+    editable = False  # click and drag on the canvas to add or clear blockers, see KnotEditor
 
     def __init__(self, line_color="black", **kwargs) -> None:
         super().__init__()
@@ -299,87 +899,630 @@ class ViewParams:
             return self.line_color
         raise ValueError('unknown node type {}'.format(node_type))
 
-
-class KnotWindow:
-    dot_ids = {}
-    line_ids = []
-    horizontal_blocks: dict = {}
-    vertical_blocks: dict = {}
-    cross_dirs = {}
-    line_hues = {}
-    helpers_hidden = True
-
-    def __init__(self, kp: KnotParams = KnotParams(), vp: ViewParams = ViewParams()) -> None:
+    def scaled(self, zoom: float):
+        return ViewParams(**dict(self.__dict__,
+                                 unit_length=self.unit_length * zoom,
+                                 crossing_gap_length=self.crossing_gap_length * zoom,
+                                 dot_radius=self.dot_radius * zoom,
+                                 x_padding=self.x_padding * zoom,
+                                 y_padding=self.y_padding * zoom,
+                                 line_width=self.line_width * zoom))
+
+    def get_strand_color(self, strand: int):
+        if not self.strand_colors:
+            return self.line_color
+        return self.strand_colors[strand % len(self.strand_colors)]
+
+    def knot_pixels(self, length: int, height: int):
+        return (self.x_padding * 2 + (length - 1) * self.unit_length,
+                self.y_padding * 2 + (height - 1) * self.unit_length)
+
+    def get_half_pixel(self, x, y):
+        half_unit = self.unit_length / 2
+        return self.x_padding + (x * half_unit), self.y_padding + (y * half_unit)
+
+    def segment_pixels(self, x1, y1, x2, y2, segment_type: int):
+        px1, py1 = self.get_half_pixel(x1, y1)
+        px2, py2 = self.get_half_pixel(x2, y2)
+        if segment_type == SegmentType.GAPPED.value:
+            px1 += (x2 - x1) * self.crossing_gap_length
+            py1 += (y2 - y1) * self.crossing_gap_length
+        return px1, py1, px2, py2
+
+    def chain_pixels(self, segments, chain):
+        # flat x, y pixel coordinates along one of StrandTracer.chains()
+        coords = []
+        for step in chain:
+            i = (step >> 1) * SEGMENT_FIELDS
+            px1, py1, px2, py2 = self.segment_pixels(*segments[i:i + SEGMENT_FIELDS])
+            if step & 1:
+                px1, py1, px2, py2 = px2, py2, px1, py1
+            if not coords:
+                coords += (px1, py1)
+            coords += (px2, py2)
+        return coords
+
+
+class SegmentType(Enum):
+    CROSSING = 1  # centre -> corner, passing over the other strand
+    GAPPED = 2  # centre -> corner, passing under: starts crossing_gap_length out from the centre
+    BOUNCE = 3  # corner -> corner, turning off a blocker
+
+
+SEGMENT_FIELDS = 5  # x1, y1, x2, y2, segment type
+HALF_DIAGONAL = sqrt(0.5)  # length of a crossing half in units
+
+# segment type after a reflection: the crossing direction and the corner move together, so the
+# strand going under swaps with the one going over
+REFLECTED_SEGMENT_TYPES = (0, SegmentType.GAPPED.value, SegmentType.CROSSING.value, SegmentType.BOUNCE.value)
+
+LINE_NODE_TABLE = bytes(int(value == NodeType.LINE.value) for value in range(256))
+FREE_TABLE = bytes(int(value == 0) for value in range(256))  # 1 for nodes blocked neither way
+BULK_NODES = 8  # line nodes in a range from which row_segments packs them a kind at a time
+
+# (corner, dx, dy) in half units, in the order the corners have always been drawn
+CORNER_OFFSETS = ((CornerDirection.LEFTUP, -1, -1),
+                  (CornerDirection.RIGHTUP, 1, -1),
+                  (CornerDirection.RIGHTDOWN, 1, 1),
+                  (CornerDirection.LEFTDOWN, -1, 1))
+
+# crossing half types by cross_dirs value, for halves with dx == dy and for the others: the strand that
+# doesn't rise with the node's crossing direction goes under
+HALF_TYPE_TABLES = {
+    same: bytes(SegmentType.CROSSING.value if (value == Diagonal.LEFTDOWN_RIGHTUP.value) != same
+                else SegmentType.GAPPED.value for value in range(256))
+    for same in (True, False)}
+
+
+def pack_segments(xs, y: int, ends, types):
+    # packed segments of the nodes at (x, y) for x in xs, in half units, each node's together: one per
+    # (dx1, dy1, dx2, dy2) in ends, relative to the node, of the matching type in types, which is a
+    # segment type or bytes of one per node. Built a field at a time with slice assignments
+    count, step = len(xs), SEGMENT_FIELDS * len(ends)
+    out = array('i', bytes(4 * count * step))
+    if not count:
+        return out
+    xs = array('i', xs)
+    for k, ((dx1, dy1, dx2, dy2), segment_type) in enumerate(zip(ends, types)):
+        at = k * SEGMENT_FIELDS
+        out[at::step] = array('i', map(operator.add, xs, repeat(dx1))) if dx1 else xs
+        out[at + 1::step] = array('i', [y + dy1]) * count
+        out[at + 2::step] = array('i', map(operator.add, xs, repeat(dx2))) if dx2 else xs
+        out[at + 3::step] = array('i', [y + dy2]) * count
+        out[at + 4::step] = array('i', iter(segment_type)) if isinstance(segment_type, bytes) \
+            else array('i', [segment_type]) * count
+    return out
+
+
+def segment_cell(x1, y1, x2, y2, segment_type: int):
+    # the line node a segment was generated for. Crossing halves start at its centre; a bounce runs along
+    # one side of it, and of the two cells sharing that side only one is a line node
+    if segment_type != SegmentType.BOUNCE.value:
+        return x1 // 2, y1 // 2
+    if x1 == x2:
+        row = (y1 + 1) // 2
+        col = (x1 - 1) // 2
+        return (col, row) if (col + row) % 2 else (col + 1, row)
+    col = (x1 + 1) // 2
+    row = (y1 - 1) // 2
+    return (col, row) if (col + row) % 2 else (col, row + 1)
+
+
+class KnotEngine:
+    # Headless knot geometry. Grids are flat row-major bytearrays indexed by row * length + col,
+    # segments are packed SEGMENT_FIELDS at a time into an array('i') in half-unit coordinates:
+    # a cell centre is at (2 * col, 2 * row) and its corners at (2 * col +- 1, 2 * row +- 1).
+    editing = False
+
+    def __init__(self, kp: KnotParams, use_symmetry: bool = True, blocks: Optional[BlockIndex] = None) -> None:
         super().__init__()
         self.kp = kp
-        self.vp = vp
+        self.length = kp.get_length()
+        self.height = kp.get_height()
+        self.strands = None
+
+        self.setup_blocks(blocks)
+        self.setup_crosses()
+        self.symmetries = self.check_symmetries(kp.get_symmetries()) if use_symmetry else frozenset()
+        self.computed_segments = None
+
+    @classmethod
+    def from_geometry(cls, kp: KnotParams, blocks: BlockIndex, blocked_horizontal, blocked_vertical,
+                      symmetries: frozenset, segments=None):
+        # wraps geometry computed earlier for the same blocks, such as a cached one, without recomputing
+        # or copying it. Segments left out are computed when first asked for
+        engine = cls.__new__(cls)
+        engine.kp = kp
+        engine.length = kp.get_length()
+        engine.height = kp.get_height()
+        engine.strands = None
+        engine.blocks = blocks
+        engine.blocked_horizontal, engine.blocked_vertical = blocked_horizontal, blocked_vertical
+        engine.setup_crosses()
+        engine.symmetries = symmetries
+        engine.computed_segments = segments
+        return engine
+
+    def index(self, col, row):
+        return row * self.length + col
+
+    def setup_blocks(self, blocks: Optional[BlockIndex] = None):
+        self.blocks = self.kp.block_index() if blocks is None else blocks
+        self.blocked_horizontal, self.blocked_vertical = self.blocks.paint_masks(self.length, self.height)
+
+    def setup_crosses(self):
+        # see get_cross_dir
+        length = self.length
+        even_types = bytes(NodeType.PRIMARY.value if col % 2 == 0 else NodeType.LINE.value for col in range(length))
+        odd_types = bytes(NodeType.LINE.value if col % 2 == 0 else NodeType.SECONDARY.value for col in range(length))
+        even_dirs = bytes(0 if col % 2 == 0 else Diagonal.LEFTDOWN_RIGHTUP.value for col in range(length))
+        odd_dirs = bytes(Diagonal.LEFTUP_RIGHTDOWN.value if col % 2 == 0 else 0 for col in range(length))
+        self.node_types = bytearray(b''.join(odd_types if row % 2 else even_types for row in range(self.height)))
+        self.cross_dirs = bytearray(b''.join(odd_dirs if row % 2 else even_dirs for row in range(self.height)))
+
+    @property
+    def segments(self):
+        # the whole knot's segments, only computed when first asked for
+        if self.computed_segments is None:
+            self.setup_segments()
+        return self.computed_segments
+
+    def setup_segments(self):
+        if self.symmetries:
+            self.computed_segments = self.symmetric_segments()
+        else:
+            self.computed_segments = self.region_segments(range(self.height), range(self.length))
+
+    def trace_strands(self):
+        if self.strands is None:
+            self.strands = StrandTracer(self)
+        return self.strands
+
+    def check_symmetries(self, symmetries) -> frozenset:
+        # keep only the recorded symmetries the blocker masks actually have
+        length, height = self.length, self.height
+        blocked_horizontal, blocked_vertical = self.blocked_horizontal, self.blocked_vertical
+        out = set()
+        if Symmetry.HORIZONTAL in symmetries and length % 2 == 1:
+            if all(mask[row * length:(row + 1) * length] == mask[row * length:(row + 1) * length][::-1]
+                   for mask in (blocked_horizontal, blocked_vertical) for row in range(height)):
+                out.add(Symmetry.HORIZONTAL)
+        if Symmetry.VERTICAL in symmetries and height % 2 == 1:
+            if all(mask[row * length:(row + 1) * length] == mask[(height - 1 - row) * length:(height - row) * length]
+                   for mask in (blocked_horizontal, blocked_vertical) for row in range(height // 2)):
+                out.add(Symmetry.VERTICAL)
+        # a diagonal with only one mirror would imply the other, so that combination can't check out
+        if Symmetry.DIAGONAL in symmetries and length == height and len(out) != 1:
+            transposed = all(blocked_vertical[i::length] == blocked_horizontal[i * length:(i + 1) * length]
+                             for i in range(length))
+            # a line node blocked both ways bounces vertically, which doesn't transpose
+            line_nodes = self.node_types.translate(LINE_NODE_TABLE)
+            double_blocked = int.from_bytes(blocked_horizontal, 'big') & int.from_bytes(blocked_vertical, 'big') \
+                & int.from_bytes(line_nodes, 'big')
+            if transposed and not double_blocked:
+                out.add(Symmetry.DIAGONAL)
+        return frozenset(out)
+
+    def region_segments(self, rows: range, cols: range):
+        out = array('i')
+        for row in rows:
+            out.extend(self.row_segments(row, cols))
+        return out
 
-        self.setup_blocks()
+    def reflect_segments(self, segments, horizontal=False, vertical=False, diagonal=False):
+        # reflect whole columns of the packed segments at once; the transpose is applied first
+        out = array('i', segments)
+        x1, y1, x2, y2 = (segments[i::SEGMENT_FIELDS] for i in range(4))
+        if diagonal:
+            x1, y1, x2, y2 = y1, x1, y2, x2
+        # bounces keep running left to right and top to bottom, so their ends swap as well
+        types, bounce = segments[4::SEGMENT_FIELDS], SegmentType.BOUNCE.value
+        if horizontal:
+            width = 2 * (self.length - 1)
+            x1, x2 = (array('i', [width - (b if t == bounce else a) for a, b, t in zip(x1, x2, types)]),
+                      array('i', [width - (a if t == bounce else b) for a, b, t in zip(x1, x2, types)]))
+        if vertical:
+            depth = 2 * (self.height - 1)
+            y1, y2 = (array('i', [depth - (b if t == bounce else a) for a, b, t in zip(y1, y2, types)]),
+                      array('i', [depth - (a if t == bounce else b) for a, b, t in zip(y1, y2, types)]))
+        out[0::SEGMENT_FIELDS], out[1::SEGMENT_FIELDS], out[2::SEGMENT_FIELDS], out[3::SEGMENT_FIELDS] = x1, y1, x2, y2
+        if (horizontal + vertical + diagonal) % 2:
+            out[4::SEGMENT_FIELDS] = array('i', [REFLECTED_SEGMENT_TYPES[t] for t in types])
+        return out
 
-        window = tk.Tk()
-        greeting = tk.Label(text="Knots")
-        greeting.pack()
-        canvas = tk.Canvas(window, bg="white", height=self.max_y() + self.vp.y_padding,
-                           width=self.max_x() + self.vp.x_padding)
-        self.canvas = canvas
-        canvas.pack()
-        self.draw_init()
-        hide_helpers_button = tk.Button(window, text="Toggle (H)elpers", command=self.toggle_helpers)
-        hide_helpers_button.pack(padx=10, pady=10, side=tk.LEFT)
-        # h_sym = tk.IntVar()
-        # h_symmetry_button = Checkbutton(window, text="Horizontal Symmetry", variable=h_sym)
-        # h_symmetry_button.pack(padx=10,pady=10, side=tk.LEFT)
-        # v_sym = tk.IntVar()
-        # v_symmetry_button = Checkbutton(window, text="Vertical Symmetry", variable=v_sym)
-        # v_symmetry_button.pack(padx=10,pady=10, side=tk.LEFT)
+    def symmetric_segments(self):
+        # only the fundamental region is computed cell by cell, the rest is reflected from it
+        horizontal = Symmetry.HORIZONTAL in self.symmetries
+        vertical = Symmetry.VERTICAL in self.symmetries
+        axis_col = (self.length - 1) // 2 if horizontal else self.length
+        axis_row = (self.height - 1) // 2 if vertical else self.height
+        rows, cols = range(axis_row), range(axis_col)
+        if Symmetry.DIAGONAL in self.symmetries:
+            # cells on the diagonal are nodes, so the two triangles split the quadrant exactly
+            triangle = array('i')
+            for row in rows:
+                triangle.extend(self.row_segments(row, range(row + 1, axis_col)))
+            quadrant = triangle + self.reflect_segments(triangle, diagonal=True)
+        else:
+            quadrant = self.region_segments(rows, cols)
+        out = array('i', quadrant)
+        if horizontal:
+            axis_column = self.region_segments(rows, range(axis_col, axis_col + 1))
+            out += self.reflect_segments(quadrant, horizontal=True) + axis_column
+        if vertical:
+            if Symmetry.DIAGONAL in self.symmetries:
+                axis_line = self.reflect_segments(axis_column, diagonal=True)
+            else:
+                axis_line = self.region_segments(range(axis_row, axis_row + 1), cols)
+            out += self.reflect_segments(quadrant, vertical=True) + axis_line
+        if horizontal and vertical:
+            out += self.reflect_segments(quadrant, horizontal=True, vertical=True)
+            out += self.reflect_segments(axis_column, vertical=True)
+            out += self.reflect_segments(axis_line, horizontal=True)
+            out += self.region_segments(range(axis_row, axis_row + 1), range(axis_col, axis_col + 1))
+        return out
 
-        # Hotkeys
-        window.bind('h', lambda e: self.toggle_helpers())
-        window.bind('H', lambda e: self.toggle_helpers())
+    def begin_editing(self):
+        # edits change the masks in place, so stop sharing them (with a cache, say), and expand a periodic
+        # index so that every lane of the knot can be changed on its own
+        if self.editing:
+            return
+        if isinstance(self.blocks, PeriodicBlockIndex):
+            blocks = BlockIndex()
+            for block in self.blocks.iter_blocks():
+                blocks.add(*block)
+            self.blocks = blocks
+        self.blocked_horizontal = bytearray(self.blocked_horizontal)
+        self.blocked_vertical = bytearray(self.blocked_vertical)
+        self.editing = True
+
+    def lane(self, orientation: Orientation, index: int) -> Lane:
+        # the lane as stored, to be copied rather than changed
+        return self.blocks.lanes_for_orientation(orientation).get(index) or Lane()
+
+    def lane_changes(self, orientation: Orientation, index: int, lane: Lane):
+        # the nodes, as (col, row), whose blocking set_lane would change, looking only at the positions
+        # the lane covers now or would cover
+        if orientation is Orientation.HORIZONTAL:
+            mask, limit, inside = self.blocked_horizontal, self.length, 0 <= index < self.height
+        else:
+            mask, limit, inside = self.blocked_vertical, self.height, 0 <= index < self.length
+        changed = []
+        if inside:
+            seen = set()
+            for start, end in list(self.lane(orientation, index)) + list(lane):
+                for position in range(max(start, 0), min(end, limit - 1) + 1):
+                    col, row = (position, index) if orientation is Orientation.HORIZONTAL else (index, position)
+                    if (col, row) not in seen and mask[self.index(col, row)] != lane.covers(position):
+                        seen.add((col, row))
+                        changed.append((col, row))
+        return changed
+
+    def set_lane(self, orientation: Orientation, index: int, lane: Lane):
+        # replaces one lane and repaints only the nodes it covered before or covers now. Returns the
+        # nodes whose blocking changed, as (col, row); only line nodes among them have new segments
+        self.begin_editing()
+        changed = self.lane_changes(orientation, index, lane)
+        lanes = self.blocks.lanes_for_orientation(orientation)
+        lanes.pop(index, None)
+        if lane:
+            lanes[index] = lane
+        mask = self.blocked_horizontal if orientation is Orientation.HORIZONTAL else self.blocked_vertical
+        for col, row in changed:
+            mask[self.index(col, row)] ^= 1
+        # whatever was derived from the whole knot is out of date
+        self.symmetries = frozenset()
+        self.computed_segments = None
+        self.strands = None
+        return changed
 
-        window.mainloop()
+    def is_blocking(self, col, row, orientation: Optional[Orientation] = None):
+        if not (0 <= col < self.length and 0 <= row < self.height):
+            return self.blocks.is_blocking(col, row, orientation)
+        i = self.index(col, row)
+        if orientation is Orientation.HORIZONTAL:
+            return bool(self.blocked_horizontal[i])
+        if orientation is Orientation.VERTICAL:
+            return bool(self.blocked_vertical[i])
+        return bool(self.blocked_horizontal[i] or self.blocked_vertical[i])
+
+    def cross_dir(self, col, row) -> Optional[Diagonal]:
+        value = self.cross_dirs[self.index(col, row)]
+        return Diagonal(value) if value else None
+
+    def get_corners(self, col, row):
+        # corners that stay inside the knot, as (corner, dx, dy)
+        left, right = col > 0, col < self.length - 1
+        up, down = row > 0, row < self.height - 1
+        return tuple(corner for corner in CORNER_OFFSETS
+                     if (left if corner[1] < 0 else right) and (up if corner[2] < 0 else down))
+
+    def strands_near(self, cells):
+        # the segments of every strand through the given nodes or through one of their corners, found by
+        # walking the masks rather than tracing the whole knot. After an edit, only strands near the
+        # nodes it changed can have changed
+        cell_segments = {}
+
+        def segments_of(col, row):
+            found = cell_segments.get((col, row))
+            if found is None:
+                found = []
+                if 0 <= col < self.length and 0 <= row < self.height:
+                    packed = self.row_segments(row, range(col, col + 1))
+                    found = [tuple(packed[i:i + SEGMENT_FIELDS]) for i in range(0, len(packed), SEGMENT_FIELDS)]
+                cell_segments[col, row] = found
+            return found
+
+        def ends(segment):
+            # the corners a segment ends on; a crossing half starts at its node's centre
+            x1, y1, x2, y2, segment_type = segment
+            return ((x1, y1), (x2, y2)) if segment_type == SegmentType.BOUNCE.value else ((x2, y2),)
+
+        def joined(segment):
+            # the segments sharing an end with this one: the opposite half through a crossing's centre,
+            # and the other segment ending on each corner
+            x1, y1, x2, y2, segment_type = segment
+            if segment_type != SegmentType.BOUNCE.value:
+                opposite = (x1, y1, 2 * x1 - x2, 2 * y1 - y2)
+                yield from (other for other in segments_of(x1 // 2, y1 // 2) if other[:4] == opposite)
+            for x, y in ends(segment):
+                for col in ((x - 1) // 2, (x + 1) // 2):
+                    for row in ((y - 1) // 2, (y + 1) // 2):
+                        for other in segments_of(col, row):
+                            if other is not segment and (x, y) in ends(other):
+                                yield other
+
+        # a node's own segments and, of the ones diagonally next to it, those ending on its corners.
+        # Neighbouring nodes share neighbours, so these are deduplicated in order
+        todo = {}
+        for col, row in cells:
+            todo.update(dict.fromkeys(segments_of(col, row)))
+            corners = {(2 * col + dx, 2 * row + dy) for _, dx, dy in CORNER_OFFSETS}
+            for _, dx, dy in CORNER_OFFSETS:
+                todo.update((segment, None) for segment in segments_of(col + dx, row + dy)
+                            if not corners.isdisjoint(ends(segment)))
+        todo = list(todo)
+        seen = set(todo)
+        out = array('i')
+        while todo:
+            segment = todo.pop()
+            out.extend(segment)
+            for other in joined(segment):
+                if other not in seen:
+                    seen.add(other)
+                    todo.append(other)
+        return out
+
+    def row_segments(self, row, cols: Optional[range] = None):
+        # a row's segments a kind of node at a time rather than node by node: vertical bounces, horizontal
+        # bounces, then crossings, picked out of the masks with compress and packed by pack_segments. Nodes
+        # on the left and right edges, which lose some of their segments, go through node_segments, as do
+        # ranges too short to make up for the setup, such as a single edited node
+        if cols is None:
+            cols = range(self.length)
+        length = self.length
+        first = cols.start + (cols.start + row + 1) % 2  # line nodes have odd col + row
+        stop = cols.stop
+        if len(range(first, stop, 2)) < BULK_NODES:
+            return self.node_segments(row, range(first, stop, 2))
+        edges = []
+        if first == 0 < stop:
+            edges.append(0)
+            first = 2
+        if first <= length - 1 < stop and (length - 1 - first) % 2 == 0:
+            edges.append(length - 1)
+            stop = length - 1
+        out = array('i')
+        nodes = range(first, stop, 2)
+        if nodes:
+            y = 2 * row
+            up, down = row > 0, row < self.height - 1
+            span = slice(row * length + first, row * length + stop, 2)
+            vertical, horizontal = self.blocked_vertical[span], self.blocked_horizontal[span]
+            xs = range(2 * first, 2 * stop, 4)
+            bounce = SegmentType.BOUNCE.value
+            if up and down:
+                out += pack_segments(list(compress(xs, vertical)), y, ((-1, -1, -1, 1), (1, -1, 1, 1)),
+                                     (bounce, bounce))
+            ends = ((-1, -1, 1, -1),) * up + ((-1, 1, 1, 1),) * down
+            out += pack_segments(list(compress(xs, map(operator.gt, horizontal, vertical))), y, ends,
+                                 (bounce,) * len(ends))
+            free = bytes(map(operator.or_, vertical, horizontal)).translate(FREE_TABLE)
+            dirs = bytes(compress(self.cross_dirs[span], free))
+            corners = [(dx, dy) for _, dx, dy in CORNER_OFFSETS if (up if dy < 0 else down)]
+            out += pack_segments(list(compress(xs, free)), y, [(0, 0, dx, dy) for dx, dy in corners],
+                                 [dirs.translate(HALF_TYPE_TABLES[dx == dy]) for dx, dy in corners])
+        for col in edges:
+            out += self.node_segments(row, range(col, col + 1))
+        return out
 
-    def setup_blocks(self):
-        # init borders
-        for col in range(self.kp.get_length()):
-            if col not in self.vertical_blocks:
-                self.vertical_blocks[col] = []
-        for row in range(self.kp.get_height()):
-            if row not in self.horizontal_blocks:
-                self.horizontal_blocks[row] = []
-        pattern = self.kp.patterns[0]
-        pattern.add_blocks(pattern.get_borders())
-
-        # input
-        start_index = 0
-        while start_index < self.kp.get_length():
-            for pattern in self.kp.patterns:
-                if pattern:  # TODO fix
-                    for col in pattern.vertical_lines:
-                        self.vertical_blocks[col + start_index] = pattern.vertical_lines[col]
-                    for row in pattern.horizontal_lines:
-                        for blocker in pattern.horizontal_lines[row]:
-                            self.horizontal_blocks[row].append((blocker[0] + start_index, blocker[1] + start_index))
-                    start_index += pattern.length
-
-        # setup crosses
-        queue = deque()
-        start = (1, 2)
-        self.cross_dirs[start] = Diagonal.LEFTDOWN_RIGHTUP
-        queue.append(start)
-        while queue:
-            next_node = queue.popleft()
-            old_polarity = self.cross_dirs[next_node]
-            new_polarity = Diagonal.LEFTUP_RIGHTDOWN if old_polarity == Diagonal.LEFTDOWN_RIGHTUP else Diagonal.LEFTDOWN_RIGHTUP
-            neighbors = self.get_neighbors(*next_node)
-            for neighbor in neighbors:
-                if neighbor not in self.cross_dirs:
-                    queue.append(neighbor)
-                    self.cross_dirs[neighbor] = new_polarity  # if not self.is_blocking(*neighbor) else old_polarity
+    def node_segments(self, row, nodes: range):
+        # the segments of a row's line nodes in nodes, node by node, in the order row_segments packs them
+        out = []
+        base = row * self.length
+        blocked_horizontal, blocked_vertical, cross_dirs = self.blocked_horizontal, self.blocked_vertical, self.cross_dirs
+        up, down = row > 0, row < self.height - 1
+        y = 2 * row
+        for col in nodes:
+            x = 2 * col
+            i = base + col
+            if blocked_vertical[i]:
+                # lines bounce off a block
+                if up and down:
+                    if col > 0:
+                        out.extend((x - 1, y - 1, x - 1, y + 1, SegmentType.BOUNCE.value))
+                    if col < self.length - 1:
+                        out.extend((x + 1, y - 1, x + 1, y + 1, SegmentType.BOUNCE.value))
+            elif blocked_horizontal[i]:
+                if col > 0 and col < self.length - 1:
+                    if up:
+                        out.extend((x - 1, y - 1, x + 1, y - 1, SegmentType.BOUNCE.value))
+                    if down:
+                        out.extend((x - 1, y + 1, x + 1, y + 1, SegmentType.BOUNCE.value))
+            else:
+                # normal two lines crossing, the strand going under gets a gap
+                rising = cross_dirs[i] == Diagonal.LEFTDOWN_RIGHTUP.value
+                for corner, dx, dy in self.get_corners(col, row):
+                    out.extend((x, y, x + dx, y + dy,
+                                SegmentType.CROSSING.value if (dx == dy) != rising else SegmentType.GAPPED.value))
+        return array('i', out)
+
+
+class StrandTracer:
+    # groups the engine's segments into continuous cords. Segment ends are numbered segment * 2 + end,
+    # end 0 being (x1, y1). Every corner joins at most two segment ends and every crossing joins its two
+    # opposite halves, so each point gets one slot in a flat array: corners sit on (odd, odd) half-unit
+    # points, and a crossing uses (centre x + 1, centre y) for its rising pair and the centre itself for
+    # the other. Matching ends are linked, and a union-find over the links numbers the cords. Segments
+    # default to the whole knot's, but may be any complete strands of it, as from strands_near
+
+    def __init__(self, engine: KnotEngine, segments=None) -> None:
+        super().__init__()
+        self.engine = engine
+        if segments is None:
+            segments = engine.segments
+        self.segments = segments
+        count = len(segments) // SEGMENT_FIELDS
+        width = 2 * engine.length + 1
+        slots = array('i', [-1]) * (width * (2 * engine.height + 1))
+        links = array('i', [-1]) * (2 * count)
+        parent = array('i', range(count))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        def join(end, key):
+            other = slots[key]
+            if other < 0:
+                slots[key] = end
+            else:
+                links[end], links[other] = other, end
+                a, b = find(end >> 1), find(other >> 1)
+                if a != b:
+                    parent[max(a, b)] = min(a, b)
+
+        bounce = SegmentType.BOUNCE.value
+        columns = (segments[field::SEGMENT_FIELDS] for field in range(SEGMENT_FIELDS))
+        for i, (x1, y1, x2, y2, segment_type) in enumerate(zip(*columns)):
+            join(2 * i + 1, y2 * width + x2)
+            if segment_type == bounce:
+                join(2 * i, y1 * width + x1)
+            else:
+                join(2 * i, y1 * width + x1 + ((x2 - x1) != (y2 - y1)))
+        self.links = links
+
+        # number strands in order of first appearance
+        self.strand_ids = array('i', [0]) * count
+        self.lengths = []
+        numbers = {}
+        for i, segment_type in enumerate(segments[4::SEGMENT_FIELDS]):
+            root = find(i)
+            strand = numbers.get(root)
+            if strand is None:
+                strand = numbers[root] = len(numbers)
+                self.lengths.append(0.0)
+            self.strand_ids[i] = strand
+            self.lengths[strand] += 1.0 if segment_type == bounce else HALF_DIAGONAL
+        self.count = len(numbers)
+
+        # a cord with a loose end ran off the edge of the knot
+        self.closed = [True] * self.count
+        for end, link in enumerate(links):
+            if link < 0:
+                self.closed[self.strand_ids[end >> 1]] = False
+
+    def chains(self, break_at_gaps: bool = True):
+        # ordered runs of connected segments, each step being the end a segment is entered from. Runs
+        # stop at loose ends and, unless told otherwise, at the gap of every crossing a strand goes under
+        links = self.links
+        gapped = SegmentType.GAPPED.value
+        types = self.segments[4::SEGMENT_FIELDS]
+        visited = bytearray(len(types))
+
+        def next_end(end):
+            if break_at_gaps and end % 2 == 0 and types[end >> 1] == gapped:
+                return -1
+            return links[end]
+
+        def walk(end):
+            chain = array('i')
+            while end >= 0 and not visited[end >> 1]:
+                visited[end >> 1] = 1
+                chain.append(end)
+                end = next_end(end ^ 1)
+            return chain
+
+        # runs with a loose end first, then whatever is left is a closed loop
+        for end in range(2 * len(types)):
+            if not visited[end >> 1] and next_end(end) < 0:
+                yield walk(end)
+        for i in range(len(types)):
+            if not visited[i]:
+                yield walk(2 * i)
+
+    def keys(self):
+        # one key per strand that doesn't depend on the order segments came in: its least segment, as
+        # (x1, y1, x2, y2). The same strand traced from the whole knot or from strands_near gets the same
+        keys = [None] * self.count
+        segments = self.segments
+        for i, strand in enumerate(self.strand_ids):
+            key = tuple(segments[i * SEGMENT_FIELDS:i * SEGMENT_FIELDS + 4])
+            if keys[strand] is None or key < keys[strand]:
+                keys[strand] = key
+        return keys
+
+    def total_length(self):
+        return sum(self.lengths)
+
+    def __len__(self):
+        return self.count
+
+    def __str__(self) -> str:
+        return '{} strands, {} closed, {:.1f} units'.format(self.count, sum(self.closed), self.total_length())
+
+
+class KnotView:
+    # draws one knot onto a canvas, either all at once or tile by tile as the viewport moves
+    helpers_hidden = True
+    drawing_tag = None
+    edit_tag = None  # the cell or lane being drawn, when items are tagged for editing
+
+    def __init__(self, canvas, engine: KnotEngine, vp: ViewParams = ViewParams()) -> None:
+        super().__init__()
+        self.canvas = canvas
+        self.engine = engine
+        self.kp = engine.kp
+        self.base_vp = vp
+        self.vp = vp
+        self.zoom = 1.0
+        self.tiles = {}
+        self.update_pending = False
+        # per view, so that several knots can be drawn in one process without sharing items
+        self.dot_ids = {}
+        self.line_ids = []
+        self.line_hues = {}
+        self.strand_hues = {}  # by strand key, when items are tagged for editing
+        self.strand_count = 0  # strands given a colour so far
+
+    def release(self):
+        # deletes everything this view drew and lets go of its engine; the view can't be drawn again
+        self.clear_tiles()
+        self.canvas.delete(*self.line_ids, *self.dot_ids.values())
+        self.line_ids.clear()
+        self.dot_ids.clear()
+        self.line_hues.clear()
+        self.strand_hues.clear()
+        self.engine = self.kp = None
 
     def get_pixel(self, col, row):
         return self.vp.x_padding + (col * self.vp.unit_length), self.vp.y_padding + (row * self.vp.unit_length)
 
+    def get_half_pixel(self, x, y):
+        return self.vp.get_half_pixel(x, y)
+
     def max_y(self):
         return self.vp.y_padding + (self.kp.get_height() - 1) * self.vp.unit_length
 
@@ -389,73 +1532,72 @@ class KnotWindow:
     def by_primary_index(self, col, row):
         pass
 
-    def get_neighbors(self, col, row):
-        out = [(col - 1, row - 1), (col + 1, row - 1), (col + 1, row + 1), (col - 1, row + 1)]
-        return filter(
-            lambda coord: 0 <= coord[0] < self.kp.get_length() and 0 <= coord[1] < self.kp.get_height(), out)
-
-    def get_corners(self, x, y):
-        half_unit = self.vp.unit_length / 2
-        out: dict = {CornerDirection.LEFTUP: (x - half_unit, y - half_unit),
-                     CornerDirection.RIGHTUP: (x + half_unit, y - half_unit),
-                     CornerDirection.RIGHTDOWN: (x + half_unit, y + half_unit),
-                     CornerDirection.LEFTDOWN: (x - half_unit, y + half_unit)}
-        return dict(
-            filter(lambda coord: 0 <= coord[1][0] < self.max_x() and 0 <= coord[1][1] < self.max_y(), out.items()))
-
     def is_blocking(self, col, row, orientation: Optional[Orientation] = None):
-        if not orientation:
-            return self.is_blocking(col, row, Orientation.HORIZONTAL) or self.is_blocking(col, row,
-                                                                                          Orientation.VERTICAL)
-        if orientation == Orientation.HORIZONTAL:
-            blocks = self.horizontal_blocks[row]
-            lane_index: int = col
-        else:
-            blocks = self.vertical_blocks[col]
-            lane_index: int = row
-        for block in blocks:
-            block_start: int = block[0]
-            block_end: int = block[1]
-            if block_start <= lane_index <= block_end:
-                return True
-        return False
+        return self.engine.is_blocking(col, row, orientation)
 
     def toggle_helpers(self):
         self.helpers_hidden = not self.helpers_hidden
         self.canvas.itemconfigure(TAG_HELPER, state='hidden' if self.helpers_hidden else 'normal')
 
-    def draw_lines_crossing(self, col, row):
-        x, y = self.get_pixel(col, row)
-        corners = self.get_corners(x, y)
-        for corner in corners.items():
-            corner_type = corner[0]
-            corner_coords = corner[1]
-            crossing_adjusted_x = x
-            crossing_adjusted_y = y
-            cross_direction = self.cross_dirs[(col, row)]
-            if not self.is_blocking(col, row):
-                if (cross_direction == Diagonal.LEFTDOWN_RIGHTUP
-                    and corner_type == CornerDirection.LEFTUP) or \
-                        (cross_direction == Diagonal.LEFTUP_RIGHTDOWN
-                         and corner_type == CornerDirection.LEFTDOWN):
-                    crossing_adjusted_x = x - self.vp.crossing_gap_length
-                elif (cross_direction == Diagonal.LEFTDOWN_RIGHTUP
-                      and corner_type == CornerDirection.RIGHTDOWN) or (
-                        cross_direction == Diagonal.LEFTUP_RIGHTDOWN
-                        and corner_type == CornerDirection.RIGHTUP):
-                    crossing_adjusted_x = x + self.vp.crossing_gap_length
-                if (cross_direction == Diagonal.LEFTDOWN_RIGHTUP
-                    and corner_type == CornerDirection.LEFTUP) or \
-                        (cross_direction == Diagonal.LEFTUP_RIGHTDOWN
-                         and corner_type == CornerDirection.RIGHTUP):
-                    crossing_adjusted_y = y - self.vp.crossing_gap_length
-                elif (cross_direction == Diagonal.LEFTDOWN_RIGHTUP
-                      and corner_type == CornerDirection.RIGHTDOWN) or (
-                        cross_direction == Diagonal.LEFTUP_RIGHTDOWN
-                        and corner_type == CornerDirection.LEFTDOWN):
-                    crossing_adjusted_y = y + self.vp.crossing_gap_length
-
-            self.create_line(crossing_adjusted_x, crossing_adjusted_y, *corner_coords, capstyle='butt')
+    def segment_pixels(self, x1, y1, x2, y2, segment_type: int):
+        return self.vp.segment_pixels(x1, y1, x2, y2, segment_type)
+
+    def draw_segment(self, x1, y1, x2, y2, segment_type: int, color: str = None):
+        pixels = self.segment_pixels(x1, y1, x2, y2, segment_type)
+        if segment_type == SegmentType.BOUNCE.value:
+            self.create_line(*pixels, color=color)
+        else:
+            self.create_line(*pixels, color=color, capstyle='butt')
+
+    def draw_polylines(self):
+        for _ in self.iter_draw_polylines():
+            pass
+
+    def iter_draw_polylines(self):
+        # yields the number of segments drawn so far after each polyline
+        yield from self.iter_draw_strands(self.engine.segments, self.engine.trace_strands(), self.line_hues, True)
+
+    def iter_draw_strands(self, segments, strands: StrandTracer, hues, polylines: bool):
+        # yields the number of segments drawn so far. hues are colours by strand id, the line colour where
+        # missing. When editing, every item is tagged with its strand's key, see redraw_strands
+        keys = strands.keys() if self.tags_cells() else None
+        if keys is not None and self.vp.strand_colors:
+            self.strand_hues.update((key, hues[strand]) for strand, key in enumerate(keys))
+        if polylines:
+            drawn = 0
+            for chain in strands.chains(self.vp.crossing_gap_length > 0):
+                strand = strands.strand_ids[chain[0] >> 1]
+                self.edit_tag = strand_tag(keys[strand]) if keys else None
+                self.create_polyline(self.vp.chain_pixels(segments, chain), color=hues.get(strand))
+                drawn += len(chain)
+                yield drawn
+        else:
+            for i in range(len(segments) // SEGMENT_FIELDS):
+                strand = strands.strand_ids[i]
+                self.edit_tag = strand_tag(keys[strand]) if keys else None
+                self.draw_segment(*segments[i * SEGMENT_FIELDS:(i + 1) * SEGMENT_FIELDS], color=hues.get(strand))
+                yield i + 1
+        self.edit_tag = None
+
+    def item_tags(self, *tags):
+        return tags + tuple(tag for tag in (self.drawing_tag, self.edit_tag) if tag)
+
+    def tags_cells(self):
+        # items are tagged by cell and lane so that an edit can replace just its own, see redraw_cells
+        return self.vp.editable and not self.vp.tiled
+
+    def helper_state(self):
+        return 'hidden' if self.helpers_hidden else 'normal'
+
+    def create_polyline(self, coords, color: str = None):
+        if color is None:
+            color = self.vp.line_color
+        self.line_ids.append(self.canvas.create_line(*coords,
+                                                     tags=self.item_tags(TAG_LINE, TAG_KNOT),
+                                                     width=self.vp.line_width,
+                                                     fill=color,
+                                                     capstyle='butt',
+                                                     joinstyle='round'))
 
     def create_line(self, x1, y1, x2, y2, node_type: NodeType = NodeType.LINE, state=None,
                     width: Optional[float] = None, color: str = None, capstyle:str = 'round'):
@@ -464,11 +1606,11 @@ class KnotWindow:
         if width is None:
             width = self.vp.line_width
         if state is None:
-            state = 'normal' if node_type is NodeType.LINE else 'hidden'
+            state = 'normal' if node_type is NodeType.LINE else self.helper_state()
         if node_type is NodeType.LINE:
-            tags = (TAG_LINE, TAG_KNOT)
+            tags = self.item_tags(TAG_LINE, TAG_KNOT)
         else:
-            tags = (TAG_LINE, TAG_HELPER)
+            tags = self.item_tags(TAG_LINE, TAG_HELPER)
 
         self.line_ids.append(self.canvas.create_line(x1, y1, x2, y2,
                                                      tags=tags,
@@ -478,52 +1620,752 @@ class KnotWindow:
                                                      capstyle = capstyle))
 
     def draw_init(self):
-        for row in range(0, self.kp.get_height()):
-            for col in range(0, self.kp.get_length()):
+        for _ in self.iter_draw():
+            pass
+
+    def iter_draw(self):
+        # draw_init an item at a time, yielding the fraction drawn so far after each so that a caller can
+        # hand control back to Tk in between
+        engine = self.engine
+        cols = range(engine.length)
+        total = len(engine.segments) // SEGMENT_FIELDS + engine.height + len(engine.blocks)
+        drawn = 0
+        for drawn in self.iter_draw_lines():
+            yield drawn / total
+        for row in range(engine.height):
+            self.draw_dots(cols, range(row, row + 1))
+            drawn += 1
+            yield drawn / total
+        for block in engine.blocks.iter_blocks():
+            self.draw_block_helpers((block,))
+            drawn += 1
+            yield min(drawn / total, 1.0)
+
+    def draw_lines(self):
+        for _ in self.iter_draw_lines():
+            pass
+
+    def iter_draw_lines(self):
+        # yields the number of segments drawn so far
+        engine = self.engine
+        segments = engine.segments
+        if self.vp.strand_colors:
+            strands = engine.trace_strands()
+            for strand in range(strands.count):
+                self.line_hues[strand] = self.vp.get_strand_color(strand)
+            self.strand_count = strands.count
+        if self.vp.polylines:
+            yield from self.iter_draw_polylines()
+        elif self.vp.strand_colors:
+            yield from self.iter_draw_strands(segments, strands, self.line_hues, False)
+        elif self.tags_cells():
+            for i in range(0, len(segments), SEGMENT_FIELDS):
+                self.edit_tag = cell_tag(*segment_cell(*segments[i:i + SEGMENT_FIELDS]))
+                self.draw_segment(*segments[i:i + SEGMENT_FIELDS])
+                self.edit_tag = None
+                yield i // SEGMENT_FIELDS + 1
+        else:
+            for i in range(0, len(segments), SEGMENT_FIELDS):
+                self.draw_segment(*segments[i:i + SEGMENT_FIELDS])
+                yield i // SEGMENT_FIELDS + 1
+
+    def draw_helpers(self, cols: range, rows: range, blocks):
+        self.draw_dots(cols, rows)
+        self.draw_block_helpers(blocks)
+
+    def draw_dots(self, cols: range, rows: range):
+        engine = self.engine
+        # helper dots
+        dr = self.vp.dot_radius
+        for row in rows:
+            for col in cols:
                 x, y = self.get_pixel(col, row)
-                dr = self.vp.dot_radius
                 nodetype = get_node_type(col, row)
-                if nodetype is NodeType.LINE:
-                    corners = self.get_corners(x, y)
-                    if not self.is_blocking(col, row):
-                        # normal two lines crossing
-                        self.draw_lines_crossing(col, row)
-                    else:
-                        # lines bounce off a block
-                        if self.is_blocking(col, row, Orientation.VERTICAL):
-                            if CornerDirection.LEFTUP in corners and CornerDirection.LEFTDOWN in corners:
-                                self.create_line(*corners[CornerDirection.LEFTUP], *corners[CornerDirection.LEFTDOWN])
-                            if CornerDirection.RIGHTUP in corners and CornerDirection.RIGHTDOWN in corners:
-                                self.create_line(*corners[CornerDirection.RIGHTUP],
-                                                 *corners[CornerDirection.RIGHTDOWN])
-                        elif self.is_blocking(col, row, Orientation.HORIZONTAL):
-                            if CornerDirection.LEFTUP in corners and CornerDirection.RIGHTUP in corners:
-                                self.create_line(*corners[CornerDirection.LEFTUP], *corners[CornerDirection.RIGHTUP])
-                            if CornerDirection.LEFTDOWN in corners and CornerDirection.RIGHTDOWN in corners:
-                                self.create_line(*corners[CornerDirection.LEFTDOWN],
-                                                 *corners[CornerDirection.RIGHTDOWN])
-                # helper dots
                 if nodetype is NodeType.PRIMARY:
                     color = self.vp.primary_color
                 elif nodetype is NodeType.SECONDARY:
                     color = self.vp.secondary_color
                 else:
-                    color = 'brown' if self.cross_dirs[(row, col)] == Diagonal.LEFTUP_RIGHTDOWN else 'tan' # self.vp.line_color
+                    color = 'brown' if engine.cross_dir(col, row) == Diagonal.LEFTUP_RIGHTDOWN else 'tan' # self.vp.line_color
                 if color:
                     dot_id = self.canvas.create_oval(x - dr, y - dr, x + dr, y + dr, outline=color, fill=color,
-                                                     state='hidden', tags=(TAG_DOT, TAG_HELPER))
+                                                     state=self.helper_state(),
+                                                     tags=self.item_tags(TAG_DOT, TAG_HELPER))
                     self.dot_ids[x, y] = dot_id
+
+    def draw_block_helpers(self, blocks):
         # draw blocking line helpers
-        for i, lines in self.horizontal_blocks.items():
-            for line in lines:
-                self.create_line(*self.get_pixel(line[0], i), *self.get_pixel(line[1], i),
-                                 get_lane_type(i),
-                                 width=self.vp.line_width / 2)
-        for i, lines in self.vertical_blocks.items():
-            for line in lines:
-                self.create_line(*self.get_pixel(i, line[0]), *self.get_pixel(i, line[1]),
-                                 get_lane_type(i),
-                                 width=self.vp.line_width / 2)
+        tags_cells = self.tags_cells()
+        for orientation, i, start, end in blocks:
+            if orientation is Orientation.HORIZONTAL:
+                start_pixel, end_pixel = self.get_pixel(start, i), self.get_pixel(end, i)
+            else:
+                start_pixel, end_pixel = self.get_pixel(i, start), self.get_pixel(i, end)
+            if tags_cells:
+                self.edit_tag = lane_tag(orientation, i)
+            self.create_line(*start_pixel, *end_pixel,
+                             get_lane_type(i),
+                             width=self.vp.line_width / 2)
+        self.edit_tag = None
+
+    def set_lane(self, orientation: Orientation, index: int, lane: Lane):
+        # replaces one of the engine's lanes and redraws what that changed
+        engine = self.engine
+        stale = None
+        if (self.vp.polylines or self.vp.strand_colors) and self.tags_cells():
+            # looked up before the edit, as strands through the nodes it changes may come apart
+            stale = engine.strands_near(engine.lane_changes(orientation, index, lane))
+        self.redraw_cells(engine.set_lane(orientation, index, lane), orientation, index, stale)
+
+    def redraw_cells(self, cells, orientation: Orientation, index: int, stale=None):
+        # after one lane was edited: cells are the nodes whose blocking changed, as from KnotEngine.set_lane,
+        # and stale the segments of the strands near them from before, as from KnotEngine.strands_near
+        if self.vp.tiled:
+            size = self.vp.tile_size
+            for tile in {(col // size, row // size) for col, row in cells} & self.tiles.keys():
+                self.canvas.delete(self.tiles.pop(tile))
+                self.draw_tile(*tile)
+            return
+        if stale is not None:
+            self.redraw_strands(stale, self.engine.strands_near(cells))
+        elif self.vp.polylines or self.vp.strand_colors:
+            # without the strands from before the edit, any of them may have changed
+            self.canvas.delete(TAG_KNOT)
+            self.draw_lines()
+        else:
+            for col, row in cells:
+                self.canvas.delete(cell_tag(col, row))
+                self.edit_tag = cell_tag(col, row)
+                segments = self.engine.row_segments(row, range(col, col + 1))
+                for i in range(0, len(segments), SEGMENT_FIELDS):
+                    self.draw_segment(*segments[i:i + SEGMENT_FIELDS])
+            self.edit_tag = None
+        self.canvas.delete(lane_tag(orientation, index))
+        lane = self.engine.lane(orientation, index)
+        self.draw_block_helpers((orientation, index, start, end) for start, end in lane)
+
+    def redraw_strands(self, stale, segments):
+        # replaces the items of the strands in stale by the strands in segments. Strands that came out the
+        # same keep their colour, the others take the colours let go of, then the next ones in the cycle
+        old_hues = {}
+        for key in StrandTracer(self.engine, stale).keys():
+            self.canvas.delete(strand_tag(key))
+            if key in self.strand_hues:
+                old_hues[key] = self.strand_hues.pop(key)
+        strands = StrandTracer(self.engine, segments)
+        hues = {}
+        if self.vp.strand_colors:
+            keys = strands.keys()
+            for strand, key in enumerate(keys):
+                if key in old_hues:
+                    hues[strand] = old_hues.pop(key)
+            freed = list(old_hues.values())
+            for strand in range(strands.count):
+                if strand not in hues:
+                    if freed:
+                        hues[strand] = freed.pop(0)
+                    else:
+                        hues[strand] = self.vp.get_strand_color(self.strand_count)
+                        self.strand_count += 1
+        for _ in self.iter_draw_strands(segments, strands, hues, self.vp.polylines):
+            pass
+
+    def detailed(self):
+        return self.vp.unit_length >= self.base_vp.detail_unit_length
+
+    def bind_viewport(self, x_scrollbar, y_scrollbar):
+        canvas = self.canvas
+
+        def scrolled(scrollbar):
+            def command(*args):
+                scrollbar.set(*args)
+                self.schedule_update()
+            return command
+
+        canvas.configure(xscrollcommand=scrolled(x_scrollbar), yscrollcommand=scrolled(y_scrollbar))
+        x_scrollbar.configure(command=canvas.xview)
+        y_scrollbar.configure(command=canvas.yview)
+        canvas.bind('<Configure>', lambda e: self.schedule_update())
+        canvas.bind('<ButtonPress-2>', lambda e: canvas.scan_mark(e.x, e.y))
+        canvas.bind('<B2-Motion>', lambda e: canvas.scan_dragto(e.x, e.y, gain=1))
+        canvas.bind('<MouseWheel>', lambda e: self.scroll(e, 1 if e.delta < 0 else -1))
+        canvas.bind('<Button-4>', lambda e: self.scroll(e, -1))
+        canvas.bind('<Button-5>', lambda e: self.scroll(e, 1))
+        self.set_zoom(self.zoom)
+
+    def scroll(self, event, direction: int):
+        if event.state & 0x4:  # control
+            self.set_zoom(self.zoom * (1.25 if direction < 0 else 0.8))
+        elif event.state & 0x1:  # shift
+            self.canvas.xview_scroll(direction, 'units')
+        else:
+            self.canvas.yview_scroll(direction, 'units')
+
+    def set_zoom(self, zoom: float):
+        old_zoom = self.zoom
+        x_view, y_view = self.canvas.xview(), self.canvas.yview()
+        self.zoom = zoom
+        self.vp = self.base_vp.scaled(zoom)
+        if not self.detailed():
+            self.vp.crossing_gap_length = 0
+        self.clear_tiles()
+        self.canvas.configure(scrollregion=(0, 0, self.max_x() + self.vp.x_padding, self.max_y() + self.vp.y_padding))
+        # keep the middle of the view where it was
+        for view, moveto in ((x_view, self.canvas.xview_moveto), (y_view, self.canvas.yview_moveto)):
+            visible = (view[1] - view[0]) * old_zoom / zoom
+            moveto((view[0] + view[1]) / 2 - visible / 2)
+        self.schedule_update()
+
+    def schedule_update(self):
+        if not self.update_pending:
+            self.update_pending = True
+            self.canvas.after_idle(self.update_tiles)
+
+    def visible_tiles(self):
+        canvas = self.canvas
+        left, top = canvas.canvasx(0), canvas.canvasy(0)
+        right, bottom = left + canvas.winfo_width(), top + canvas.winfo_height()
+        span = self.vp.unit_length * self.vp.tile_size
+        last_col, last_row = (self.engine.length - 1) // self.vp.tile_size, (self.engine.height - 1) // self.vp.tile_size
+        # one tile of margin so that scrolling doesn't uncover blank edges
+        cols = range(max(int((left - self.vp.x_padding) // span) - 1, 0),
+                     min(int((right - self.vp.x_padding) // span) + 1, last_col) + 1)
+        rows = range(max(int((top - self.vp.y_padding) // span) - 1, 0),
+                     min(int((bottom - self.vp.y_padding) // span) + 1, last_row) + 1)
+        return {(col, row) for row in rows for col in cols}
+
+    def update_tiles(self):
+        self.update_pending = False
+        visible = self.visible_tiles()
+        for tile in [tile for tile in self.tiles if tile not in visible]:
+            self.canvas.delete(self.tiles.pop(tile))
+        for tile in sorted(visible - self.tiles.keys()):
+            self.draw_tile(*tile)
+
+    def clear_tiles(self):
+        for tag in self.tiles.values():
+            self.canvas.delete(tag)
+        self.tiles.clear()
+
+    def draw_tile(self, tile_col, tile_row):
+        engine, size = self.engine, self.vp.tile_size
+        cols = range(tile_col * size, min((tile_col + 1) * size, engine.length))
+        rows = range(tile_row * size, min((tile_row + 1) * size, engine.height))
+        self.drawing_tag = self.tiles[tile_col, tile_row] = 'tile_{}_{}'.format(tile_col, tile_row)
+        segments = engine.region_segments(rows, cols)
+        for i in range(0, len(segments), SEGMENT_FIELDS):
+            self.draw_segment(*segments[i:i + SEGMENT_FIELDS])
+        if self.detailed():
+            self.draw_helpers(cols, rows, engine.blocks.iter_region(cols, rows))
+        self.drawing_tag = None
+
+
+def cell_tag(col, row):
+    return 'cell_{}_{}'.format(col, row)
+
+
+def lane_tag(orientation: Orientation, index: int):
+    return 'lane_{}_{}'.format(orientation.name[0].lower(), index)
+
+
+def strand_tag(key):
+    return 'strand_{}_{}_{}_{}'.format(*key)
+
+
+class KnotEditor:
+    # drag with the left button to add a blocker between two nodes of the same type, with the right button
+    # to clear one. Each edit replaces a single lane, and undo/redo put back the lane as it was
+    preview_tag = 'preview'
+
+    def __init__(self, view: KnotView) -> None:
+        super().__init__()
+        self.view = view
+        self.engine = view.engine
+        self.undo_stack = []
+        self.redo_stack = []
+        self.drag_start = None
+
+    def bind(self, window):
+        canvas = self.view.canvas
+        for button, add in ((1, True), (3, False)):
+            canvas.bind('<ButtonPress-{}>'.format(button), self.press)
+            canvas.bind('<B{}-Motion>'.format(button), self.drag)
+            canvas.bind('<ButtonRelease-{}>'.format(button), lambda e, add=add: self.release(e, add))
+        window.bind('<Control-z>', lambda e: self.undo())
+        window.bind('<Control-y>', lambda e: self.redo())
+        window.bind('<Control-Z>', lambda e: self.redo())
+
+    def unbind(self, window):
+        # before the view goes away, so that clicks don't edit a released engine
+        canvas = self.view.canvas
+        canvas.delete(self.preview_tag)
+        for button in (1, 3):
+            for event in ('<ButtonPress-{}>', '<B{}-Motion>', '<ButtonRelease-{}>'):
+                canvas.unbind(event.format(button))
+        for event in ('<Control-z>', '<Control-y>', '<Control-Z>'):
+            window.unbind(event)
+
+    def node_at(self, event):
+        # nearest primary or secondary node to the pointer
+        vp, canvas = self.view.vp, self.view.canvas
+        col = (canvas.canvasx(event.x) - vp.x_padding) / vp.unit_length
+        row = (canvas.canvasy(event.y) - vp.y_padding) / vp.unit_length
+        primary = (2 * round(col / 2), 2 * round(row / 2))
+        secondary = (2 * int(col // 2) + 1, 2 * int(row // 2) + 1)
+        node = min((primary, secondary), key=lambda node: (node[0] - col) ** 2 + (node[1] - row) ** 2)
+        return self.clamp(*node, node[0] % 2)
+
+    def clamp(self, col, row, parity):
+        # keep to the knot, on a node of the given parity
+        col = min(max(int(col), parity), self.engine.length - 1)
+        row = min(max(int(row), parity), self.engine.height - 1)
+        return col - (col - parity) % 2, row - (row - parity) % 2
+
+    def block_to(self, event) -> Optional[Block]:
+        # the blocker from the drag start, straightened along whichever axis the pointer moved further on
+        (start_col, start_row), (col, row) = self.drag_start, self.node_at(event)
+        if abs(col - start_col) >= abs(row - start_row):
+            col, row = self.clamp(start_col + 2 * round((col - start_col) / 2), start_row, start_col % 2)
+        else:
+            col, row = self.clamp(start_col, start_row + 2 * round((row - start_row) / 2), start_col % 2)
+        if (col, row) == (start_col, start_row):
+            return None
+        if row == start_row:
+            return HBlock(row, start_col, col)
+        return VBlock(col, start_row, row)
+
+    def press(self, event):
+        self.drag_start = self.node_at(event)
+
+    def drag(self, event):
+        canvas = self.view.canvas
+        canvas.delete(self.preview_tag)
+        if self.drag_start is None:
+            return
+        block = self.block_to(event)
+        if block is not None:
+            canvas.create_line(*self.view.get_pixel(*block.start_coords()), *self.view.get_pixel(*block.end_coords()),
+                               tags=self.preview_tag, width=self.view.vp.line_width / 2, dash=(4, 4),
+                               fill=self.view.vp.get_color(block.block_type))
+
+    def release(self, event, add: bool):
+        self.view.canvas.delete(self.preview_tag)
+        if self.drag_start is None:
+            return
+        block = self.block_to(event)
+        self.drag_start = None
+        if block is None:
+            return
+        if add:
+            self.add_block(block)
+        else:
+            self.remove_block(block)
+
+    def add_block(self, block: Block):
+        lane = self.engine.lane(block.orientation, block.index).copy()
+        lane.add(block.start, block.end)
+        self.edit(block.orientation, block.index, lane)
+
+    def remove_block(self, block: Block):
+        lane = self.engine.lane(block.orientation, block.index).copy()
+        lane.remove(block.start, block.end)
+        self.edit(block.orientation, block.index, lane)
+
+    def edit(self, orientation: Orientation, index: int, lane: Lane):
+        old = self.engine.lane(orientation, index)
+        if lane == old:
+            return
+        self.undo_stack.append((orientation, index, old, lane))
+        self.redo_stack.clear()
+        self.set_lane(orientation, index, lane)
+
+    def set_lane(self, orientation: Orientation, index: int, lane: Lane):
+        self.view.set_lane(orientation, index, lane)
+
+    def undo(self):
+        if self.undo_stack:
+            orientation, index, old, new = self.undo_stack.pop()
+            self.redo_stack.append((orientation, index, old, new))
+            self.set_lane(orientation, index, old)
+
+    def redo(self):
+        if self.redo_stack:
+            orientation, index, old, new = self.redo_stack.pop()
+            self.undo_stack.append((orientation, index, old, new))
+            self.set_lane(orientation, index, new)
+
+
+class GeometryWorker:
+    # builds a KnotEngine, its segments and, when asked, its strands on a background thread, so that the
+    # window stays responsive while a big knot is set up. Progress, the finished engine or an error come
+    # back as (kind, value) messages; once cancelled it stops at its next chunk of rows and posts nothing.
+    # With a cache (a cache.GeometryCache), the engine comes from there in one go instead, and can't be
+    # cancelled part way; a worker started after it waits for the cache until it is done. Without
+    # segments, as for a tiled view that computes its tiles' own, the engine is ready as soon as its masks are
+    rows_per_chunk = 16
+
+    def __init__(self, kp: KnotParams, strands: bool = False, cache=None, segments: bool = True) -> None:
+        super().__init__()
+        self.kp = kp
+        self.strands = strands
+        self.cache = cache
+        self.segments = segments or strands
+        self.messages = queue.Queue()
+        self.cancelled = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def post(self, kind: str, value):
+        if not self.cancelled.is_set():
+            self.messages.put((kind, value))
+
+    def run(self):
+        try:
+            if self.cache is not None:
+                # the cache computes segments along with the rest, when it computes anything
+                engine = self.cache.engine(self.kp, segments=self.segments)
+            else:
+                engine = KnotEngine(self.kp)
+                if self.segments:
+                    self.post('progress', 0.1)
+                    if not self.setup_segments(engine):
+                        return
+            if self.strands and not self.cancelled.is_set():
+                engine.trace_strands()
+            self.post('ready', engine)
+        except Exception as e:
+            self.post('error', e)
+
+    def setup_segments(self, engine: KnotEngine) -> bool:
+        # False when cancelled part way
+        if engine.symmetries:
+            # only the fundamental region is computed, which is quick enough to do in one go
+            engine.setup_segments()
+            return True
+        segments = array('i')
+        for start in range(0, engine.height, self.rows_per_chunk):
+            if self.cancelled.is_set():
+                return False
+            rows = range(start, min(start + self.rows_per_chunk, engine.height))
+            segments += engine.region_segments(rows, range(engine.length))
+            self.post('progress', 0.1 + 0.8 * rows.stop / engine.height)
+        engine.computed_segments = segments
+        return True
+
+
+class KnotWindow:
+    poll_ms = 15  # between checks on the worker
+    draw_seconds = 0.02  # of drawing per Tk tick, so input is still handled in between
+
+    def __init__(self, kp: KnotParams = KnotParams(), vp: ViewParams = ViewParams()) -> None:
+        super().__init__()
+        self.kp = kp
+        self.vp = vp
+        self.engine = None
+        self.view = None
+        self.editor = None
+        self.worker = None
+        self.drawing = None
+        self.poll_id = None
+        self.helpers_hidden = KnotView.helpers_hidden
+
+        window = tk.Tk()
+        self.window = window
+        greeting = tk.Label(text="Knots")
+        greeting.pack()
+        full_width, full_height = self.knot_pixels()
+        if vp.tiled:
+            frame = tk.Frame(window)
+            frame.pack(fill=tk.BOTH, expand=True)
+            canvas = tk.Canvas(frame, bg="white", width=min(full_width, vp.view_width),
+                               height=min(full_height, vp.view_height))
+            self.x_scrollbar = tk.Scrollbar(frame, orient=tk.HORIZONTAL)
+            self.y_scrollbar = tk.Scrollbar(frame, orient=tk.VERTICAL)
+            canvas.grid(row=0, column=0, sticky='nsew')
+            self.y_scrollbar.grid(row=0, column=1, sticky='ns')
+            self.x_scrollbar.grid(row=1, column=0, sticky='ew')
+            frame.rowconfigure(0, weight=1)
+            frame.columnconfigure(0, weight=1)
+        else:
+            canvas = tk.Canvas(window, bg="white", height=full_height, width=full_width)
+            canvas.pack()
+        self.canvas = canvas
+        hide_helpers_button = tk.Button(window, text="Toggle (H)elpers", command=self.toggle_helpers)
+        hide_helpers_button.pack(padx=10, pady=10, side=tk.LEFT)
+        self.progress = ttk.Progressbar(window, maximum=1.0, length=160)
+        self.progress.pack(padx=10, pady=10, side=tk.LEFT)
+        self.status = tk.Label(window)
+        self.status.pack(padx=10, pady=10, side=tk.LEFT)
+        # h_sym = tk.IntVar()
+        # h_symmetry_button = Checkbutton(window, text="Horizontal Symmetry", variable=h_sym)
+        # h_symmetry_button.pack(padx=10,pady=10, side=tk.LEFT)
+        # v_sym = tk.IntVar()
+        # v_symmetry_button = Checkbutton(window, text="Vertical Symmetry", variable=v_sym)
+        # v_symmetry_button.pack(padx=10,pady=10, side=tk.LEFT)
+
+        # Hotkeys
+        window.bind('h', lambda e: self.toggle_helpers())
+        window.bind('H', lambda e: self.toggle_helpers())
+        if vp.tiled:
+            window.bind('+', lambda e: self.zoom(1.25))
+            window.bind('=', lambda e: self.zoom(1.25))
+            window.bind('-', lambda e: self.zoom(0.8))
+
+        self.show(kp, vp)
+        window.mainloop()
+
+    def knot_pixels(self):
+        return self.vp.knot_pixels(self.kp.get_length(), self.kp.get_height())
+
+    def show(self, kp: KnotParams, vp: Optional[ViewParams] = None):
+        # (re)draws a knot; whatever was still being computed or drawn for the previous one is dropped
+        self.cancel()
+        self.kp = kp
+        if vp is not None:
+            self.vp = vp
+        if self.editor is not None:
+            self.editor.unbind(self.window)
+        if self.view is not None:
+            self.view.release()
+        self.engine = self.view = self.editor = None
+        self.canvas.delete('all')
+        if not self.vp.tiled:
+            width, height = self.knot_pixels()
+            self.canvas.configure(width=width, height=height)
+        # tiled views compute each tile's segments as it comes into view, so they only wait for the masks
+        self.worker = GeometryWorker(kp, bool(self.vp.strand_colors or self.vp.polylines) and not self.vp.tiled,
+                                     segments=not self.vp.tiled)
+        self.worker.start()
+        self.set_progress(0.0, 'computing')
+        self.poll_id = self.window.after(self.poll_ms, self.poll)
+
+    def cancel(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker = None
+        if self.poll_id is not None:
+            self.window.after_cancel(self.poll_id)
+            self.poll_id = None
+        self.drawing = None
+
+    def poll(self):
+        self.poll_id = None
+        if self.drawing is None:
+            while not self.worker.messages.empty():
+                kind, value = self.worker.messages.get_nowait()
+                if kind == 'progress':
+                    self.set_progress(value / 2, 'computing')
+                elif kind == 'error':
+                    self.set_progress(0.0, 'failed: {}'.format(value))
+                    return
+                else:
+                    self.start_drawing(value)
+                    break
+        if self.drawing is not None:
+            deadline = time.perf_counter() + self.draw_seconds
+            for fraction in self.drawing:
+                if time.perf_counter() > deadline:
+                    self.set_progress(0.5 + fraction / 2, 'drawing')
+                    break
+            else:
+                self.finish_drawing()
+                return
+        self.poll_id = self.window.after(self.poll_ms, self.poll)
+
+    def start_drawing(self, engine: KnotEngine):
+        self.engine = engine
+        self.view = KnotView(self.canvas, engine, self.vp)
+        self.view.helpers_hidden = self.helpers_hidden
+        if self.vp.tiled:
+            # tiles are drawn as they come into view
+            self.view.bind_viewport(self.x_scrollbar, self.y_scrollbar)
+            self.drawing = iter(())
+        else:
+            self.drawing = self.view.iter_draw()
+
+    def finish_drawing(self):
+        self.drawing = None
+        self.worker = None
+        self.set_progress(1.0, 'ready')
+        if self.vp.editable:
+            self.editor = KnotEditor(self.view)
+            self.editor.bind(self.window)
+
+    def set_progress(self, fraction: float, text: str):
+        self.progress['value'] = fraction
+        self.status['text'] = text
+
+    def zoom(self, factor: float):
+        if self.view is not None:
+            self.view.set_zoom(self.view.zoom * factor)
+
+    def toggle_helpers(self):
+        self.helpers_hidden = not self.helpers_hidden
+        if self.view is not None:
+            self.view.toggle_helpers()
+
+
+PROFILE_ENV = 'KNOT_PROFILE'  # 1 to report to stderr, or a path to write the JSON report to
+
+
+class ProfiledCanvas:
+    # stands in front of a view's canvas while profiling, timing and counting every item it creates
+
+    def __init__(self, canvas, profile: 'Profile') -> None:
+        super().__init__()
+        self.canvas = canvas
+        self.profile = profile
+
+    def __getattr__(self, name):
+        attribute = getattr(self.canvas, name)
+        if name.startswith('create_'):
+            return self.profile.timed('canvas.' + name, attribute, count_canvas_item)
+        return attribute
+
+
+def count_canvas_item(profile, args, result):
+    profile.count('canvas_items')
+
+
+def count_cells(profile, args, result):
+    engine = args[0]
+    profile.count('cells', engine.length * engine.height)
+    profile.count('blocks', len(engine.blocks))
+
+
+def count_segments(profile, args, result):
+    profile.count('segments', len(result) // SEGMENT_FIELDS)
+
+
+def count_reflected_segments(profile, args, result):
+    profile.count('reflected_segments', len(result) // SEGMENT_FIELDS)
+
+
+def wrap_canvas(profile, args, result):
+    view = args[0]
+    view.canvas = ProfiledCanvas(view.canvas, profile)
+    profile.wrapped_views.add(view)
+
+
+# (class, method, hook called with (profile, args, result) after each call). Only what building and drawing
+# a knot actually calls; the block indexes' iter_region is a generator, so its time is draw_tile's
+PROFILED = (
+    (KnotParams, 'block_index', None),
+    (BlockIndex, 'paint_masks', None),
+    (BlockIndex, 'paint_lanes', None),
+    (PeriodicBlockIndex, 'paint_masks', None),
+    (KnotEngine, 'setup_blocks', None),
+    (KnotEngine, 'setup_crosses', count_cells),
+    (KnotEngine, 'check_symmetries', None),
+    (KnotEngine, 'setup_segments', None),
+    (KnotEngine, 'row_segments', count_segments),
+    (KnotEngine, 'reflect_segments', count_reflected_segments),
+    (KnotEngine, 'get_corners', None),
+    (KnotEngine, 'set_lane', None),
+    (KnotEngine, 'strands_near', None),
+    (KnotEngine, 'trace_strands', None),
+    (KnotView, '__init__', wrap_canvas),
+    (KnotView, 'draw_init', None),
+    (KnotView, 'draw_tile', None),
+    (KnotView, 'draw_dots', None),
+    (KnotView, 'draw_block_helpers', None),
+    (KnotView, 'redraw_cells', None),
+    (KnotView, 'redraw_strands', None),
+    (KnotView, 'create_line', None),
+    (KnotView, 'create_polyline', None),
+)
+
+
+class Profile:
+    # wall time and call counts of the pipeline's hot paths, plus counters of what it made. Methods are
+    # only wrapped while the profile is enabled, so a disabled one costs nothing. Times are inclusive:
+    # a profiled method called from another counts towards both
+    active = None
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.timers = {}
+        self.counters = {}
+        self.patched = []
+        self.wrapped_views = weakref.WeakSet()  # views whose canvas wrap_canvas replaced, put back on disable
+        self.started = None
+        self.seconds = 0.0
+
+    @classmethod
+    def from_env(cls) -> Optional['Profile']:
+        return cls() if os.environ.get(PROFILE_ENV, '') not in ('', '0') else None
+
+    def count(self, name: str, amount: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def timed(self, name: str, function, after=None):
+        timers = self.timers
+
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = function(*args, **kwargs)
+            finally:
+                timer = timers.get(name)
+                if timer is None:
+                    timer = timers[name] = [0, 0.0]
+                timer[0] += 1
+                timer[1] += time.perf_counter() - start
+            if after is not None:
+                after(self, args, result)
+            return result
+        return functools.wraps(function)(wrapper)
+
+    def enable(self):
+        if Profile.active is not None:
+            raise RuntimeError('another profile is already enabled')
+        Profile.active = self
+        for owner, name, after in PROFILED:
+            original = owner.__dict__[name]
+            setattr(owner, name, self.timed('{}.{}'.format(owner.__name__, name), original, after))
+            self.patched.append((owner, name, original))
+        self.started = time.perf_counter()
+
+    def disable(self):
+        if Profile.active is not self:
+            return
+        self.seconds += time.perf_counter() - self.started
+        for owner, name, original in reversed(self.patched):
+            setattr(owner, name, original)
+        self.patched.clear()
+        for view in self.wrapped_views:
+            if isinstance(view.canvas, ProfiledCanvas) and view.canvas.profile is self:
+                view.canvas = view.canvas.canvas
+        self.wrapped_views.clear()
+        Profile.active = None
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.disable()
+
+    def report(self) -> dict:
+        timers = sorted(self.timers.items(), key=lambda item: -item[1][1])
+        return {'seconds': round(self.seconds, 6),
+                'timers': {name: {'calls': calls, 'seconds': round(seconds, 6)} for name, (calls, seconds) in timers},
+                'counters': dict(sorted(self.counters.items()))}
+
+    def write(self, destination: str = '1'):
+        # '1' or '-' for stderr, anything else is a path
+        text = json.dumps(self.report(), indent=1)
+        if destination in ('1', '-'):
+            print(text, file=sys.stderr)
+        else:
+            with open(destination, 'w') as f:
+                f.write(text + '\n')
 
 
 def main():
@@ -560,8 +2402,8 @@ def main():
     p2c = Pattern(*p2a.get_lines(), VBlock(4, 10, 20), *HBlock(13, 1, 3).repeat(2, 4, orientation=Orientation.VERTICAL),
                   HBlock(10, 0, 2), HBlock(12, 2, 4), length=8, height=8)
     printvp = ViewParams(crossing_gap_length = 6, line_width=15)
-    final = p2b.mirror().mirror(Orientation.VERTICAL)
-    finalb = p2c.mirror().mirror(Orientation.VERTICAL)
+    final = p2b.mirrored().mirrored(Orientation.VERTICAL)
+    finalb = p2c.mirrored().mirrored(Orientation.VERTICAL)
     delineator_start = 1
     delineator_interval = 4
     frame_width = 4
@@ -584,7 +2426,7 @@ def main():
                        # inner_frame_side, *side_deliniators,
                        # *vertical_alternators,
                        length=corner_length, height=quadrant_height)
-    frame = quadrant.mirror().mirror(Orientation.VERTICAL)
+    frame = quadrant.mirrored().mirrored(Orientation.VERTICAL)
     print("{} {}".format(frame.get_length()-1, frame.get_height()-1))
     kw = KnotWindow(vp=printvp, kp=KnotParams(frame))
 
@@ -592,4 +2434,10 @@ def main():
 
 # Press the green button in the gutter to run the script.
 if __name__ == '__main__':
-    main()
+    profile = Profile.from_env()
+    if profile is None:
+        main()
+    else:
+        with profile:
+            main()
+        profile.write(os.environ[PROFILE_ENV])
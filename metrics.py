@@ -0,0 +1,264 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from main import KnotParams, HALF_DIAGONAL
+from batch import load_jobs, knot_params_from_spec, report_line, failure
+
+# Counts for many knots at once, without drawing any of them:
+#
+#     python metrics.py specs/ --csv metrics.csv -j 8
+#
+# Every design's blocker masks are padded to the same number of cells and stacked, one byte per cell, into
+# a single big integer per mask, so each step below is one bitwise operation over the whole batch. A line
+# node's segments only depend on its own masks and on which of its sides are inside the knot:
+#
+#   blocked vertically    a bounce on each side, when it has a node both above and below
+#   blocked horizontally  a bounce above and below, when it has a node both left and right
+#   neither               a crossing half to every corner inside the knot
+#
+# so with X2 and Y2 marking nodes that have neighbours on both sides across and down, counts per design are
+# sums of popcounts of masks like unblocked & X2 & Y2. Strands are counted from the same masks by a
+# union-find per design, which takes most of the time and can be skipped with --no-strands.
+
+FIELDS = ('length', 'height', 'crossings', 'bounces', 'crossing_halves', 'cord_length', 'width', 'depth',
+          'strands', 'closed')
+CHUNK_SIZE = 256  # designs stacked into one pass, and handed to a worker at a time
+
+
+@lru_cache(maxsize=64)
+def region_masks(length: int, height: int, stride: int):
+    # (line nodes, nodes with both horizontal neighbours, nodes with both vertical ones), padded to stride
+    pad = bytes(stride - length * height)
+    even_line = bytes(col % 2 for col in range(length))
+    odd_line = bytes(1 - col % 2 for col in range(length))
+    line = b''.join(odd_line if row % 2 else even_line for row in range(height))
+    across = (b'\x00' + b'\x01' * (length - 2) + b'\x00' if length > 2 else bytes(length)) * height
+    down = bytes(length) + b'\x01' * (length * (height - 2)) + bytes(length) if height > 2 else bytes(length * height)
+    return line + pad, across + pad, down + pad
+
+
+def stacked(parts) -> int:
+    return int.from_bytes(b''.join(parts), 'big')
+
+
+def counts(value: int, total: int, stride: int):
+    # the set cells of each design's slice of a stacked mask
+    data = value.to_bytes(total, 'big')
+    return [data.count(1, start, start + stride) for start in range(0, total, stride)]
+
+
+def knot_params(design) -> KnotParams:
+    return design if isinstance(design, KnotParams) else KnotParams(design)
+
+
+def measure_chunk(designs, strands: bool = True):
+    # one row of FIELDS per design, in order
+    kps = [knot_params(design) for design in designs]
+    sizes = [(kp.get_length(), kp.get_height()) for kp in kps]
+    blocks = [kp.block_index() for kp in kps]
+    stride = max(length * height for length, height in sizes)
+    total = stride * len(kps)
+    masks = [index.paint_masks(length, height) for index, (length, height) in zip(blocks, sizes)]
+    regions = [region_masks(length, height, stride) for length, height in sizes]
+    padding = [bytes(stride - length * height) for length, height in sizes]
+
+    horizontal = stacked(part for (mask, _), pad in zip(masks, padding) for part in (mask, pad))
+    vertical = stacked(part for (_, mask), pad in zip(masks, padding) for part in (mask, pad))
+    line, across, down = (stacked(region[i] for region in regions) for i in range(3))
+
+    unblocked = line & ~(horizontal | vertical)
+    bounce_vertical = line & vertical & down
+    bounce_horizontal = line & horizontal & ~vertical & across
+    # crossing halves per unblocked node are (1 + across) * (1 + down), bounces are 1 + the other flag
+    columns = {name: counts(value, total, stride) for name, value in (
+        ('unblocked', unblocked),
+        ('unblocked_across', unblocked & across),
+        ('unblocked_down', unblocked & down),
+        ('crossings', unblocked & across & down),
+        ('bounce_vertical', bounce_vertical),
+        ('bounce_vertical_both', bounce_vertical & across),
+        ('bounce_horizontal', bounce_horizontal),
+        ('bounce_horizontal_both', bounce_horizontal & down),
+    )}
+    classes = [value.to_bytes(total, 'big') for value in (unblocked, bounce_vertical, bounce_horizontal)]
+
+    rows = []
+    for i, (kp, (length, height)) in enumerate(zip(kps, sizes)):
+        halves = columns['unblocked'][i] + columns['unblocked_across'][i] + columns['unblocked_down'][i] + \
+            columns['crossings'][i]
+        bounces = columns['bounce_vertical'][i] + columns['bounce_vertical_both'][i] + \
+            columns['bounce_horizontal'][i] + columns['bounce_horizontal_both'][i]
+        row = {'length': length, 'height': height, 'crossings': columns['crossings'][i], 'bounces': bounces,
+               'crossing_halves': halves, 'cord_length': round(halves * HALF_DIAGONAL + bounces, 4)}
+        row['width'], row['depth'] = cord_extent(classes, i * stride, length, height)
+        if strands:
+            row['strands'], row['closed'] = count_strands(classes, i * stride, length, height)
+        else:
+            row['strands'] = row['closed'] = None
+        rows.append(row)
+    return rows
+
+
+def node_box(mask: bytes, offset: int, length: int, height: int):
+    # (left, right, top, bottom) of the set cells in one design's slice, or None
+    end = offset + length * height
+    first, last = mask.find(1, offset, end), mask.rfind(1, offset, end)
+    if first < 0:
+        return None
+    left, right = length, -1
+    for row in range((first - offset) // length, (last - offset) // length + 1):
+        start = offset + row * length
+        col = mask.find(1, start, start + length)
+        if col >= 0:
+            left = min(left, col - start)
+            right = max(right, mask.rfind(1, start, start + length) - start)
+    return left, right, (first - offset) // length, (last - offset) // length
+
+
+def cord_extent(classes, offset: int, length: int, height: int):
+    # (width, depth) in units of the box around every segment. classes are the stacked unblocked, vertically
+    # and horizontally bouncing masks as bytes; a node's segments reach half a unit past it on each side
+    # that is inside the knot, except that an edge node that bounces has nothing on the outer side at all
+    x_lo = y_lo = float('inf')
+    x_hi = y_hi = -1
+    last_col, last_row = length - 1, height - 1
+    for kind, mask in enumerate(classes):
+        box = node_box(mask, offset, length, height)
+        if box is None:
+            continue
+        left, right, top, bottom = box
+        lo, hi = 2 * left - (left > 0), 2 * right + (right < last_col)
+        if kind == 1:
+            lo, hi = 2 * left + (1 if left == 0 else -1), 2 * right + (1 if right < last_col else -1)
+        x_lo, x_hi = min(x_lo, lo), max(x_hi, hi)
+        lo, hi = 2 * top - (top > 0), 2 * bottom + (bottom < last_row)
+        if kind == 2:
+            lo, hi = 2 * top + (1 if top == 0 else -1), 2 * bottom + (1 if bottom < last_row else -1)
+        y_lo, y_hi = min(y_lo, lo), max(y_hi, hi)
+    if x_hi < 0:
+        return 0, 0
+    return (x_hi - x_lo) / 2, (y_hi - y_lo) / 2
+
+
+def count_strands(classes, offset: int, length: int, height: int):
+    # (strands, closed strands) from the same rules, without building segments: a crossing joins opposite
+    # corners through its centre, a bounce the two corners along one side, and cords are the connected
+    # components of the corner points those arcs join. A cord is open when it has a crossing half with no
+    # opposite, or a corner point only one arc reaches
+    unblocked, bounce_vertical, bounce_horizontal = classes
+    width = length - 1
+    parent = list(range(width * (height - 1)))
+    degree = bytearray(len(parent))
+    loose = bytearray(len(parent))
+
+    def find(point):
+        while parent[point] != point:
+            parent[point] = parent[parent[point]]
+            point = parent[point]
+        return point
+
+    def join(a, b):
+        if a is None:
+            a, b = b, a
+        if a is None:
+            return
+        degree[a] += 1
+        if b is None:
+            loose[a] = 1
+            return
+        degree[b] += 1
+        a, b = find(a), find(b)
+        if a != b:
+            parent[max(a, b)] = min(a, b)
+
+    for row in range(height):
+        up, down = row > 0, row < height - 1
+        above, below = (row - 1) * width, row * width
+        base = offset + row * length
+        for col in range(1 - row % 2, length, 2):
+            left, right = col > 0, col < length - 1
+            north_west = above + col - 1 if up and left else None
+            north_east = above + col if up and right else None
+            south_west = below + col - 1 if down and left else None
+            south_east = below + col if down and right else None
+            if unblocked[base + col]:
+                join(north_west, south_east)
+                join(north_east, south_west)
+            elif bounce_vertical[base + col]:
+                if left:
+                    join(north_west, south_west)
+                if right:
+                    join(north_east, south_east)
+            elif bounce_horizontal[base + col]:
+                if up:
+                    join(north_west, north_east)
+                if down:
+                    join(south_west, south_east)
+
+    roots = {}
+    for point in range(len(parent)):
+        if degree[point]:
+            root = find(point)
+            roots[root] = roots.get(root, False) or bool(loose[point]) or degree[point] == 1
+    return len(roots), sum(not open_end for open_end in roots.values())
+
+
+def measure(designs, strands: bool = True, workers: int = 1, chunk_size: int = CHUNK_SIZE):
+    # a table of FIELDS, one row per Pattern or KnotParams in designs, in order
+    designs = list(designs)
+    chunks = [designs[start:start + chunk_size] for start in range(0, len(designs), chunk_size)]
+    if workers == 1 or len(chunks) < 2:
+        results = [measure_chunk(chunk, strands) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(measure_chunk, chunks, [strands] * len(chunks)))
+    return [row for rows in results for row in rows]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Count crossings, bounces, strands and cord length of knot specs.')
+    parser.add_argument('specs', nargs='+', help='spec .json/.jsonl files or directories of them, as for batch.py')
+    parser.add_argument('--csv', help='write the table here, instead of JSON lines to stdout')
+    parser.add_argument('--no-strands', action='store_true', help='skip tracing, which takes most of the time')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help='worker processes')
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    names, designs, failed = [], [], 0
+    for job, record in load_jobs(args.specs, '.', 'svg'):
+        if job is not None:
+            try:
+                designs.append(knot_params_from_spec(job['spec']))
+                names.append(job['name'])
+                continue
+            except Exception as e:
+                record = failure(job['name'], job['source'], e)
+        failed += 1
+        print(report_line(record), file=sys.stderr)
+    rows = measure(designs, not args.no_strands, max(1, args.jobs), args.chunk_size)
+
+    if args.csv:
+        with open(args.csv, 'w', newline='') as f:
+            writer = csv.DictWriter(f, ('name',) + FIELDS)
+            writer.writeheader()
+            for name, row in zip(names, rows):
+                writer.writerow(dict(row, name=name))
+    else:
+        for name, row in zip(names, rows):
+            print(json.dumps(dict(row, name=name)))
+    seconds = time.perf_counter() - started
+    print('{} designs in {:.2f}s ({:.0f}/s){}'.format(len(rows), seconds, len(rows) / seconds if seconds else 0,
+                                                       ', {} failed'.format(failed) if failed else ''),
+          file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
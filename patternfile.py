@@ -0,0 +1,143 @@
+import mmap
+import struct
+import sys
+from array import array
+
+from main import KnotParams, Pattern, Lane, Orientation, Symmetry
+
+# Layout, all little-endian int32 so every array stays 4-byte aligned:
+#   file header      magic, version, knot length (-1 for one pass), periodic, pattern count
+#   pattern header   length, height, symmetry bits, then lane count and interval count for vertical
+#                    and for horizontal lanes
+#   per orientation  lane indices[lanes], offsets[lanes + 1], starts[intervals], ends[intervals]
+# A lane's intervals are starts/ends[offsets[i]:offsets[i + 1]], already sorted and merged as in Lane.
+
+MAGIC = b'KNOT'
+VERSION = 1
+FILE_HEADER = struct.Struct('<4s4i')
+PATTERN_HEADER = struct.Struct('<7i')
+ORIENTATIONS = (Orientation.VERTICAL, Orientation.HORIZONTAL)
+INT_SIZE = 4
+NATIVE = sys.byteorder == 'little'
+
+
+def symmetry_bits(symmetries) -> int:
+    return sum(1 << symmetry.value for symmetry in symmetries)
+
+
+def bits_symmetries(bits: int) -> frozenset:
+    return frozenset(symmetry for symmetry in Symmetry if bits & (1 << symmetry.value))
+
+
+def little_endian(values: array) -> array:
+    if not NATIVE:
+        values = array('i', values)
+        values.byteswap()
+    return values
+
+
+def read_ints(data: memoryview):
+    # a view of the data where the byte order is native, or else a byte-swapped copy
+    if NATIVE:
+        return data.cast('i')
+    values = array('i')
+    values.frombytes(data)
+    values.byteswap()
+    return values
+
+
+def sorted_lanes(pattern: Pattern, orientation: Orientation):
+    return sorted((index, lane) for index, lane in pattern.lines_for_orientation(orientation).items() if lane)
+
+
+def write_pattern(f, pattern):
+    if not isinstance(pattern, Pattern):
+        pattern = pattern.materialize()
+    lanes = {orientation: sorted_lanes(pattern, orientation) for orientation in ORIENTATIONS}
+    counts = []
+    for orientation in ORIENTATIONS:
+        counts += (len(lanes[orientation]), sum(len(lane) for _, lane in lanes[orientation]))
+    f.write(PATTERN_HEADER.pack(pattern.get_length(), pattern.get_height(),
+                                symmetry_bits(pattern.get_symmetries()), *counts))
+    for orientation in ORIENTATIONS:
+        offsets = array('i', [0])
+        for _, lane in lanes[orientation]:
+            offsets.append(offsets[-1] + len(lane))
+        f.write(little_endian(array('i', (index for index, _ in lanes[orientation]))))
+        f.write(little_endian(offsets))
+        # lane by lane, so nothing the size of the whole pattern is built up
+        for field in ('starts', 'ends'):
+            for _, lane in lanes[orientation]:
+                f.write(little_endian(array('i', getattr(lane, field))))
+
+
+def save_knot(kp: KnotParams, out):
+    # out is a path or a binary file-like object; lazy pattern views are written out materialized
+    if isinstance(out, str):
+        with open(out, 'wb') as f:
+            return save_knot(kp, f)
+    out.write(FILE_HEADER.pack(MAGIC, VERSION, -1 if kp.length is None else kp.length, int(kp.periodic),
+                               len(kp.patterns)))
+    for pattern in kp.patterns:
+        write_pattern(out, pattern)
+
+
+def save_pattern(pattern, out):
+    save_knot(KnotParams(pattern), out)
+
+
+def read_pattern(data: memoryview, offset: int):
+    # (pattern, offset after it); the lanes are views into data, not copies
+    length, height, bits, *counts = PATTERN_HEADER.unpack_from(data, offset)
+    offset += PATTERN_HEADER.size
+    lines = {}
+    for orientation, lane_count, interval_count in zip(ORIENTATIONS, counts[0::2], counts[1::2]):
+        sizes = (lane_count, lane_count + 1, interval_count, interval_count)
+        fields = []
+        for size in sizes:
+            end = offset + size * INT_SIZE
+            if end > len(data):
+                raise ValueError('pattern file is truncated')
+            fields.append(read_ints(data[offset:end]))
+            offset = end
+        indices, offsets, starts, ends = fields
+        lines[orientation] = {indices[i]: Lane.from_buffers(starts[offsets[i]:offsets[i + 1]],
+                                                            ends[offsets[i]:offsets[i + 1]])
+                              for i in range(lane_count)}
+    pattern = Pattern(length=length, height=height,
+                      vertical_lines=lines[Orientation.VERTICAL], horizontal_lines=lines[Orientation.HORIZONTAL])
+    pattern.symmetries = bits_symmetries(bits)
+    return pattern, offset
+
+
+def load_knot(source) -> KnotParams:
+    # source is a path, which is memory-mapped read-only, or anything exposing the buffer protocol.
+    # Lanes read straight out of the mapping and only get copied once something is added to them;
+    # the mapping stays open for as long as any lane still refers to it
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            return load_knot(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    data = memoryview(source)
+    if len(data) < FILE_HEADER.size:
+        raise ValueError('not a pattern file')
+    magic, version, length, periodic, count = FILE_HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError('not a pattern file')
+    if version != VERSION:
+        raise ValueError('unsupported pattern file version {}'.format(version))
+    offset = FILE_HEADER.size
+    patterns = []
+    try:
+        for _ in range(count):
+            pattern, offset = read_pattern(data, offset)
+            patterns.append(pattern)
+    except struct.error:
+        raise ValueError('pattern file is truncated') from None
+    kwargs = {'periodic': bool(periodic)}
+    if length >= 0:
+        kwargs['length'] = length
+    return KnotParams(*patterns, **kwargs)
+
+
+def load_pattern(source) -> Pattern:
+    return load_knot(source).patterns[0]
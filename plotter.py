@@ -0,0 +1,261 @@
+from math import hypot, ceil
+from typing import Optional
+
+from main import KnotEngine, ViewParams
+
+# Toolpaths for pen plotters and engravers. Every chain of segments that StrandTracer.chains() gives, broken
+# at the crossing gaps, becomes one pen-down stroke; strokes are then put in an order that keeps pen-up
+# travel short, nearest neighbour first and then 2-opt over a sliding window.
+#
+#     python batch.py specs/ -f gcode
+#
+# with "unit_mm", "feed" and "travel_feed" (mm/min) read from each spec, like "dpi" for png.
+#
+# Output coordinates are millimetres with y upwards, the origin being the bottom left corner of the knot's
+# padding. The pen starts and parks there, and both moves count towards the pen-up distance.
+
+DEFAULT_UNIT_MM = 5.0  # knot unit, the distance between neighbouring nodes
+DEFAULT_FEED = 1500.0  # pen down, mm/min
+DEFAULT_TRAVEL_FEED = 3000.0  # pen up, mm/min
+TWO_OPT_WINDOW = 32  # strokes ahead of each one considered for a reversal
+TWO_OPT_PASSES = 8
+COLLINEAR_TOLERANCE = 1e-6  # in mm², for dropping points in the middle of straight runs
+
+
+def plot_params(vp: ViewParams, unit_mm: float) -> ViewParams:
+    # the view scaled so that its pixels are millimetres
+    return vp.scaled(unit_mm / vp.unit_length)
+
+
+def simplify(points):
+    # drops points on straight runs; a diagonal strand is one segment per half unit otherwise
+    kept = [points[0]]
+    for i in range(1, len(points) - 1):
+        (x0, y0), (x1, y1), (x2, y2) = kept[-1], points[i], points[i + 1]
+        if abs((x1 - x0) * (y2 - y0) - (y1 - y0) * (x2 - x0)) > COLLINEAR_TOLERANCE or \
+                (x1 - x0) * (x2 - x1) + (y1 - y0) * (y2 - y1) < 0:
+            kept.append(points[i])
+    kept.append(points[-1])
+    return kept
+
+
+def knot_strokes(engine: KnotEngine, vp: ViewParams):
+    # one list of (x, y) points per pen-down stroke, in vp's pixels and canvas orientation
+    segments, strands = engine.segments, engine.trace_strands()
+    strokes = []
+    for chain in strands.chains(vp.crossing_gap_length > 0):
+        coords = vp.chain_pixels(segments, chain)
+        strokes.append(simplify(list(zip(coords[::2], coords[1::2]))))
+    return strokes
+
+
+def is_closed(points) -> bool:
+    return len(points) > 2 and points[0] == points[-1]
+
+
+def distance(a, b) -> float:
+    return hypot(a[0] - b[0], a[1] - b[1])
+
+
+def stroke_length(points) -> float:
+    return sum(distance(points[i], points[i + 1]) for i in range(len(points) - 1))
+
+
+def entry_points(points):
+    # where the pen may start a stroke: either end of an open one, any point of a closed one
+    return range(len(points) - 1) if is_closed(points) else (0, len(points) - 1)
+
+
+def enter_at(points, i: int):
+    # the stroke drawn starting from its point i, see entry_points
+    if is_closed(points):
+        return points[i:-1] + points[:i + 1]
+    return points[::-1] if i else points
+
+
+def nearest_neighbour(strokes, origin=(0.0, 0.0)):
+    # strokes in the order a greedy pen would draw them, each oriented to start at its nearest entry.
+    # Entries are bucketed in a grid about one average stroke across, and rings of buckets are searched
+    # outwards until no closer entry can turn up
+    if not strokes:
+        return []
+    points = [point for stroke in strokes for i in entry_points(stroke) for point in (stroke[i],)]
+    min_x, min_y = min(x for x, _ in points), min(y for _, y in points)
+    max_x, max_y = max(x for x, _ in points), max(y for _, y in points)
+    cell = max(max_x - min_x, max_y - min_y, 1e-9) / max(ceil(len(strokes) ** 0.5), 1)
+    cols, rows = int((max_x - min_x) / cell) + 1, int((max_y - min_y) / cell) + 1
+    grid = {}
+    for s, stroke in enumerate(strokes):
+        for i in entry_points(stroke):
+            x, y = stroke[i]
+            grid.setdefault((int((x - min_x) / cell), int((y - min_y) / cell)), []).append((s, i))
+
+    used = bytearray(len(strokes))
+    ordered = []
+    position = origin
+    for _ in range(len(strokes)):
+        px, py = position
+        col = min(max(int((px - min_x) // cell), 0), cols - 1)
+        row = min(max(int((py - min_y) // cell), 0), rows - 1)
+        best, best_distance = None, float('inf')
+        ring = 0
+        while ring <= max(cols, rows):
+            # every entry from this ring out is at least (ring - 1) cells away along one axis
+            if best is not None and (ring - 1) * cell > best_distance:
+                break
+            for c in range(col - ring, col + ring + 1):
+                for r in (range(row - ring, row + ring + 1) if c in (col - ring, col + ring)
+                          else (row - ring, row + ring)):
+                    bucket = grid.get((c, r))
+                    if not bucket:
+                        continue
+                    if any(used[s] for s, _ in bucket):
+                        bucket[:] = [(s, i) for s, i in bucket if not used[s]]
+                    for s, i in bucket:
+                        d = distance(position, strokes[s][i])
+                        if d < best_distance:
+                            best, best_distance = (s, i), d
+            ring += 1
+        s, i = best
+        used[s] = 1
+        stroke = enter_at(strokes[s], i)
+        ordered.append(stroke)
+        position = stroke[-1]
+    return ordered
+
+
+def two_opt(strokes, origin=(0.0, 0.0), window: int = TWO_OPT_WINDOW, passes: int = TWO_OPT_PASSES):
+    # improves an order in place by reversing runs of up to window strokes, each stroke flipped with the
+    # run, whenever that shortens the pen-up moves around it. A run of one just flips its stroke
+    n = len(strokes)
+    for _ in range(passes):
+        improved = False
+        for i in range(-1, n - 1):
+            a = strokes[i][-1] if i >= 0 else origin
+            b = strokes[i + 1][0]
+            ab = distance(a, b)
+            for j in range(i + 1, min(n, i + 1 + window)):
+                c = strokes[j][-1]
+                d = strokes[j + 1][0] if j + 1 < n else origin
+                if distance(a, c) + distance(b, d) < ab + distance(c, d) - 1e-9:
+                    strokes[i + 1:j + 1] = [stroke[::-1] for stroke in reversed(strokes[i + 1:j + 1])]
+                    b = strokes[i + 1][0]
+                    ab = distance(a, b)
+                    improved = True
+        if not improved:
+            break
+    return strokes
+
+
+def travel(strokes, origin=(0.0, 0.0)):
+    # (pen-down, pen-up) distance of drawing strokes in order, from origin and back
+    position, pen_up = origin, 0.0
+    for stroke in strokes:
+        pen_up += distance(position, stroke[0])
+        position = stroke[-1]
+    pen_up += distance(position, origin)
+    return sum(stroke_length(stroke) for stroke in strokes), pen_up
+
+
+class ToolpathWriter:
+    # streams strokes in millimetres, y downwards as on the canvas, to a binary file-like object
+
+    def __init__(self, out, height: float, feed: float, travel_feed: float = DEFAULT_TRAVEL_FEED) -> None:
+        super().__init__()
+        self.out = out
+        self.height = height
+        self.feed = feed
+        self.travel_feed = travel_feed
+
+    def write(self, text: str):
+        self.out.write(text.encode())
+
+    def begin(self): raise NotImplementedError()
+
+    def stroke(self, points): raise NotImplementedError()
+
+    def end(self): raise NotImplementedError()
+
+
+def mm(value) -> str:
+    return ('%.3f' % value).rstrip('0').rstrip('.')
+
+
+class GcodeWriter(ToolpathWriter):
+    # pen up and down as Z moves, which suits most servo and engraver firmwares. Pen-up moves are G1 at the
+    # travel feed rather than G0, whose speed is the machine's own, so that the job time estimate holds
+    pen_up = 'G0 Z5'
+    pen_down = 'G1 Z0 F{feed}'
+    travel = 'G1 X{x} Y{y} F{feed}'
+
+    def begin(self):
+        self.write('G21\nG90\n{}\n'.format(self.pen_up))
+
+    def move(self, x, y):
+        self.write(self.travel.format(x=mm(x), y=mm(self.height - y), feed=mm(self.travel_feed)) + '\n')
+
+    def stroke(self, points):
+        self.move(*points[0])
+        self.write(self.pen_down.format(feed=mm(self.feed)) + '\n')
+        self.write(''.join('G1 X{} Y{}\n'.format(mm(x), mm(self.height - y)) for x, y in points[1:]))
+        self.write(self.pen_up + '\n')
+
+    def end(self):
+        self.move(0, self.height)
+        self.write('M2\n')
+
+
+class HpglWriter(ToolpathWriter):
+    PLOTTER_UNITS = 40  # per millimetre
+
+    def point(self, x, y):
+        return '{},{}'.format(round(x * self.PLOTTER_UNITS), round((self.height - y) * self.PLOTTER_UNITS))
+
+    def begin(self):
+        # velocity is in cm/s, the feeds in mm/min. HPGL has no pen-up speed, so travel_feed only goes into the
+        # time estimate here
+        self.write('IN;SP1;VS{};\n'.format(mm(self.feed / 600)))
+
+    def stroke(self, points):
+        self.write('PU{};PD{};\n'.format(self.point(*points[0]), ','.join(self.point(x, y) for x, y in points[1:])))
+
+    def end(self):
+        self.write('PU0,0;SP0;\n')
+
+
+PLOTTER_WRITERS = {'gcode': GcodeWriter, 'hpgl': HpglWriter}
+
+
+def export_toolpath(engine: KnotEngine, out, vp: ViewParams = ViewParams(), format: Optional[str] = None,
+                    unit_mm: float = DEFAULT_UNIT_MM, feed: float = DEFAULT_FEED,
+                    travel_feed: float = DEFAULT_TRAVEL_FEED,
+                    window: int = TWO_OPT_WINDOW) -> dict:
+    # out is a path, whose extension picks the format unless given, or a binary file-like object. Returns
+    # distances in mm, before and after ordering, and the estimated job time at the given feeds in mm/min
+    if isinstance(out, str):
+        if format is None:
+            format = out.rsplit('.', 1)[-1].lower()
+            format = {'nc': 'gcode', 'plt': 'hpgl'}.get(format, format)
+        if format not in PLOTTER_WRITERS:
+            raise ValueError('unknown toolpath format {}'.format(format))
+        with open(out, 'wb') as f:
+            return export_toolpath(engine, f, vp, format, unit_mm, feed, travel_feed, window)
+    if format not in PLOTTER_WRITERS:
+        raise ValueError('unknown toolpath format {}'.format(format))
+    vp = plot_params(vp, unit_mm)
+    height = vp.knot_pixels(engine.length, engine.height)[1]
+    origin = (0.0, height)
+    strokes = knot_strokes(engine, vp)
+    _, unordered_pen_up = travel(strokes, origin)
+    strokes = two_opt(nearest_neighbour(strokes, origin), origin, window)
+    pen_down, pen_up = travel(strokes, origin)
+
+    writer = PLOTTER_WRITERS[format](out, height, feed, travel_feed)
+    writer.begin()
+    for stroke in strokes:
+        writer.stroke(stroke)
+    writer.end()
+    return {'strokes': len(strokes), 'pen_down_mm': round(pen_down, 1), 'pen_up_mm': round(pen_up, 1),
+            'unordered_pen_up_mm': round(unordered_pen_up, 1),
+            'minutes': round(pen_down / feed + pen_up / travel_feed, 2)}
+
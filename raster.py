@@ -0,0 +1,258 @@
+import re
+import struct
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from math import ceil, floor, hypot, inf
+from typing import Optional
+
+from main import KnotEngine, ViewParams, SegmentType, SEGMENT_FIELDS
+from export import get_rgb
+
+BAND_HEIGHT = 64  # pixel rows rasterized at once
+IDAT_SIZE = 1 << 16  # compressed bytes collected before they go out as one chunk
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+COVERED_RUN = re.compile(rb'[^\x00]+')
+
+
+class PngWriter:
+    # 8 bit grey or rgb, rows deflated as they come in and written in IDAT_SIZE chunks
+
+    def __init__(self, out, width: int, height: int, channels: int = 3, dpi: Optional[float] = None) -> None:
+        super().__init__()
+        self.out = out
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.dpi = dpi
+        self.compressor = None
+        self.pending = []
+        self.pending_size = 0
+
+    def chunk(self, kind: bytes, data: bytes):
+        self.out.write(struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data)))
+
+    def begin(self):
+        self.out.write(PNG_SIGNATURE)
+        self.chunk(b'IHDR', struct.pack('>IIBBBBB', self.width, self.height, 8, 0 if self.channels == 1 else 2, 0, 0, 0))
+        if self.dpi:
+            per_metre = round(self.dpi / 0.0254)
+            self.chunk(b'pHYs', struct.pack('>IIB', per_metre, per_metre, 1))
+        self.compressor = zlib.compressobj(6)
+
+    def queue(self, data: bytes):
+        if data:
+            self.pending.append(data)
+            self.pending_size += len(data)
+
+    def flush_pending(self):
+        if self.pending:
+            self.chunk(b'IDAT', b''.join(self.pending))
+            self.pending = []
+            self.pending_size = 0
+
+    def write_row(self, row: bytes):
+        # filter type 0, the rows are mostly long flat runs which deflate handles on its own
+        self.queue(self.compressor.compress(b'\x00' + row))
+        if self.pending_size >= IDAT_SIZE:
+            self.flush_pending()
+
+    def end(self):
+        self.queue(self.compressor.flush())
+        self.flush_pending()
+        self.chunk(b'IEND', b'')
+
+
+def solve_slab(k: float, c: float, lo: float, hi: float):
+    # x range where lo <= k * x + c <= hi
+    if k == 0:
+        return (-inf, inf) if lo <= c <= hi else None
+    a, b = (lo - c) / k, (hi - c) / k
+    return (a, b) if a <= b else (b, a)
+
+
+def intersect(a, b):
+    if a is None or b is None:
+        return None
+    lo, hi = max(a[0], b[0]), min(a[1], b[1])
+    return (lo, hi) if lo <= hi else None
+
+
+def stroke_span(x1, y1, x2, y2, radius: float, y: float, round_caps: bool):
+    # x range of the scanline y inside the stroke. Butt ends are cut hard at the segment's ends so that
+    # two halves meeting end to end leave no seam; the sides get their antialiasing from the caller
+    dx, dy = x2 - x1, y2 - y1
+    length = hypot(dx, dy)
+    ux, uy = dx / length, dy / length
+    # both slabs in x - x1
+    across = solve_slab(-uy, ux * (y - y1), -radius, radius)
+    span = intersect(across, solve_slab(ux, uy * (y - y1), -1e-9, length + 1e-9))
+    if span is not None:
+        span = (span[0] + x1, span[1] + x1)
+    if round_caps:
+        for cx, cy in ((x1, y1), (x2, y2)):
+            if abs(y - cy) <= radius:
+                half = (radius * radius - (y - cy) ** 2) ** 0.5
+                span = (cx - half, cx + half) if span is None else (min(span[0], cx - half), max(span[1], cx + half))
+    return span
+
+
+def stroke_coverage(x1, y1, x2, y2, radius: float, x: float, y: float, round_caps: bool) -> float:
+    dx, dy = x2 - x1, y2 - y1
+    length = hypot(dx, dy)
+    along = ((x - x1) * dx + (y - y1) * dy) / length
+    if round_caps:
+        t = min(max(along, 0), length) / length
+        distance = hypot(x - x1 - t * dx, y - y1 - t * dy)
+    elif -1e-9 <= along <= length + 1e-9:  # pixel centres often fall right on a butt end
+        distance = abs((y - y1) * dx - (x - x1) * dy) / length
+    else:
+        return 0
+    return min(max(radius + 0.5 - distance, 0), 1)
+
+
+def pixel_range(span):
+    # columns whose pixel centre lies in the span
+    if span is None:
+        return range(0)
+    return range(ceil(span[0] - 0.5), floor(span[1] - 0.5) + 1)
+
+
+def stroke_stamp(x1, y1, x2, y2, line_width: float, round_caps: bool):
+    # (row, full columns, [(column, coverage)]) of a stroke starting inside pixel (0, 0)
+    radius = line_width / 2
+    stamp = []
+    for py in range(floor(min(y1, y2) - radius - 1), ceil(max(y1, y2) + radius + 1)):
+        y = py + 0.5
+        outer = pixel_range(stroke_span(x1, y1, x2, y2, radius + 0.5, y, round_caps))
+        if not outer:
+            continue
+        inner = pixel_range(stroke_span(x1, y1, x2, y2, radius - 0.5, y, round_caps)) \
+            if radius > 0.5 else range(0)
+        edges = (range(outer.start, inner.start), range(inner.stop, outer.stop)) if inner else (outer,)
+        stamp.append((py, inner, [(px, round(255 * stroke_coverage(x1, y1, x2, y2, radius, px + 0.5, y, round_caps)))
+                                  for columns in edges for px in columns]))
+    return stamp
+
+
+def rasterize_stroke(rows, top: int, width: int, x1, y1, x2, y2, line_width: float, round_caps: bool, stamps: dict):
+    # max coverage of one stroke into the band's rows, the band starting at pixel row top. A knot only has a
+    # handful of stroke shapes, so their rasterized stamps are kept in stamps keyed by shape and subpixel offset
+    if x1 == x2 and y1 == y2:
+        return
+    left, up = floor(x1), floor(y1)
+    key = (x1 - left, y1 - up, x2 - x1, y2 - y1, round_caps)
+    stamp = stamps.get(key)
+    if stamp is None:
+        stamp = stamps[key] = stroke_stamp(x1 - left, y1 - up, x2 - left, y2 - up, line_width, round_caps)
+    bottom = top + len(rows)
+    for py, inner, edges in stamp:
+        py += up
+        if not top <= py < bottom:
+            continue
+        row = rows[py - top]
+        if inner:
+            start, stop = max(inner.start + left, 0), min(inner.stop + left, width)
+            if start < stop:
+                row[start:stop] = b'\xff' * (stop - start)
+        for px, value in edges:
+            px += left
+            if 0 <= px < width and value > row[px]:
+                row[px] = value
+
+
+class BandSegments:
+    # the segments that can reach a band of pixel rows, with their colours
+
+    def __init__(self, engine: KnotEngine, vp: ViewParams) -> None:
+        super().__init__()
+        self.engine = engine
+        self.vp = vp
+        self.segments = None
+        if vp.strand_colors:
+            # strand ids index the engine's full segment array, so sort that by top edge once
+            segments, strands = engine.segments, engine.trace_strands()
+            count = len(segments) // SEGMENT_FIELDS
+            tops = [min(segments[i * SEGMENT_FIELDS + 1], segments[i * SEGMENT_FIELDS + 3]) for i in range(count)]
+            self.order = array('i', sorted(range(count), key=tops.__getitem__))
+            self.tops = array('i', (tops[i] for i in self.order))
+            self.segments, self.strand_ids = segments, strands.strand_ids
+
+    def half_unit_rows(self, top: int, bottom: int):
+        # half-unit y range a segment has to overlap to put ink on pixel rows [top, bottom)
+        half_unit, margin = self.vp.unit_length / 2, self.vp.line_width / 2 + 1
+        return (top - self.vp.y_padding - margin) / half_unit, (bottom - self.vp.y_padding + margin) / half_unit
+
+    def band(self, top: int, bottom: int):
+        # (segment fields, colour) pairs
+        low, high = self.half_unit_rows(top, bottom)
+        if self.segments is None:
+            # segments of cell row r lie between half-unit rows 2r - 1 and 2r + 1
+            rows = range(max(floor((low - 1) / 2), 0), min(ceil((high + 1) / 2) + 1, self.engine.height))
+            segments = self.engine.region_segments(rows, range(self.engine.length))
+            color = self.vp.line_color
+            for i in range(0, len(segments), SEGMENT_FIELDS):
+                yield segments[i:i + SEGMENT_FIELDS], color
+        else:
+            segments = self.segments
+            for position in range(bisect_right(self.tops, low - 2), bisect_left(self.tops, high)):
+                i = self.order[position]
+                yield (segments[i * SEGMENT_FIELDS:(i + 1) * SEGMENT_FIELDS],
+                       self.vp.get_strand_color(self.strand_ids[i]))
+
+
+def blend_tables(background, color):
+    # per channel, coverage byte -> that colour blended over the background
+    return [bytes(round(b + (c - b) * a / 255) for a in range(256)) for b, c in zip(background, color)]
+
+
+def composite_row(layers, background, channels: int, width: int) -> bytes:
+    # layers are (colour, blend tables, coverage row) in drawing order
+    planes = [bytearray(bytes([b]) * width) for b in background[:channels]]
+    for color, tables, coverage in layers:
+        if len(layers) == 1:
+            planes = [coverage.translate(table) for table in tables[:channels]]
+            break
+        for run in COVERED_RUN.finditer(coverage):
+            for px in range(run.start(), run.end()):
+                a = coverage[px]
+                for plane, c in zip(planes, color):
+                    plane[px] = round(plane[px] + (c - plane[px]) * a / 255)
+    if channels == 1:
+        return bytes(planes[0])
+    row = bytearray(width * 3)
+    row[0::3], row[1::3], row[2::3] = planes
+    return row
+
+
+def render_png(engine: KnotEngine, out, vp: ViewParams = ViewParams(), background: str = 'white',
+               dpi: Optional[float] = None, band_height: int = BAND_HEIGHT):
+    # rasterizes band_height pixel rows at a time, so memory follows the image width and not its area.
+    # Scale with vp.scaled() for print resolutions; out is a path or a binary file-like object
+    if isinstance(out, str):
+        with open(out, 'wb') as f:
+            return render_png(engine, f, vp, background, dpi, band_height)
+    width, height = (ceil(size) for size in vp.knot_pixels(engine.length, engine.height))
+    colors = {vp.line_color, *(vp.strand_colors or ())}
+    rgb = {color: get_rgb(color) for color in colors}
+    background_rgb = get_rgb(background)
+    tables = {color: blend_tables(background_rgb, rgb[color]) for color in colors}
+    channels = 1 if all(len(set(c)) == 1 for c in (background_rgb, *rgb.values())) else 3
+    writer = PngWriter(out, width, height, channels, dpi)
+    writer.begin()
+    bands = BandSegments(engine, vp)
+    stamps = {}
+    for top in range(0, height, band_height):
+        bottom = min(top + band_height, height)
+        layers = {}
+        for segment, color in bands.band(top, bottom):
+            rows = layers.get(color)
+            if rows is None:
+                rows = layers[color] = [bytearray(width) for _ in range(bottom - top)]
+            x1, y1, x2, y2 = vp.segment_pixels(*segment)
+            rasterize_stroke(rows, top, width, x1, y1, x2, y2, vp.line_width,
+                             segment[4] == SegmentType.BOUNCE.value, stamps)
+        for i in range(bottom - top):
+            writer.write_row(composite_row([(rgb[color], tables[color], rows[i]) for color, rows in layers.items()],
+                                           background_rgb, channels, width))
+    writer.end()
@@ -0,0 +1,303 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from main import KnotEngine, KnotParams, Pattern, Orientation, SegmentType, SEGMENT_FIELDS, \
+    invert_block, fold_block
+from batch import knot_params_from_spec
+
+# Looks for blocker layouts that make a knot a single cord:
+#
+#     python search.py --length 21 --height 21 --symmetry both --restarts 64 -j 8 -o single.jsonl
+#
+# Every restart is a hill climb from the base knot (a bordered rectangle, or a batch spec given with
+# --spec). Each step adds one random legal blocker, together with its images under the chosen symmetry,
+# and keeps it unless the knot gets more strands. Only blockers starting in the fundamental region are
+# drawn, since their images cover the rest. Restart i always uses the seed "<seed>:<i>", so results don't
+# depend on how many workers run them. Designs that reach one strand are written as batch specs.
+
+SYMMETRIES = {
+    'none': (),
+    'mirror': ('horizontal',),
+    'both': ('horizontal', 'vertical'),
+    'd4': ('horizontal', 'vertical', 'diagonal'),
+}
+DEAD_END = -1
+
+
+class StrandCounter:
+    # counts the cords of an engine's knot and keeps the count up to date as cells change, by retracing
+    # only the cords that pass through them. A cell's segments make at most two arcs: a crossing joins
+    # opposite corners through its centre, a bounce joins the two corners along one side, and a half with
+    # no opposite ends loose. Arcs meet at corner points, two at most to a point, so cords are the
+    # connected components of the arcs
+
+    def __init__(self, engine: KnotEngine) -> None:
+        super().__init__()
+        self.engine = engine
+        self.width = engine.length - 1
+        points = self.width * (engine.height - 1)
+        cells = engine.length * engine.height
+        self.ends = array('i', [DEAD_END]) * (4 * cells)  # two ends for each of a cell's two arcs
+        self.alive = bytearray(2 * cells)
+        self.slots = array('i', [-1]) * (2 * points)  # the arcs meeting at each corner point
+        self.visited = array('i', [0]) * (2 * cells)
+        self.stamp = 0
+        for row in range(engine.height):
+            for col in range(1 - row % 2, engine.length, 2):
+                self.set_arcs(col, row)
+        self.count = self.components(i for i in range(len(self.alive)) if self.alive[i])
+
+    def point(self, x: int, y: int) -> int:
+        return (y - 1) // 2 * self.width + (x - 1) // 2
+
+    def cell_arcs(self, col: int, row: int):
+        segments = self.engine.row_segments(row, range(col, col + 1))
+        arcs = []
+        halves = {}
+        for i in range(0, len(segments), SEGMENT_FIELDS):
+            x1, y1, x2, y2, segment_type = segments[i:i + SEGMENT_FIELDS]
+            if segment_type == SegmentType.BOUNCE.value:
+                arcs.append((self.point(x1, y1), self.point(x2, y2)))
+            else:
+                halves[x2 - x1, y2 - y1] = self.point(x2, y2)
+        for dx, dy in ((-1, -1), (1, -1)):
+            ends = (halves.get((dx, dy), DEAD_END), halves.get((-dx, -dy), DEAD_END))
+            if ends != (DEAD_END, DEAD_END):
+                arcs.append(ends)
+        return arcs
+
+    def set_arcs(self, col: int, row: int):
+        cell = row * self.engine.length + col
+        for arc in (2 * cell, 2 * cell + 1):
+            if self.alive[arc]:
+                self.alive[arc] = 0
+                for point in self.ends[2 * arc:2 * arc + 2]:
+                    if point != DEAD_END:
+                        slot = 2 * point if self.slots[2 * point] == arc else 2 * point + 1
+                        self.slots[slot] = -1
+        for arc, ends in enumerate(self.cell_arcs(col, row), 2 * cell):
+            self.alive[arc] = 1
+            self.ends[2 * arc], self.ends[2 * arc + 1] = ends
+            for point in ends:
+                if point != DEAD_END:
+                    self.slots[2 * point if self.slots[2 * point] < 0 else 2 * point + 1] = arc
+
+    def components(self, arcs) -> int:
+        # cords through any of arcs, each walked once
+        self.stamp += 1
+        stamp, visited, slots, ends = self.stamp, self.visited, self.slots, self.ends
+        count = 0
+        for arc in arcs:
+            if visited[arc] == stamp:
+                continue
+            count += 1
+            visited[arc] = stamp
+            stack = [arc]
+            while stack:
+                current = stack.pop()
+                for point in ends[2 * current:2 * current + 2]:
+                    if point == DEAD_END:
+                        continue
+                    for other in slots[2 * point:2 * point + 2]:
+                        if other >= 0 and visited[other] != stamp:
+                            visited[other] = stamp
+                            stack.append(other)
+        return count
+
+    def arcs_around(self, cells):
+        # arcs at the corners of cells, which every cord through them uses
+        length, height = self.engine.length, self.engine.height
+        for col, row in cells:
+            for x in (2 * col - 1, 2 * col + 1):
+                for y in (2 * row - 1, 2 * row + 1):
+                    if 0 < x < 2 * length - 2 and 0 < y < 2 * height - 2:
+                        point = self.point(x, y)
+                        for arc in self.slots[2 * point:2 * point + 2]:
+                            if arc >= 0:
+                                yield arc
+            cell = row * length + col
+            for arc in (2 * cell, 2 * cell + 1):
+                if self.alive[arc]:
+                    yield arc
+
+    def update(self, nodes):
+        # after the engine's masks changed at nodes, as returned by KnotEngine.set_lane
+        cells = [(col, row) for col, row in nodes if (col + row) % 2]
+        if not cells:
+            return self.count
+        before = self.components(self.arcs_around(cells))
+        for col, row in cells:
+            self.set_arcs(col, row)
+        self.count += self.components(self.arcs_around(cells)) - before
+        return self.count
+
+
+def orbit(block, generators, length: int, height: int):
+    # block as (orientation, index, start, end) together with all its images, normalized start <= end
+    def normalized(block):
+        orientation, index, start, end = block
+        return (orientation, index, min(start, end), max(start, end))
+
+    images = {normalized(block)}
+    grown = True
+    while grown:
+        grown = False
+        for image in list(images):
+            for generator in generators:
+                if generator == 'horizontal':
+                    new = invert_block(image, length - 1, Orientation.HORIZONTAL)
+                elif generator == 'vertical':
+                    new = invert_block(image, height - 1, Orientation.VERTICAL)
+                else:
+                    new = fold_block(image)
+                new = normalized(new)
+                if new not in images:
+                    images.add(new)
+                    grown = True
+    return sorted(images, key=lambda block: (block[0].value, block[1:]))
+
+
+def random_block(rng: random.Random, generators, length: int, height: int, max_span: int):
+    # a legal blocker inside the border whose start lies in the fundamental region
+    orientation = rng.choice((Orientation.HORIZONTAL, Orientation.VERTICAL))
+    along, across = (length, height) if orientation is Orientation.HORIZONTAL else (height, length)
+    col_limit = (length - 1) // 2 if 'horizontal' in generators else length - 1
+    row_limit = (height - 1) // 2 if 'vertical' in generators else height - 1
+    index_limit, start_limit = (row_limit, col_limit) if orientation is Orientation.HORIZONTAL \
+        else (col_limit, row_limit)
+    index = rng.randint(1, min(index_limit, across - 2))
+    span = 2 * rng.randint(1, max(max_span // 2, 1))
+    starts = range(index % 2, min(start_limit, along - 1 - span) + 1, 2)
+    if not starts:
+        return None
+    start = rng.choice(starts)
+    return orientation, index, start, start + span
+
+
+def base_params(base: dict) -> KnotParams:
+    if 'spec' in base:
+        return knot_params_from_spec(base['spec'])
+    return KnotParams(Pattern(length=base['length'], height=base['height']))
+
+
+def search(base: dict, symmetry: str, seed: int, task: int, steps: int, max_span: int, max_blocks: int) -> dict:
+    # one restart; runs in a worker process
+    started = time.perf_counter()
+    rng = random.Random('{}:{}'.format(seed, task))
+    generators = SYMMETRIES[symmetry]
+    engine = KnotEngine(base_params(base), use_symmetry=False)
+    counter = StrandCounter(engine)
+    added = []
+    step = 0
+    for step in range(1, steps + 1):
+        if counter.count == 1 or len(added) >= max_blocks:
+            break
+        block = random_block(rng, generators, engine.length, engine.height, max_span)
+        if block is None:
+            continue
+        images = orbit(block, generators, engine.length, engine.height)
+        before = counter.count
+        undo = []
+        for orientation, index, start, end in images:
+            lane = engine.lane(orientation, index)
+            undo.append((orientation, index, lane))
+            changed = lane.copy()
+            changed.add(start, end)
+            counter.update(engine.set_lane(orientation, index, changed))
+        changed = any(lane != engine.lane(orientation, index) for orientation, index, lane in undo)
+        if changed and counter.count <= before:
+            added.extend(images)
+        else:
+            for orientation, index, lane in reversed(undo):
+                counter.update(engine.set_lane(orientation, index, lane))
+    return {'task': task, 'seed': '{}:{}'.format(seed, task), 'strands': counter.count, 'steps': step,
+            'seconds': round(time.perf_counter() - started, 4), 'length': engine.length, 'height': engine.height,
+            'blocks': [[orientation.name.lower(), index, start, end] for orientation, index, start, end in added]}
+
+
+def design_spec(result: dict, base: dict) -> dict:
+    # a batch spec for a found design. The search ran on the whole base knot, transforms, files and repeats
+    # included, so that knot is written out as a single plain pattern holding every blocker, and the new
+    # ones are added to it. Patterns are laid side by side, so the blockers can't go in one of their own
+    kp = base_params(base)
+    length, height = kp.get_length(), kp.get_height()
+    blocks = []
+    for orientation, index, start, end in kp.block_index().iter_blocks():
+        if orientation is Orientation.VERTICAL:
+            if index < length:
+                blocks.append([orientation.name.lower(), index, start, end])
+        elif start < length:
+            blocks.append([orientation.name.lower(), index, start, min(end, length - 1)])
+    spec = dict(base.get('spec', {}))
+    spec.update(name='single-{}'.format(result['task']), strands=result['strands'], seed=result['seed'],
+                patterns=[{'length': length, 'height': height, 'blocks': blocks + result['blocks']}])
+    spec.pop('output', None)
+    spec.pop('knot', None)
+    return spec
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Search for blocker layouts that make a single-strand knot.')
+    parser.add_argument('--length', type=int, default=21, help='of the bordered rectangle to start from')
+    parser.add_argument('--height', type=int, default=21)
+    parser.add_argument('--spec', help='start from the first knot of this batch spec file instead')
+    parser.add_argument('--symmetry', default='both', choices=sorted(SYMMETRIES))
+    parser.add_argument('--restarts', type=int, default=32)
+    parser.add_argument('--steps', type=int, default=2000, help='blockers tried per restart')
+    parser.add_argument('--max-span', type=int, default=4, help='longest blocker tried, in units')
+    parser.add_argument('--max-blocks', type=int, default=200, help='blockers added before a restart gives up')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help='worker processes')
+    parser.add_argument('-o', '--output', default='single.jsonl', help='found designs, one batch spec per line')
+    args = parser.parse_args(argv)
+
+    if args.spec:
+        with open(args.spec) as f:
+            loaded = json.load(f)
+        base = {'spec': loaded[0] if isinstance(loaded, list) else loaded}
+    else:
+        base = {'length': args.length, 'height': args.height}
+    kp = base_params(base)
+    generators = SYMMETRIES[args.symmetry]
+    if 'horizontal' in generators and kp.get_length() % 2 == 0 or \
+            'vertical' in generators and kp.get_height() % 2 == 0:
+        parser.error('mirror symmetry needs an odd length and height, so that mirrored nodes keep their type')
+    if 'diagonal' in generators and kp.get_length() != kp.get_height():
+        parser.error('diagonal symmetry needs a square knot')
+
+    started = time.perf_counter()
+    tasks = [(base, args.symmetry, args.seed, task, args.steps, args.max_span, args.max_blocks)
+             for task in range(args.restarts)]
+    if args.jobs == 1:
+        results = [search(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            results = list(executor.map(search, *zip(*tasks)))
+
+    found, seen = 0, set()
+    with open(args.output, 'w') as f:
+        for result in results:
+            print('{:4}  {:3} strands  {:4} blockers  {:5} steps  {:.2f}s'.format(
+                result['task'], result['strands'], len(result['blocks']), result['steps'], result['seconds']))
+            if result['strands'] != 1:
+                continue
+            # restarts often land on mirror images or rotations of each other's designs
+            spec = design_spec(result, base)
+            fingerprint = knot_params_from_spec(spec).fingerprint()
+            if fingerprint not in seen:
+                seen.add(fingerprint)
+                found += 1
+                f.write(json.dumps(spec) + '\n')
+    print('{} distinct single-strand designs from {} restarts in {:.2f}s'.format(
+        found, len(results), time.perf_counter() - started))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
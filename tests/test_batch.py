@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from batch import main, knot_params_from_spec, view_params_from_spec
+
+FRAME = {'patterns': [{'length': 6, 'height': 9, 'blocks': [['vertical', 3, 1, 5], ['horizontal', 4, 2, 6]],
+                       'transforms': [['mirrored']]}]}
+
+
+def test_renders_every_spec_and_reports_failures(tmp_path):
+    specs = tmp_path / 'specs'
+    specs.mkdir()
+    (specs / 'frame.json').write_text(json.dumps(dict(FRAME, view={'line_width': 9})))
+    lines = [dict(FRAME, name='small', format='png', zoom=0.5),
+             dict(FRAME, name='colours', view={'strand_colors': ['red', 'blue']}),
+             {'name': 'illegal', 'patterns': [{'blocks': [['vertical', 3, 0, 5]]}]}]
+    (specs / 'more.jsonl').write_text('\n'.join(map(json.dumps, lines)) + '\n{not json\n')
+    (specs / 'notes.txt').write_text('ignored')
+    report = tmp_path / 'report.jsonl'
+    out = tmp_path / 'out'
+    assert main([str(specs), '-o', str(out), '-j', '2', '--report', str(report)]) == 1
+    records = {record['name']: record for record in map(json.loads, report.read_text().splitlines())}
+    broken = str(specs / 'more.jsonl') + ':4'
+    assert set(records) == {'colours', 'frame', 'illegal', broken, 'small'}
+    assert {name for name, record in records.items() if not record['ok']} == {'illegal', broken}
+    assert 'illegal blocking line' in records['illegal']['error']
+    assert (out / 'frame.svg').read_text().startswith('<?xml')
+    assert (out / 'small.png').read_bytes().startswith(b'\x89PNG')
+    assert (out / 'colours.svg').exists()
+
+
+def test_profiled_jobs_carry_their_report(tmp_path):
+    (tmp_path / 'frame.json').write_text(json.dumps(FRAME))
+    report = tmp_path / 'report.jsonl'
+    assert main([str(tmp_path / 'frame.json'), '-o', str(tmp_path), '-j', '1', '--profile',
+                 '--report', str(report)]) == 0
+    record = json.loads(report.read_text())
+    assert record['ok'] and record['profile']['timers']
+
+
+def test_unknown_spec_fields_are_errors():
+    with pytest.raises(ValueError, match='knot fields'):
+        knot_params_from_spec(dict(FRAME, knot={'width': 3}))
+    with pytest.raises(ValueError, match='view fields'):
+        view_params_from_spec({'view': {'colour': 'red'}})
+    with pytest.raises(ValueError, match='no patterns'):
+        knot_params_from_spec({'patterns': []})
+    kp = knot_params_from_spec(dict(FRAME, knot={'length': 33, 'periodic': True}))
+    assert (kp.get_length(), kp.get_period(), kp.periodic) == (33, 11, True)
+
+
+def test_unique_skips_the_same_knot_turned_or_reflected(tmp_path):
+    mirrored = {'patterns': [{'length': 11, 'height': 11, 'blocks': [['horizontal', 3, 1, 5], ['vertical', 4, 2, 6]]}]}
+    original = {'patterns': [{'length': 11, 'height': 11, 'blocks': [['vertical', 3, 1, 5], ['horizontal', 4, 2, 6]]}]}
+    lines = [dict(original, name='a'), dict(mirrored, name='b'), dict(FRAME, name='c')]
+    (tmp_path / 'specs.jsonl').write_text('\n'.join(map(json.dumps, lines)))
+    report = tmp_path / 'report.jsonl'
+    assert main([str(tmp_path / 'specs.jsonl'), '-o', str(tmp_path), '-j', '1', '--unique',
+                 '--report', str(report)]) == 0
+    records = {record['name']: record for record in map(json.loads, report.read_text().splitlines())}
+    assert records['b']['duplicate_of'] == 'a' and records['b']['output'] == records['a']['output']
+    assert 'duplicate_of' not in records['c'] and not (tmp_path / 'b.svg').exists()
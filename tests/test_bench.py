@@ -0,0 +1,27 @@
+import bench
+from bench import Run, measure, compare, PHASES, RECIPES
+
+
+def test_every_phase_is_measured_on_each_recipe():
+    for recipe in RECIPES:
+        results = measure(recipe, 10, 1, True, 10)
+        assert list(results) == list(PHASES)
+        assert all(result['seconds'] >= 0 and 'peak_bytes' in result for result in results.values())
+    assert set(measure('frame', 20, 1, False, 10)) == set(PHASES) - bench.ITEM_PHASES
+
+
+def test_setup_blocks_times_only_the_rerun(monkeypatch):
+    run = Run('frame', 10)
+    run.phase('build')
+    run.phase('block_index')
+    run.prepare('setup_blocks')
+    built = []
+    monkeypatch.setattr(bench, 'KnotEngine', lambda *args: built.append(args))
+    run.phase('setup_blocks')
+    assert not built and run.engine.blocks is run.blocks
+
+
+def test_only_slowdowns_above_the_noise_count():
+    baseline = {'a': {'seconds': 0.01}, 'b': {'seconds': 0.0001}, 'c': {'seconds': 0.01}}
+    results = {'a': {'seconds': 0.02}, 'b': {'seconds': 0.0004}, 'c': {'seconds': 0.011}, 'd': {'seconds': 1.0}}
+    assert compare(results, baseline, 1.25) == [('a', 2.0)]
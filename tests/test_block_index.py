@@ -0,0 +1,87 @@
+import random
+
+from main import Pattern, KnotParams, Orientation, BlockIndex, PeriodicBlockIndex, HBlock, VBlock
+
+
+def region_blocks(index, cols, rows):
+    return sorted(index.iter_region(cols, rows), key=lambda b: (b[0].value, b[1:]))
+
+
+def test_periodic_region_straddling_seam_matches_plain():
+    # HBlock(2, 4, 6) crosses the seam at column 6 of each repeat, and is stored split there
+    tile = Pattern(HBlock(2, 4, 6), VBlock(3, 1, 3), length=6, height=7)
+    periodic = KnotParams(tile, length=17, periodic=True).block_index()
+    plain = KnotParams(tile, length=17).block_index()
+    assert isinstance(periodic, PeriodicBlockIndex)
+    rows = range(0, 7)
+    for cols in (range(0, 6), range(3, 12), range(5, 7), range(6, 12), range(2, 6), range(8, 16)):
+        assert region_blocks(periodic, cols, rows) == region_blocks(plain, cols, rows), cols
+    assert (Orientation.HORIZONTAL, 2, 4, 6) in region_blocks(periodic, range(0, 6), rows)
+
+
+def random_tile(rng, period, height):
+    # legal blocks only: both ends on nodes of the same type, so on the parity of their lane. Vertical
+    # ones sit anywhere in the tile, including the border column, and horizontal ones may cross seams
+    tile = Pattern(length=period, height=height)
+    for _ in range(rng.randrange(1, 8)):
+        if rng.random() < 0.5:
+            col = rng.randrange(period)
+            start = rng.randrange(col % 2, height, 2)
+            end = rng.randrange(start, height, 2)
+            tile.add_block(VBlock(col, start, end))
+        else:
+            row = rng.randrange(height)
+            start = rng.randrange(row % 2 - 2, period, 2)
+            end = rng.randrange(start, start + period, 2)
+            tile.add_block(HBlock(row, start, end))
+    return tile
+
+
+def test_periodic_regions_match_plain_at_random():
+    rng = random.Random(5)
+    for _ in range(200):
+        period, height = rng.choice((4, 6, 8)), rng.choice((5, 7, 9))
+        tile = random_tile(rng, period, height)
+        length = rng.randrange(period + 1, 4 * period, 2)
+        periodic = KnotParams(tile, length=length, periodic=True).block_index()
+        plain = KnotParams(tile, length=length).block_index()
+        for _ in range(10):
+            col, row = rng.randrange(length), rng.randrange(height)
+            cols = range(col, rng.randrange(col + 1, length + 1))
+            rows = range(row, rng.randrange(row + 1, height + 1))
+            # the plain index also repeats the tile past the knot's last column, where nothing is drawn
+            expected = [(orientation, index, start, min(end, length - 1) if orientation is Orientation.HORIZONTAL
+                         else end) for orientation, index, start, end in region_blocks(plain, cols, rows)]
+            assert region_blocks(periodic, cols, rows) == expected, (list(tile.iter_blocks()), cols, rows)
+
+
+def covers(block, col, row, orientation):
+    block_orientation, index, start, end = block
+    lane, position = (row, col) if block_orientation is Orientation.HORIZONTAL else (col, row)
+    return block_orientation is orientation and index == lane and start <= position <= end
+
+
+def test_lookups_match_a_scan_of_the_blocks():
+    rng = random.Random(2)
+    for _ in range(50):
+        index, blocks = BlockIndex(), []
+        for _ in range(rng.randrange(1, 20)):
+            orientation = rng.choice(list(Orientation))
+            block = (orientation, rng.randrange(12), *sorted((rng.randrange(-2, 14), rng.randrange(-2, 14))))
+            index.add(*block)
+            blocks.append(block)
+        length, height = 13, 12
+        blocked_horizontal, blocked_vertical = index.paint_masks(length, height)
+        for col in range(-2, 15):
+            for row in range(-2, 14):
+                for orientation in Orientation:
+                    expected = any(covers(block, col, row, orientation) for block in blocks)
+                    assert index.is_blocking(col, row, orientation) == expected
+                    if 0 <= col < length and 0 <= row < height:
+                        mask = blocked_horizontal if orientation is Orientation.HORIZONTAL else blocked_vertical
+                        assert mask[row * length + col] == expected
+        # lanes stay sorted and merged, so no two intervals touch
+        for lanes in (index.horizontal, index.vertical):
+            for lane in lanes.values():
+                pairs = list(lane)
+                assert all(end < next_start for (_, end), (next_start, _) in zip(pairs, pairs[1:]))
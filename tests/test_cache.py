@@ -0,0 +1,63 @@
+import os
+
+from main import Pattern, KnotParams, KnotEngine, GeometryWorker, VBlock, HBlock
+from cache import GeometryCache, knot_key
+
+
+def knot(length):
+    return KnotParams(Pattern(VBlock(3, 1, 5), HBlock(4, 2, 6), length=length, height=9), length=length)
+
+
+def test_workers_sharing_a_cache_compute_each_knot_once():
+    cache = GeometryCache(4)
+    # the first is cancelled while it may still be inside the cache, as when a gallery panel is closed
+    first = GeometryWorker(knot(401), cache=cache).start()
+    first.cancel()
+    workers = [GeometryWorker(knot(length), cache=cache).start() for length in (401, 11, 401, 11)]
+    for worker in [first] + workers:
+        worker.thread.join()
+    for worker, length in zip(workers, (401, 11, 401, 11)):
+        kind, engine = worker.messages.get_nowait()
+        fresh = KnotEngine(knot(length))
+        assert kind == 'ready' and engine.segments == fresh.segments
+        assert engine.blocked_horizontal == fresh.blocked_horizontal
+    assert cache.misses == 2 and cache.hits == 3
+
+
+def test_knots_with_the_same_blocks_share_a_key():
+    tile = Pattern(VBlock(3, 1, 5), HBlock(4, 2, 6), length=6, height=9)
+    assert knot_key(KnotParams(tile.mirrored())) == knot_key(KnotParams(tile.mirrored().materialize()))
+    assert knot_key(KnotParams(tile.mirrored())) != knot_key(KnotParams(tile.mirrored()), use_symmetry=False)
+    assert knot_key(knot(11)) != knot_key(knot(13))
+
+
+def test_entries_come_back_from_memory_and_disk(tmp_path):
+    cache = GeometryCache(1, str(tmp_path))
+    first = cache.engine(knot(11), segments=False)
+    assert first.computed_segments is None and cache.misses == 1
+    # an entry without segments gets them the first time they are asked for
+    engine = cache.engine(knot(11))
+    assert cache.misses == 2 and engine.segments == KnotEngine(knot(11)).segments
+    assert cache.engine(knot(11)).segments == engine.segments and cache.hits == 2
+    cache.engine(knot(13))
+    assert len(cache) == 1 and len(os.listdir(str(tmp_path))) == 2
+    # a new cache on the same directory, as in a later run
+    reloaded = GeometryCache(4, str(tmp_path))
+    engine = reloaded.engine(knot(11))
+    assert (reloaded.disk_hits, reloaded.misses) == (1, 0)
+    fresh = KnotEngine(knot(11))
+    assert engine.segments == fresh.segments and engine.blocked_vertical == fresh.blocked_vertical
+
+
+def test_damaged_entries_are_recomputed_and_the_directory_trimmed(tmp_path):
+    cache = GeometryCache(1, str(tmp_path))
+    cache.engine(knot(11))
+    path, = tmp_path.iterdir()
+    size = path.stat().st_size
+    path.write_bytes(path.read_bytes()[:-4])
+    reloaded = GeometryCache(1, str(tmp_path), max_disk_bytes=3 * size // 2)
+    assert reloaded.engine(knot(11)).segments == KnotEngine(knot(11)).segments
+    assert (reloaded.disk_hits, reloaded.misses) == (0, 1)
+    # older entries go once the directory is over its size
+    reloaded.engine(knot(13))
+    assert [entry.name for entry in tmp_path.iterdir()] == [knot_key(knot(13)) + '.geom']
@@ -0,0 +1,95 @@
+import random
+
+from main import Pattern, KnotParams, KnotEngine, KnotView, KnotEditor, ViewParams, StrandTracer, Lane, Orientation, \
+    VBlock, HBlock, SEGMENT_FIELDS
+from tests.test_view import RecordingCanvas, ViewportCanvas, edges
+
+
+def strand_sets(segments, strands):
+    out = {}
+    for i, strand in enumerate(strands.strand_ids):
+        out.setdefault(strand, set()).add(tuple(segments[i * SEGMENT_FIELDS:(i + 1) * SEGMENT_FIELDS]))
+    return {frozenset(segments) for segments in out.values()}
+
+
+def test_strands_near_an_edit_are_all_that_change():
+    engine = KnotEngine(KnotParams(Pattern(VBlock(3, 1, 5), HBlock(4, 2, 6), length=11, height=9), length=11))
+    edits = [(Orientation.HORIZONTAL, 6, Lane([(2, 8)])), (Orientation.VERTICAL, 5, Lane([(1, 3), (5, 7)])),
+             (Orientation.VERTICAL, 3, Lane()), (Orientation.HORIZONTAL, 6, Lane([(4, 6)]))]
+    for orientation, index, lane in edits:
+        before = strand_sets(engine.segments, engine.trace_strands())
+        stale = engine.strands_near(engine.lane_changes(orientation, index, lane))
+        cells = engine.set_lane(orientation, index, lane)
+        near = engine.strands_near(cells)
+        after = strand_sets(engine.segments, engine.trace_strands())
+        stale_sets = strand_sets(stale, StrandTracer(engine, stale))
+        near_sets = strand_sets(near, StrandTracer(engine, near))
+        assert stale_sets <= before and near_sets <= after
+        assert before - stale_sets == after - near_sets
+        assert len(StrandTracer(engine, near).keys()) == len(near_sets)
+        assert len(near) // SEGMENT_FIELDS == sum(map(len, near_sets))
+
+
+class Event:
+
+    def __init__(self, x, y) -> None:
+        self.x, self.y = x, y
+
+
+def drawn_strands(canvas):
+    # knot items as the lines of each colour, whichever way each strand was split into items
+    by_color = {}
+    for coords, fill in canvas.knot_items():
+        by_color.setdefault(fill, []).extend(map(sorted, edges(coords)))
+    return sorted(sorted(lines) for lines in by_color.values())
+
+
+def test_edits_redraw_what_a_fresh_view_would():
+    rng = random.Random(9)
+    colors = ['red', 'green', 'blue', 'orange', 'purple', 'tan', 'brown', 'violet', 'gray', 'pink', 'navy',
+              'teal', 'olive', 'gold', 'coral', 'plum', 'khaki', 'wheat', 'cyan', 'maroon']
+    for options in ({}, {'strand_colors': colors}, {'polylines': True}, {'polylines': True, 'strand_colors': colors}):
+        kp = KnotParams(Pattern(VBlock(3, 1, 5), HBlock(4, 2, 6), length=15, height=13), length=15)
+        engine = KnotEngine(kp)
+        masks = engine.blocked_horizontal[:], engine.blocked_vertical[:]
+        canvas = ViewportCanvas(1000, 1000)
+        view = KnotView(canvas, engine, ViewParams(editable=True, **options))
+        view.draw_init()
+        editor = KnotEditor(view)
+        for _ in range(30):
+            parity = rng.randrange(2)
+            start = rng.randrange(parity, 13, 2), rng.randrange(parity, 13, 2)
+            end = rng.randrange(parity, 13, 2), rng.randrange(parity, 13, 2)
+            editor.press(Event(*view.get_pixel(*start)))
+            editor.drag(Event(*view.get_pixel(*end)))
+            editor.release(Event(*view.get_pixel(*end)), rng.random() < 0.6)
+            if rng.random() < 0.2:
+                editor.undo()
+        fresh = RecordingCanvas()
+        KnotView(fresh, engine, ViewParams(**options)).draw_lines()
+        assert drawn_strands(canvas) == drawn_strands(fresh), options
+        assert not any('preview' in tags for _, _, _, tags in canvas.items.values())
+        edited = engine.blocked_horizontal[:], engine.blocked_vertical[:]
+        edits = len(editor.undo_stack)
+        for _ in range(edits):
+            editor.undo()
+        assert (engine.blocked_horizontal, engine.blocked_vertical) == masks
+        for _ in range(edits):
+            editor.redo()
+        assert (engine.blocked_horizontal, engine.blocked_vertical) == edited
+
+
+def test_drags_snap_to_a_straight_blocker():
+    engine = KnotEngine(KnotParams(Pattern(length=15, height=13), length=15))
+    view = KnotView(ViewportCanvas(1000, 1000), engine, ViewParams(editable=True))
+    editor = KnotEditor(view)
+    x, y = view.get_pixel(4, 6)
+    editor.press(Event(x + 5, y - 5))
+    # further across than down, so a horizontal blocker to the nearest primary node
+    assert str(editor.block_to(Event(*view.get_pixel(10, 7)))) == str(HBlock(6, 4, 10))
+    assert str(editor.block_to(Event(*view.get_pixel(5, 1)))) == str(VBlock(4, 6, 2))
+    assert editor.block_to(Event(x, y)) is None
+    editor.release(Event(*view.get_pixel(30, 6)), True)
+    # dragged past the border, so clamped to it
+    lane = engine.lane(Orientation.HORIZONTAL, 6)
+    assert (list(lane.starts), list(lane.ends)) == ([4], [14])
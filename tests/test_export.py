@@ -0,0 +1,85 @@
+import io
+import zlib
+from xml.etree import ElementTree
+
+import pytest
+
+from main import Pattern, KnotParams, KnotEngine, ViewParams, VBlock, HBlock, SegmentType, SEGMENT_FIELDS
+from export import get_rgb, export_knot
+
+
+def test_get_rgb_forms():
+    assert get_rgb('#abc') == (170, 187, 204)
+    assert get_rgb('#a0b1c2') == (160, 177, 194)
+    assert get_rgb('#fff000800') == (255, 0, 128)
+    assert get_rgb('Light Grey') == get_rgb('lightgray') == (211, 211, 211)
+
+
+@pytest.mark.parametrize('color', ['no such colour', '#12', '#ggg'])
+def test_get_rgb_names_unknown_colour(color):
+    with pytest.raises(ValueError, match=color):
+        get_rgb(color)
+
+
+def knot():
+    return KnotEngine(KnotParams(Pattern(VBlock(3, 1, 5), HBlock(4, 2, 6), length=11, height=9), length=11))
+
+
+def exported(engine, vp, format):
+    out = io.BytesIO()
+    export_knot(engine, out, vp, format)
+    return out.getvalue()
+
+
+def svg_paths(data):
+    # (stroke, linecap, subpath points) for every subpath
+    root = ElementTree.fromstring(data)
+    out = []
+    for path in root.iter('{http://www.w3.org/2000/svg}path'):
+        for subpath in path.get('d').split('M')[1:]:
+            points = tuple(tuple(map(float, point.split())) for point in subpath.split('L'))
+            out.append((path.get('stroke'), path.get('stroke-linecap'), points))
+    return out
+
+
+def test_svg_has_a_path_per_segment_or_strand_run():
+    engine = knot()
+    vp = ViewParams()
+    paths = svg_paths(exported(engine, vp, 'svg'))
+    expected = []
+    for i in range(0, len(engine.segments), SEGMENT_FIELDS):
+        segment = engine.segments[i:i + SEGMENT_FIELDS]
+        x1, y1, x2, y2 = (round(c, 2) for c in vp.segment_pixels(*segment))
+        expected.append(('black', 'round' if segment[4] == SegmentType.BOUNCE.value else 'butt', ((x1, y1), (x2, y2))))
+    assert sorted(paths) == sorted(expected)
+    colors = ['red', 'blue', 'green', 'orange']
+    strands = engine.trace_strands()
+    polylines = svg_paths(exported(engine, ViewParams(polylines=True, strand_colors=colors), 'svg'))
+    assert len(polylines) == len(list(strands.chains()))
+    assert {stroke for stroke, _, _ in polylines} == set(colors[:strands.count])
+
+
+def test_pdf_structure_points_at_its_objects():
+    engine = knot()
+    data = exported(engine, ViewParams(), 'pdf')
+    assert data.startswith(b'%PDF-1.4') and data.endswith(b'%%EOF\n')
+    xref = int(data.rsplit(b'startxref\n', 1)[1].split()[0])
+    assert data[xref:].startswith(b'xref\n')
+    offsets = [int(line[:10]) for line in data[xref:].split(b'\n')[3:8]]
+    for number, offset in enumerate(offsets, 1):
+        assert data[offset:].startswith('{} 0 obj'.format(number).encode())
+    start = data.index(b'stream\n') + len(b'stream\n')
+    end = data.index(b'\nendstream')
+    assert int(data[offsets[4]:].split(b'\n')[1]) == end - start
+    content = zlib.decompress(data[start:end]).decode()
+    # one moveto per segment, drawn with the line width and the page flipped to run downwards
+    assert content.count(' m') == len(engine.segments) // SEGMENT_FIELDS
+    assert content.startswith('1 0 0 -1 0 ') and ' 12 w ' in content
+
+
+def test_formats_come_from_the_path(tmp_path):
+    engine = knot()
+    export_knot(engine, str(tmp_path / 'knot.SVG'))
+    assert (tmp_path / 'knot.SVG').read_bytes() == exported(engine, ViewParams(), 'svg')
+    with pytest.raises(ValueError, match='unknown export format'):
+        export_knot(engine, str(tmp_path / 'knot.eps'))
@@ -0,0 +1,54 @@
+import gc
+import time
+import tkinter as tk
+
+import pytest
+
+from main import Pattern, KnotParams, VBlock, HBlock
+from gallery import Gallery
+
+
+def knot(length=11):
+    return KnotParams(Pattern(VBlock(3, 1, 5), HBlock(4, 2, 6), length=length, height=9), length=length)
+
+
+@pytest.fixture
+def gallery(tmp_path):
+    try:
+        gallery = Gallery(columns=2, panel_size=120, cache_dir=str(tmp_path))
+    except tk.TclError:
+        pytest.skip('needs a display')
+    yield gallery
+    gallery.window.destroy()
+
+
+def settle(gallery, seconds=30.0):
+    # runs Tk until every panel is drawn
+    deadline = time.perf_counter() + seconds
+    while (gallery.pending or gallery.current is not None) and time.perf_counter() < deadline:
+        gallery.window.update()
+        time.sleep(0.001)
+    assert not gallery.pending and gallery.current is None
+
+
+def test_panels_of_one_knot_share_an_engine(gallery):
+    first, second, other = gallery.add('a', knot()), gallery.add('b', knot()), gallery.add('c', knot(13))
+    settle(gallery)
+    assert first.view.engine is second.view.engine is not other.view.engine
+    assert len(gallery.engines) == 2 and first.status['text'] == '11 x 9'
+    gallery.remove(first)
+    assert second.view.engine.length == 11 and len(gallery.engines) == 2
+    # the engine goes with the last panel that shows it
+    gallery.remove(second)
+    gc.collect()
+    assert list(gallery.engines.values()) == [other.view.engine]
+
+
+def test_removing_a_panel_that_is_being_computed(gallery):
+    big = gallery.add('big', knot(801))
+    while gallery.worker is None:
+        gallery.window.update()
+    gallery.remove(big)
+    small = gallery.add('small', knot())
+    settle(gallery)
+    assert small.status['text'] == '11 x 9' and list(gallery.engines.values()) == [small.view.engine]
@@ -0,0 +1,37 @@
+import random
+
+from main import KnotEngine, SEGMENT_FIELDS, SegmentType, segment_cell
+from metrics import measure, FIELDS
+from tests.test_strands import random_knot
+
+
+def traced(kp):
+    # the same counts, from a full engine
+    engine = KnotEngine(kp, use_symmetry=False)
+    segments = [tuple(engine.segments[i:i + SEGMENT_FIELDS]) for i in range(0, len(engine.segments), SEGMENT_FIELDS)]
+    bounces = sum(segment[4] == SegmentType.BOUNCE.value for segment in segments)
+    halves = {}
+    for segment in segments:
+        if segment[4] != SegmentType.BOUNCE.value:
+            cell = segment_cell(*segment)
+            halves[cell] = halves.get(cell, 0) + 1
+    xs = [x for segment in segments for x in segment[0:4:2]]
+    ys = [y for segment in segments for y in segment[1:4:2]]
+    strands = engine.trace_strands()
+    return {'length': engine.length, 'height': engine.height, 'crossings': sum(n == 4 for n in halves.values()),
+            'bounces': bounces, 'crossing_halves': len(segments) - bounces,
+            'cord_length': round(strands.total_length(), 4),
+            'width': (max(xs) - min(xs)) / 2, 'depth': (max(ys) - min(ys)) / 2,
+            'strands': strands.count, 'closed': sum(strands.closed)}
+
+
+def test_batched_counts_match_a_traced_engine():
+    rng = random.Random(11)
+    designs = [random_knot(rng, rng.randrange(5, 24, 2), rng.randrange(5, 24, 2)) for _ in range(40)]
+    rows = measure(designs, chunk_size=16)
+    assert [tuple(row) for row in rows] == [FIELDS] * len(designs)
+    for kp, row in zip(designs, rows):
+        assert row == traced(kp)
+    # chunks and workers only change how the work is split
+    assert measure(designs, workers=2, chunk_size=7) == rows
+    assert [dict(row, strands=None, closed=None) for row in rows] == measure(designs, strands=False)
@@ -0,0 +1,60 @@
+import io
+
+import pytest
+
+import patternfile
+from main import Pattern, KnotParams, Lane, VBlock, HBlock, Orientation
+from patternfile import save_knot, load_knot, load_pattern
+
+
+def sample():
+    pattern = Pattern(VBlock(3, 1, 5), VBlock(3, 7, 9), HBlock(4, 2, 6), HBlock(6, 0, 4), length=8, height=11)
+    return KnotParams(pattern, pattern.mirrored(), length=31, periodic=True)
+
+
+def saved(kp):
+    out = io.BytesIO()
+    save_knot(kp, out)
+    return out.getvalue()
+
+
+def assert_same_knot(loaded, kp):
+    assert (loaded.length, loaded.periodic, len(loaded.patterns)) == (kp.length, kp.periodic, len(kp.patterns))
+    for pattern, original in zip(loaded.patterns, kp.patterns):
+        assert (pattern.get_length(), pattern.get_height()) == (original.get_length(), original.get_height())
+        assert pattern.fingerprint() == original.fingerprint()
+    assert loaded.fingerprint() == kp.fingerprint()
+
+
+def test_round_trip_shares_the_loaded_buffer():
+    kp = sample()
+    loaded = load_knot(saved(kp))
+    assert_same_knot(loaded, kp)
+    lane = loaded.patterns[0].vertical_lines[3]
+    assert isinstance(lane.starts, memoryview)
+    # adding to a loaded lane copies it first
+    lane.add(11, 13)
+    assert list(lane) == [(1, 5), (7, 9), (11, 13)] and isinstance(lane.starts, type(Lane().starts))
+
+
+def test_round_trip_on_a_host_of_the_other_byte_order(monkeypatch):
+    # written and read back as a big-endian host would, where every array gets swapped both ways
+    kp = sample()
+    native = saved(kp)
+    monkeypatch.setattr(patternfile, 'NATIVE', False)
+    data = saved(kp)
+    assert len(data) == len(native) and data != native
+    loaded = load_knot(data)
+    assert_same_knot(loaded, kp)
+    assert loaded.patterns[0].vertical_lines[3] == Lane([(1, 5), (7, 9)])
+
+
+def test_bad_files_are_rejected():
+    data = saved(sample())
+    with pytest.raises(ValueError, match='not a pattern file'):
+        load_knot(b'PNG' + data[3:])
+    with pytest.raises(ValueError, match='truncated'):
+        load_knot(data[:-4])
+    with pytest.raises(ValueError, match='truncated'):
+        load_knot(data[:patternfile.FILE_HEADER.size + 8])
+    assert load_pattern(data).get_length() == 8
@@ -0,0 +1,96 @@
+import random
+
+from main import Pattern, KnotParams, KnotEngine, Orientation, NodeType, VBlock, HBlock, get_node_type, \
+    blocks_fingerprint, transform_block, D4
+
+
+def block_node_types(pattern):
+    types = set()
+    for orientation, index, start, end in pattern.iter_blocks():
+        for position in (start, end):
+            col, row = (position, index) if orientation is Orientation.HORIZONTAL else (index, position)
+            types.add(get_node_type(col, row))
+    return types
+
+
+def test_inverted_even_length_keeps_node_types():
+    pattern = Pattern(VBlock(1, 1, 3), HBlock(4, 2, 4), length=8, height=8)
+    inverted = pattern.inverted()
+    assert NodeType.LINE not in block_node_types(inverted)
+    assert sorted(inverted.iter_blocks(), key=lambda b: (b[0].value, b[1:])) == \
+        [(Orientation.HORIZONTAL, 4, 4, 6), (Orientation.VERTICAL, 7, 1, 3)]
+    # raised on LINE nodes before
+    assert len(inverted.get_lines()) == 2
+
+
+def test_inverted_odd_and_vertical_keep_node_types():
+    pattern = Pattern(VBlock(1, 1, 3), HBlock(2, 0, 2), length=9, height=8)
+    for orientation in Orientation:
+        assert NodeType.LINE not in block_node_types(pattern.inverted(orientation))
+    assert NodeType.LINE not in block_node_types(pattern.inverted().inverted(Orientation.VERTICAL))
+
+
+def test_inverted_even_length_renders():
+    # the knot itself needs odd sides for a legal border
+    engine = KnotEngine(KnotParams(Pattern(VBlock(1, 1, 3), length=8, height=9).inverted(), length=9))
+    assert engine.is_blocking(7, 2, Orientation.VERTICAL)
+    assert not engine.is_blocking(6, 2, Orientation.VERTICAL)
+
+
+def test_append_accepts_views():
+    # append offsets by length + 1, which keeps node types on odd lengths
+    pattern = Pattern(VBlock(1, 1, 3), length=7, height=7)
+    other = Pattern(VBlock(1, 1, 3), length=7, height=7)
+    appended = pattern.append(other.invert())
+    assert appended.get_length() == 14
+    assert (Orientation.VERTICAL, 5, 9, 11) in set(appended.iter_blocks())
+
+
+
+def test_pattern_leaves_caller_lanes_alone():
+    vertical_lines = {3: [(1, 3), (5, 7)]}
+    horizontal_lines = {4: [(2, 4)]}
+    pattern = Pattern(vertical_lines=vertical_lines, horizontal_lines=horizontal_lines)
+    pattern.add(3, Orientation.VERTICAL, (9, 11))
+    pattern.add(6, Orientation.HORIZONTAL, (0, 2))
+    assert vertical_lines == {3: [(1, 3), (5, 7)]}
+    assert horizontal_lines == {4: [(2, 4)]}
+    assert list(pattern.vertical_lines[3]) == [(1, 3), (5, 7), (9, 11)]
+
+
+def random_blocks(rng, count):
+    blocks = []
+    for _ in range(count):
+        lane, start = rng.randrange(12), rng.randrange(12)
+        end = start + 2 * rng.randrange(4)
+        blocks.append((rng.choice(list(Orientation)), lane, start - (start + lane) % 2, end - (start + lane) % 2))
+    return blocks
+
+
+def test_fingerprints_ignore_symmetries_of_the_square_and_even_moves():
+    rng = random.Random(4)
+    for _ in range(50):
+        blocks = random_blocks(rng, rng.randrange(1, 8))
+        fingerprint = blocks_fingerprint(blocks)
+        for symmetry in D4:
+            dx, dy = 2 * rng.randrange(-3, 4), 2 * rng.randrange(-3, 4)
+            image = [transform_block(block, *symmetry) for block in blocks]
+            moved = [(o, i + dy, s + dx, e + dx) if o is Orientation.HORIZONTAL else (o, i + dx, s + dy, e + dy)
+                     for o, i, s, e in image]
+            # listed twice and in another order, as overlapping patterns would give them
+            assert blocks_fingerprint(moved[::-1] + moved) == fingerprint
+    block = (Orientation.HORIZONTAL, 2, 2, 6)
+    assert blocks_fingerprint([block]) != blocks_fingerprint([(Orientation.HORIZONTAL, 2, 2, 8)])
+    # an odd move swaps primary and secondary nodes, so it makes another pattern
+    assert blocks_fingerprint([block]) != blocks_fingerprint([(Orientation.HORIZONTAL, 3, 3, 7)])
+
+
+def test_equal_knots_share_a_fingerprint():
+    tile = Pattern(VBlock(3, 1, 5), HBlock(4, 2, 6), length=6, height=11)
+    whole = KnotParams(tile.mirrored())
+    assert KnotParams(tile.mirrored().materialize()).fingerprint() == whole.fingerprint()
+    # a square knot and its mirror image across the diagonal
+    square = KnotParams(Pattern(VBlock(3, 1, 5), HBlock(4, 2, 6), length=11, height=11))
+    assert KnotParams(Pattern(HBlock(3, 1, 5), VBlock(4, 2, 6), length=11, height=11)).fingerprint() == \
+        square.fingerprint()
+    assert square.fingerprint() != whole.fingerprint()
@@ -0,0 +1,41 @@
+import io
+import random
+
+from main import KnotEngine, ViewParams
+from plotter import two_opt, travel, GcodeWriter, knot_strokes, nearest_neighbour, plot_params
+from tests.test_strands import random_knot
+
+
+def test_two_opt_flips_a_single_stroke():
+    strokes = [[(0, 0), (10, 0)], [(20, 0), (11, 0)], [(21, 0), (30, 0)]]
+    assert travel(two_opt(strokes))[1] == 32.0
+    assert strokes[1] == [(11, 0), (20, 0)]
+
+
+def test_gcode_travels_at_travel_feed():
+    out = io.BytesIO()
+    writer = GcodeWriter(out, 10.0, 1500.0, 4000.0)
+    writer.begin()
+    writer.stroke([(1.0, 2.0), (3.0, 2.0)])
+    writer.end()
+    lines = out.getvalue().decode().splitlines()
+    assert lines[3:6] == ['G1 X1 Y8 F4000', 'G1 Z0 F1500', 'G1 X3 Y8']
+    assert lines[-2:] == ['G1 X0 Y0 F4000', 'M2']
+    assert not any(line.startswith('G0 X') for line in lines)
+
+
+def test_ordering_keeps_the_strokes_and_cuts_travel():
+    rng = random.Random(22)
+    engine = KnotEngine(random_knot(rng, 21, 17), use_symmetry=False)
+    vp = plot_params(ViewParams(), 5.0)
+    strokes = knot_strokes(engine, vp)
+    # one stroke per run between gaps
+    assert len(strokes) == len(list(engine.trace_strands().chains()))
+    pen_down, pen_up = travel(strokes)
+    ordered = two_opt(nearest_neighbour(strokes))
+    assert len(ordered) == len(strokes)
+    # each stroke only reversed, or for a closed one started elsewhere
+    assert sorted(sorted(set(stroke)) for stroke in ordered) == sorted(sorted(set(stroke)) for stroke in strokes)
+    ordered_down, ordered_up = travel(ordered)
+    assert abs(ordered_down - pen_down) < 1e-6
+    assert ordered_up < pen_up / 2
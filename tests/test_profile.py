@@ -0,0 +1,28 @@
+import pytest
+
+from main import Pattern, KnotParams, KnotEngine, KnotView, ViewParams, Profile, ProfiledCanvas, VBlock, HBlock
+from bench import CountingCanvas
+
+
+def knot():
+    return KnotParams(Pattern(VBlock(3, 1, 5), HBlock(4, 2, 6), length=11, height=9), length=11)
+
+
+def test_profile_counts_a_draw_and_leaves_nothing_behind():
+    original = KnotEngine.__dict__['setup_segments']
+    canvas = CountingCanvas()
+    with Profile() as profile:
+        view = KnotView(canvas, KnotEngine(knot()), ViewParams())
+        view.draw_init()
+        assert isinstance(view.canvas, ProfiledCanvas)
+        with pytest.raises(RuntimeError):
+            Profile().enable()
+    report = profile.report()
+    assert report['timers']['KnotEngine.setup_segments']['calls'] == 1
+    assert report['counters']['canvas_items'] == canvas.items > 0
+    assert report['counters']['cells'] == 11 * 9
+    # methods and the view's canvas are back as they were
+    assert KnotEngine.__dict__['setup_segments'] is original and Profile.active is None
+    assert view.canvas is canvas
+    view.draw_init()
+    assert profile.report()['counters']['canvas_items'] < canvas.items
@@ -0,0 +1,63 @@
+import io
+import struct
+import zlib
+
+from main import Pattern, KnotParams, KnotEngine, ViewParams, VBlock, HBlock
+from raster import render_png, stroke_coverage, PNG_SIGNATURE
+
+
+def read_png(data):
+    # (header fields, chunks by kind, rows) of an unfiltered 8 bit png
+    assert data.startswith(PNG_SIGNATURE)
+    chunks, offset = {}, len(PNG_SIGNATURE)
+    while offset < len(data):
+        size, kind = struct.unpack_from('>I4s', data, offset)
+        body = data[offset + 8:offset + 8 + size]
+        assert struct.unpack_from('>I', data, offset + 8 + size)[0] == zlib.crc32(kind + body)
+        chunks.setdefault(kind, []).append(body)
+        offset += size + 12
+    width, height, depth, color_type = struct.unpack_from('>IIBB', chunks[b'IHDR'][0])
+    channels = 1 if color_type == 0 else 3
+    pixels = zlib.decompress(b''.join(chunks[b'IDAT']))
+    stride = 1 + width * channels
+    rows = [pixels[i:i + stride] for i in range(0, len(pixels), stride)]
+    assert len(rows) == height and all(row[0] == 0 for row in rows)
+    return (width, height, depth, channels), chunks, [row[1:] for row in rows]
+
+
+def rendered(engine, vp, **kwargs):
+    out = io.BytesIO()
+    render_png(engine, out, vp, **kwargs)
+    return read_png(out.getvalue())
+
+
+def knot():
+    return KnotEngine(KnotParams(Pattern(VBlock(3, 1, 5), HBlock(4, 2, 6), length=11, height=9), length=11))
+
+
+def test_bands_of_any_height_make_the_same_image():
+    engine = knot()
+    for vp in (ViewParams(), ViewParams(strand_colors=['red', 'navy', 'green']).scaled(0.5)):
+        header, chunks, rows = rendered(engine, vp)
+        width, height = (round(size) for size in vp.knot_pixels(engine.length, engine.height))
+        assert header[:3] == (width, height, 8)
+        for band_height in (1, 7, height + 10):
+            assert rendered(engine, vp, band_height=band_height)[2] == rows
+
+
+def test_channels_and_resolution():
+    engine = knot()
+    (_, _, _, channels), chunks, rows = rendered(engine, ViewParams(), dpi=254)
+    # black on white needs no colour, and 254 dpi is 10000 pixels a metre
+    assert channels == 1 and chunks[b'pHYs'] == [struct.pack('>IIB', 10000, 10000, 1)]
+    assert min(min(row) for row in rows) == 0 and max(max(row) for row in rows) == 255
+    (_, _, _, channels), chunks, _ = rendered(engine, ViewParams(line_color='red'))
+    assert channels == 3 and b'pHYs' not in chunks
+
+
+def test_stroke_coverage():
+    # a pixel centre on the line is inside, one further than half the width away is not
+    assert stroke_coverage(0, 0, 10, 0, 2, 5, 0, False) == 1.0
+    assert stroke_coverage(0, 0, 10, 0, 2, 5, 3.5, False) == 0.0
+    assert stroke_coverage(0, 0, 10, 0, 2, -1, 0, True) == 1.0
+    assert stroke_coverage(0, 0, 10, 0, 2, -1, 0, False) == 0.0
@@ -0,0 +1,24 @@
+from main import KnotEngine, Orientation
+from batch import knot_params_from_spec
+from search import StrandCounter, search, design_spec
+
+
+def test_found_design_reloads_as_the_searched_knot():
+    # a transformed, shortened base, whose blocks can't simply be appended to its first pattern
+    base = {'spec': {'patterns': [{'length': 10, 'height': 13, 'blocks': [['vertical', 4, 2, 6]],
+                                   'transforms': [['mirrored']]}],
+                     'knot': {'length': 17}}}
+    for task in range(4):
+        result = search(base, 'none', 0, task, 200, 4, 20)
+        assert result['blocks']
+        searched = KnotEngine(knot_params_from_spec(base['spec']), use_symmetry=False)
+        for name, index, start, end in result['blocks']:
+            orientation = Orientation[name.upper()]
+            lane = searched.lane(orientation, index).copy()
+            lane.add(start, end)
+            searched.set_lane(orientation, index, lane)
+        engine = KnotEngine(knot_params_from_spec(design_spec(result, base)), use_symmetry=False)
+        assert (engine.length, engine.height) == (searched.length, searched.height)
+        assert engine.blocked_horizontal == searched.blocked_horizontal
+        assert engine.blocked_vertical == searched.blocked_vertical
+        assert StrandCounter(engine).count == StrandCounter(searched).count == result['strands']
@@ -0,0 +1,43 @@
+from main import Pattern, KnotParams, KnotEngine, VBlock, HBlock, Orientation, Symmetry, SEGMENT_FIELDS, \
+    segment_cell
+
+
+def by_node(segments):
+    nodes = {}
+    for i in range(0, len(segments), SEGMENT_FIELDS):
+        segment = tuple(segments[i:i + SEGMENT_FIELDS])
+        nodes.setdefault(segment_cell(*segment), []).append(segment)
+    return nodes
+
+
+def test_row_segments_match_node_by_node():
+    # blockers touching the edges and crossing each other, on a knot wide enough to pack in bulk
+    pattern = Pattern(VBlock(0, 2, 6), VBlock(3, 1, 7), HBlock(4, 2, 20), HBlock(3, 1, 21), HBlock(6, 0, 6),
+                      VBlock(21, 3, 7), length=23, height=9)
+    engine = KnotEngine(KnotParams(pattern, length=23), use_symmetry=False)
+    for row in range(engine.height):
+        for cols in (range(engine.length), range(1, 22), range(2, 19), range(5, 6), range(20, 23)):
+            nodes = range(cols.start + (cols.start + row + 1) % 2, cols.stop, 2)
+            assert by_node(engine.row_segments(row, cols)) == by_node(engine.node_segments(row, nodes)), (row, cols)
+
+
+def segment_list(segments):
+    return sorted(tuple(segments[i:i + SEGMENT_FIELDS]) for i in range(0, len(segments), SEGMENT_FIELDS))
+
+
+def test_symmetric_knots_reflect_the_same_segments():
+    quadrant = Pattern(HBlock(1, 1, 3), HBlock(3, 3, 5), VBlock(1, 1, 3), VBlock(5, 1, 3), HBlock(4, 4, 8),
+                       length=9, height=9)
+    for pattern, symmetries in ((quadrant.mirrored().mirrored(Orientation.VERTICAL).folded(), set(Symmetry)),
+                                (quadrant.mirrored(), {Symmetry.HORIZONTAL}),
+                                (quadrant.mirrored(Orientation.VERTICAL), {Symmetry.VERTICAL})):
+        kp = KnotParams(pattern)
+        engine = KnotEngine(kp)
+        assert engine.symmetries == symmetries
+        assert segment_list(engine.segments) == segment_list(KnotEngine(kp, use_symmetry=False).segments)
+
+
+def test_symmetries_the_blockers_lack_are_dropped():
+    pattern = Pattern(HBlock(1, 1, 3), VBlock(5, 1, 3), length=9, height=9)
+    pattern.symmetries = frozenset(Symmetry)
+    assert KnotEngine(KnotParams(pattern)).symmetries == frozenset()
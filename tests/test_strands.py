@@ -0,0 +1,59 @@
+import random
+
+from main import Pattern, KnotParams, KnotEngine, StrandTracer, VBlock, HBlock, SEGMENT_FIELDS, SegmentType
+from search import StrandCounter
+
+
+def random_knot(rng, length, height):
+    # legal blockers only: both ends on nodes of their lane's parity, so on the knot's odd sides the
+    # last one is a node short of the border when the parities differ
+    pattern = Pattern(length=length, height=height)
+    for _ in range(rng.randrange(12)):
+        vertical = rng.random() < 0.5
+        size = height if vertical else length
+        lane = rng.randrange(1, (length if vertical else height) - 1)
+        start = rng.randrange(lane % 2, size, 2)
+        end = min(start + 2 * rng.randrange(1, 4), size - 1 - lane % 2)
+        pattern.add_block((VBlock if vertical else HBlock)(lane, start, end))
+    return KnotParams(pattern, length=length)
+
+
+def test_strands_match_an_independent_count():
+    rng = random.Random(7)
+    for _ in range(60):
+        kp = random_knot(rng, rng.randrange(5, 22, 2), rng.randrange(5, 22, 2))
+        engine = KnotEngine(kp, use_symmetry=False)
+        strands = StrandTracer(engine)
+        assert strands.count == StrandCounter(engine).count
+        # a bordered knot has no loose ends
+        assert all(strands.closed)
+        assert sorted(set(strands.strand_ids)) == list(range(strands.count))
+        assert len(strands.keys()) == strands.count
+
+
+def test_chains_cover_every_segment_once():
+    rng = random.Random(8)
+    for _ in range(20):
+        engine = KnotEngine(random_knot(rng, rng.randrange(5, 16, 2), rng.randrange(5, 16, 2)), use_symmetry=False)
+        strands = engine.trace_strands()
+        count = len(engine.segments) // SEGMENT_FIELDS
+        whole = list(strands.chains(break_at_gaps=False))
+        assert len(whole) == strands.count
+        assert sorted(end >> 1 for chain in whole for end in chain) == list(range(count))
+        # every run is one strand, and breaking at gaps only splits runs where a strand goes under
+        runs = list(strands.chains())
+        assert sorted(end >> 1 for chain in runs for end in chain) == list(range(count))
+        assert all(len({strands.strand_ids[end >> 1] for end in chain}) == 1 for chain in runs)
+        gapped = sum(1 for segment_type in engine.segments[4::SEGMENT_FIELDS]
+                     if segment_type == SegmentType.GAPPED.value)
+        assert len(runs) <= strands.count + gapped
+
+
+def test_lengths_add_up():
+    engine = KnotEngine(KnotParams(Pattern(length=5, height=5), length=5), use_symmetry=False)
+    strands = engine.trace_strands()
+    assert strands.count == 2 and all(strands.closed)
+    bounces = sum(1 for segment_type in engine.segments[4::SEGMENT_FIELDS]
+                  if segment_type == SegmentType.BOUNCE.value)
+    crossings = len(engine.segments) // SEGMENT_FIELDS - bounces
+    assert abs(strands.total_length() - (bounces + crossings * 0.5 ** 0.5)) < 1e-9
@@ -0,0 +1,130 @@
+import itertools
+
+from main import Pattern, KnotParams, KnotEngine, KnotView, ViewParams, VBlock, HBlock, TAG_KNOT
+
+
+class RecordingCanvas:
+    # keeps every item it is asked to create, in place of a Tk canvas
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.items = {}
+        self.ids = itertools.count(1)
+
+    def create(self, kind, coords, options):
+        item = next(self.ids)
+        tags = options.get('tags', ())
+        self.items[item] = (kind, tuple(round(c, 6) for c in coords), options.get('fill'),
+                            {tags} if isinstance(tags, str) else set(tags))
+        return item
+
+    def create_line(self, *coords, **options):
+        return self.create('line', coords, options)
+
+    def create_oval(self, *coords, **options):
+        return self.create('oval', coords, options)
+
+    def delete(self, *tags):
+        for tag in tags:
+            for item, (_, _, _, item_tags) in list(self.items.items()):
+                if tag in (item, 'all') or tag in item_tags:
+                    del self.items[item]
+
+    def itemconfigure(self, *args, **options):
+        pass
+
+    def knot_items(self):
+        return [(coords, fill) for kind, coords, fill, tags in self.items.values() if TAG_KNOT in tags]
+
+
+def knot():
+    return KnotParams(Pattern(VBlock(3, 1, 5), HBlock(4, 2, 6), VBlock(8, 0, 4), length=15, height=13), length=15)
+
+
+def edges(coords):
+    points = list(zip(coords[::2], coords[1::2]))
+    return [frozenset(pair) for pair in zip(points, points[1:])]
+
+
+def test_polylines_draw_one_item_per_strand_run():
+    engine = KnotEngine(knot())
+    strands = engine.trace_strands()
+    for gap in (0, 6):
+        single, batched = RecordingCanvas(), RecordingCanvas()
+        KnotView(single, engine, ViewParams(crossing_gap_length=gap)).draw_init()
+        KnotView(batched, engine, ViewParams(crossing_gap_length=gap, polylines=True)).draw_init()
+        assert len(batched.knot_items()) == len(list(strands.chains(gap > 0))) < len(single.knot_items())
+        if gap == 0:
+            # the same lines either way, only joined up into whole strands
+            assert len(batched.knot_items()) == strands.count
+            assert sorted(map(sorted, (edge for coords, _ in batched.knot_items() for edge in edges(coords)))) == \
+                sorted(map(sorted, (edge for coords, _ in single.knot_items() for edge in edges(coords))))
+
+
+def test_strand_colours_follow_the_strands():
+    engine = KnotEngine(knot())
+    strands = engine.trace_strands()
+    colors = ['red', 'green', 'blue', 'orange', 'purple', 'brown', 'gray', 'pink']
+    assert strands.count <= len(colors)
+    for polylines in (False, True):
+        canvas = RecordingCanvas()
+        KnotView(canvas, engine, ViewParams(strand_colors=colors, polylines=polylines,
+                                            crossing_gap_length=0)).draw_init()
+        assert {fill for _, fill in canvas.knot_items()} == set(colors[:strands.count])
+        if not polylines:
+            # one item per segment, so every strand can be checked for a colour of its own
+            fills = [fill for _, fill in canvas.knot_items()]
+            assert len(fills) == len(strands.strand_ids)
+            by_strand = {}
+            for strand, fill in zip(strands.strand_ids, fills):
+                by_strand.setdefault(strand, set()).add(fill)
+            assert all(len(strand_fills) == 1 for strand_fills in by_strand.values())
+            assert len(set.union(*by_strand.values())) == strands.count
+
+
+class ViewportCanvas(RecordingCanvas):
+    # a window onto the canvas, scrolled by setting left and top
+
+    def __init__(self, width, height) -> None:
+        super().__init__()
+        self.left = self.top = 0
+        self.width, self.height = width, height
+
+    def canvasx(self, x):
+        return self.left + x
+
+    def canvasy(self, y):
+        return self.top + y
+
+    def winfo_width(self):
+        return self.width
+
+    def winfo_height(self):
+        return self.height
+
+    def tile_tags(self):
+        return {tag for _, _, _, tags in self.items.values() for tag in tags if tag.startswith('tile_')}
+
+
+def test_tiled_view_draws_the_tiles_in_view_and_the_same_lines():
+    # 5 x 3 tiles of 16 cells, 384 pixels across at the default unit length
+    engine = KnotEngine(KnotParams(Pattern(VBlock(3, 1, 5), HBlock(4, 2, 6), length=8, height=41),
+                                   length=71, periodic=True))
+    canvas = ViewportCanvas(400, 300)
+    view = KnotView(canvas, engine, ViewParams(tiled=True))
+    view.update_tiles()
+    # what is in view and a tile of margin past it
+    expected = {(col, row) for col in range(3) for row in range(2)}
+    assert set(view.tiles) == expected
+    assert canvas.tile_tags() == {'tile_{}_{}'.format(*tile) for tile in expected}
+    canvas.left, canvas.top = 1200, 400
+    view.update_tiles()
+    expected = {(col, row) for col in range(2, 5) for row in range(0, 3)}
+    assert set(view.tiles) == expected
+    assert canvas.tile_tags() == {'tile_{}_{}'.format(*tile) for tile in expected}
+    # every tile together draws what a whole view draws
+    canvas.left, canvas.top, canvas.width, canvas.height = 0, 0, 2000, 1200
+    view.update_tiles()
+    whole = RecordingCanvas()
+    KnotView(whole, engine, ViewParams()).draw_lines()
+    assert sorted(canvas.knot_items()) == sorted(whole.knot_items())
@@ -0,0 +1,42 @@
+from main import Pattern, KnotParams, KnotEngine, GeometryWorker, VBlock, HBlock
+
+
+def knot(length=41):
+    return KnotParams(Pattern(VBlock(3, 1, 5), HBlock(4, 2, 6), length=length, height=39), length=length)
+
+
+def messages(worker):
+    worker.thread.join()
+    out = []
+    while not worker.messages.empty():
+        out.append(worker.messages.get_nowait())
+    return out
+
+
+def test_worker_reports_progress_then_the_engine():
+    worker = GeometryWorker(knot(), strands=True)
+    worker.rows_per_chunk = 8
+    found = messages(worker.start())
+    progress = [value for kind, value in found if kind == 'progress']
+    assert progress == sorted(progress) and len(progress) == 1 + 5 and progress[-1] < 1.0
+    kind, engine = found[-1]
+    assert kind == 'ready' and engine.strands is not None
+    assert engine.computed_segments == KnotEngine(knot()).segments
+
+
+def test_worker_without_segments_leaves_them_for_later():
+    kind, engine = messages(GeometryWorker(knot(), segments=False).start())[-1]
+    assert kind == 'ready' and engine.computed_segments is None
+
+
+def test_cancelled_worker_stops_and_stays_quiet():
+    worker = GeometryWorker(knot())
+    worker.cancel()
+    assert messages(worker.start()) == []
+    assert not worker.setup_segments(KnotEngine(knot(), use_symmetry=False))
+
+
+def test_errors_come_back_as_messages():
+    # an even length puts the right border on line nodes
+    kind, error = messages(GeometryWorker(knot(40)).start())[-1]
+    assert kind == 'error' and 'illegal blocking line' in str(error)